@@ -1,377 +1,520 @@
-import json
-import aiohttp
-import asyncio
-from playsound import playsound
-import xml.etree.ElementTree as ET
-from datetime import datetime
-
-with open("config.json", encoding="utf-8") as f:
-    CONFIG = json.load(f)
-
-SOUNDS_DIR = CONFIG["SOUNDS_DIR"]
-SOUND_FILES = CONFIG["SOUND_FILES"]
-EEW_URL = CONFIG["EEW_URL"]
-P2PQUAKE_URL = CONFIG["P2PQUAKE_URL"]
-SCALE_TEXT = CONFIG["SCALE_TEXT"]
-TSUNAMI_TEXT = CONFIG["TSUNAMI_TEXT"]
-TYPE_TEXT = CONFIG["TYPE_TEXT"]
-
-true = True
-false = False
-
-URLS = [
-    "https://www.data.jma.go.jp/developer/xml/feed/eqvol.xml",
-]
-
-async def play_sound(event_type):
-    sound_file = SOUND_FILES.get(event_type)
-    if sound_file:
-        await asyncio.to_thread(playsound, f"{SOUNDS_DIR}/{sound_file}")
-
-async def speak_bouyomi(text='', voice=0, volume=-1, speed=-1, tone=-1):
-    params = {'text': text, 'voice': voice, 'volume': volume, 'speed': speed, 'tone': tone}
-    async with aiohttp.ClientSession() as session:
-        async with session.get('http://localhost:50080/Talk', params=params) as res:
-            return res.status
-
-async def process_eew_data(data, last_message):
-    if data.get('type') == 'heartbeat': return None
-    if data.get('isCancel', False): return "この緊急地震速報は取り消されました"
-    message = (
-        f"緊急地震速報（{'警報' if data.get('isWarn') else '予報'}）"
-        f"{'最終報' if data.get('isFinal') else f'第{data.get('Serial', '不明')}報'}。"
-        f"推定最大震度は{data.get('MaxIntensity', '不明')}です。"
-        f"震源地は{data.get('Hypocenter', '不明')}、震源の深さは{data.get('Depth', '不明')}キロメートル、"
-        f"地震の規模を示すマグニチュードは{data.get('Magunitude', '不明')}と推定されています。"
-    )
-    await play_sound("EEWWarning" if data.get('isWarn') else "EEWForecast")
-    return message
-
-def parse_arrival_time(arrival_raw):
-    if arrival_raw == "不明":
-        return ""
-    try:
-        date_part, time_part = arrival_raw.split(" ")
-        day = int(date_part.split("/")[-1])
-        hour, minute = map(int, time_part.split(":")[:2])
-        return f"早いところで、{day}日{hour}時{minute}分ごろ到達とみられます"
-    except ValueError:
-        return ""
-
-def format_warning_message(warnings, grade_name):
-    details = "\n".join(f"{info['地域']}、予想の高さ{info['予想の高さ']}、{info['到達予測']}" for info in warnings[grade_name])
-    return f"津波情報。{grade_name}が発表されました。\n{grade_name}が発表されている地域をお伝えします。\n{details}\n"
-
-async def process_tsunami_data(data):
-    warning_levels = ["大津波警報", "津波警報", "津波注意報"]
-    grade_map = {"MajorWarning": "大津波警報", "Warning": "津波警報", "Watch": "津波注意報"}
-    condition_map = {
-        "ただちに津波来襲と予測": "ただちに津波来襲と予測されます",
-        "津波到達中と推測": "津波到達中と推測されます",
-        "第１波の到達を確認": "第１波の到達を確認しました"
-    }
-    messages = []
-    for item in sorted(data, key=lambda x: x.get('time', ''), reverse=True):
-        if item.get("cancelled"):
-            messages.append("津波情報。津波予報が解除されました。\n")
-            await play_sound("Tsunamicancel")
-            continue
-        warnings = {level: [] for level in warning_levels}
-        for area in item.get("areas", []):
-            grade = grade_map.get(area.get('grade', ''), '')
-            arrival = parse_arrival_time(area.get('firstHeight', {}).get('arrivalTime', '不明'))
-            condition = condition_map.get(area.get('firstHeight', {}).get('condition', ''), arrival)
-            warnings[grade].append({
-                "地域": area.get('name', '不明'),
-                "予想の高さ": area.get('maxHeight', {}).get('description', '不明'),
-                "到達予測": condition
-            })
-        for level in warning_levels:
-            if warnings[level]:
-                messages.append(format_warning_message(warnings, level))
-    if messages:
-        combined_message = "".join(messages)
-        print(combined_message)
-        await speak_bouyomi(combined_message)
-        await play_sound("Tsunami")
-
-def convert_scale_to_text(scale):
-    return SCALE_TEXT.get(str(scale), "不明")
-
-def convert_tsunami(tsunami, foreign_tsunami=None, domestic=True):
-    if foreign_tsunami is None and not domestic:
-        return ""
-    return TSUNAMI_TEXT.get(tsunami, "")
-
-def convert_type(type_str):
-    return TYPE_TEXT.get(type_str, "地震情報")
-
-async def display_earthquake_info(data):
-    issue = data.get('issue', {})
-    eq = data.get('earthquake', {})
-    text = f"{convert_type(issue.get('type', 'Other'))}。"
-    t = eq.get('time', '不明')
-    if t != '不明':
-        date_part, time_part = t.split(" ")
-        hour, minute, _ = time_part.split(":")
-        text += f"{int(hour)}時{int(minute)}分ごろ地震がありました。"
-    hypocenter = eq.get('hypocenter', {})
-    if name := hypocenter.get('name'):
-        text += f"震源地は{name}、"
-    if (depth := hypocenter.get('depth', -1)) >= 0:
-        text += f"震源の深さは{'ごく浅い' if depth == 0 else f'{depth}キロメートル'}。"
-    if (magnitude := hypocenter.get('magnitude', -1)) >= 0:
-        text += f"地震の規模を示すマグニチュードは{magnitude:.1f}と推定されています。"
-    text += convert_tsunami(eq.get('domesticTsunami', ''), domestic=True)
-    foreign = eq.get('foreignTsunami', None)
-    if foreign not in [None, "Unknown"]:
-        text += convert_tsunami(foreign, domestic=False)
-    if pts := data.get('points', []):
-        text += format_points_info(pts)
-    print(text)
-    await speak_bouyomi(text)
-    await play_sound(issue.get('type', 'Other'))
-
-def format_points_info(points):
-    max_scale_region = {}
-    for point in points:
-        scale = point.get('scale', -1)
-        if scale > 0:
-            pref = point.get('pref', '不明')
-            max_scale_region[pref] = max(max_scale_region.get(pref, 0), scale)
-    if not max_scale_region:
-        return ""
-    max_scale = max(max_scale_region.values())
-    areas_max = "、".join(pref for pref, s in max_scale_region.items() if s == max_scale)
-    text = f"最大{convert_scale_to_text(max_scale)}を{areas_max}で観測しました。"
-    other = {}
-    for pref, s in max_scale_region.items():
-        if s < max_scale:
-            other.setdefault(s, []).append(pref)
-    if other:
-        others = "、".join(f"{convert_scale_to_text(s)}を{'、'.join(prefs)}" for s, prefs in sorted(other.items(), reverse=True))
-        text += f"また、{others}で観測しました。"
-    return text
-
-async def on_message(message):
-    data = json.loads(message)
-    code = data.get('code')
-    if code == 551:
-        await display_earthquake_info(data)
-    elif code == 552:
-        await process_tsunami_data([data])
-
-async def on_eew_message(message, last):
-    data = json.loads(message)
-    new_msg = await process_eew_data(data, last)
-    if new_msg:
-        print(new_msg)
-        await speak_bouyomi(new_msg)
-    return new_msg or last
-
-async def ws_handler(url, handler, last=None):
-    while True:
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.ws_connect(url) as ws:
-                    async for msg in ws:
-                        if msg.type == aiohttp.WSMsgType.TEXT:
-                            last = await handler(msg.data, last)
-        except Exception as e:
-            print(f"WebSocket error: {e}")
-            await asyncio.sleep(5)
-
-async def fetch_xml(url):
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                return await response.text()
-            else:
-                print(f"Error fetching {url}: {response.status}")
-                return None
-
-def strip_ns(elem):
-    for e in elem.iter():
-        if '}' in e.tag:
-            e.tag = e.tag.split('}', 1)[1]
-
-def format_observed_time(time_str):
-    try:
-        dt = datetime.fromisoformat(time_str)
-        return f"{dt.day}日{dt.hour}時{dt.minute}分"
-    except Exception as e:
-        return time_str
-
-def fetch_and_parse_individual_xml(xml_data):
-    try:
-        root = ET.fromstring(xml_data)
-    except ET.ParseError as e:
-        print("XML parse error:", e)
-        return None
-
-    strip_ns(root)
-    tsunami_info = []
-
-    tsunami_elem = root.find(".//Tsunami")
-    if tsunami_elem is not None:
-        observation = tsunami_elem.find("Observation")
-        if observation is not None:
-            for item in observation.findall("Item"):
-                area_name = item.find("Area/Name").text if item.find("Area/Name") is not None else "不明"
-                for station in item.findall("Station"):
-                    station_name = station.find("Name").text if station.find("Name") is not None else "不明"
-                    max_time = station.find("MaxHeight/DateTime").text if station.find("MaxHeight/DateTime") is not None else ""
-                    arrival_time = station.find("FirstHeight/ArrivalTime").text if station.find("FirstHeight/ArrivalTime") is not None else ""
-                    observed_time = max_time if max_time != "" else (arrival_time if arrival_time != "" else "不明")
-                    tsunami_height_elem = station.find("MaxHeight/TsunamiHeight")
-                    tsunami_height = None
-                    condition = None
-                    if tsunami_height_elem is not None:
-                        tsunami_height = tsunami_height_elem.attrib.get("description", None)
-                        condition = tsunami_height_elem.attrib.get("condition", None)
-                        if tsunami_height:
-                            tsunami_height = tsunami_height.translate(str.maketrans(
-                                'ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ１２３４５６７８９０．',
-                                'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890.'
-                            ))
-                    condition_elem = station.find("MaxHeight/Condition")
-                    if not tsunami_height and condition_elem is not None:
-                        tsunami_height = condition_elem.text if condition_elem.text else None
-                    info = {
-                        "kind": "津波観測",
-                        "observed_time": observed_time,
-                        "height": tsunami_height,
-                        "station": station_name,
-                        "area": area_name,
-                        "condition": condition
-                    }
-                    tsunami_info.append(info)
-    return tsunami_info
-
-def parse_event_links(xml_data):
-    try:
-        root = ET.fromstring(xml_data)
-    except ET.ParseError as e:
-        print("XML parse error:", e)
-        return {"tsunami": [], "long_period": []}
-    strip_ns(root)
-    event_links = {"tsunami": [], "long_period": []}
-    for entry in root.findall("./entry"):
-        title = entry.find("title").text
-        link = entry.find("link").attrib.get("href")
-        if "VTSE51" in link:
-            event_links["tsunami"].append(link)
-        elif "VXSE62" in link:
-            event_links["long_period"].append(link)
-    return event_links
-
-def extract_height_value(height_str):
-    try:
-        if "m以上" in height_str:
-            return float(height_str.replace("m以上", ""))
-        return float(height_str.replace("m", ""))
-    except ValueError:
-        return -1
-    
-async def process_long_period_motion(xml_data):
-    try:
-        root = ET.fromstring(xml_data)
-    except ET.ParseError as e:
-        print("XML parse error:", e)
-        return None
-
-    strip_ns(root)
-    long_period_info = {}
-
-    for info in root.findall(".//Information[@type='長周期地震動に関する観測情報（細分区域）']"):
-        for item in info.findall("Item"):
-            kind_name = item.find("Kind/Name").text if item.find("Kind/Name") is not None else "不明"
-            for area in item.findall("Areas/Area"):
-                area_name = area.find("Name").text if area.find("Name") is not None else "不明"
-                if area_name not in long_period_info:
-                    long_period_info[area_name] = []
-                long_period_info[area_name].append(kind_name)
-
-    for area_name, kinds in long_period_info.items():
-        kinds_text = "、".join(kinds)
-        message = f"先ほどの地震により長周期地震動を観測しました。{kinds_text}を{area_name}で観測しました。"
-        print(message)
-        asyncio.create_task(speak_bouyomi(message))
-        await play_sound("SeismicWarning")
-
-    return long_period_info
-
-last_tsunami_info = None
-last_long_period_info = None
-
-async def process_network_data():
-    global last_tsunami_info, last_long_period_info
-    while True:
-        all_tsunami_info = []
-        all_long_period_info = []
-        
-        for url in URLS:
-            xml_data = await fetch_xml(url)
-            if not xml_data:
-                continue
-
-            event_links = parse_event_links(xml_data)
-            
-            for link in event_links["tsunami"]:
-                individual_xml = await fetch_xml(link)
-                if individual_xml:
-                    tsunami_info = fetch_and_parse_individual_xml(individual_xml)
-                    if tsunami_info:
-                        all_tsunami_info.extend(tsunami_info)
-
-            for link in event_links["long_period"]:
-                long_period_xml = await fetch_xml(link)
-                if long_period_xml:
-                    long_period_info = await process_long_period_motion(long_period_xml)
-                    if long_period_info:
-                        all_long_period_info.extend(long_period_info)
-
-        sorted_tsunami_info = sorted(
-            all_tsunami_info, 
-            key=lambda x: extract_height_value(x['height']), 
-            reverse=True
-        )
-
-        if sorted_tsunami_info:
-            if sorted_tsunami_info == last_tsunami_info:
-                await asyncio.sleep(60)
-                continue
-
-            last_tsunami_info = sorted_tsunami_info
-
-            header_message = "津波観測情報。沿岸で津波を観測しています。観測地点と観測時刻、観測した津波の最大波をお伝えします。"
-            print(header_message)
-            await speak_bouyomi(header_message)
-            await play_sound("Observation")
-
-            for info in sorted_tsunami_info:
-                formatted_time = format_observed_time(info['observed_time']) if info['observed_time'] != "不明" else "不明"
-                height_message = info['height']
-                condition_message = f"、{info['condition']}" if info['condition'] else ""
-                message = f"{info['station']}、{formatted_time}、{height_message}{condition_message}。"
-                print(message)
-                await speak_bouyomi(message)
-
-        if all_long_period_info:
-            if all_long_period_info == last_long_period_info:
-                await asyncio.sleep(60)
-                continue
-
-            last_long_period_info = all_long_period_info
-
-        await asyncio.sleep(60)
-
-async def main():
-    await asyncio.gather(
-        ws_handler(EEW_URL, on_eew_message),
-        ws_handler(P2PQUAKE_URL, lambda msg, _: on_message(msg)),
-        process_network_data()
-    )
-
-if __name__ == '__main__':
+import json
+import time
+import aiohttp
+import asyncio
+import itertools
+from datetime import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from yomiage.bouyomi import get_client, close_client, configure_client
+from yomiage.scheduler import SpeechScheduler, EEW_WARNING, EEW_FORECAST, TSUNAMI, EARTHQUAKE, OBSERVATION
+from yomiage.flow import BouyomiFlowControl
+from yomiage.recorder import open_recorder
+from yomiage.records import decode_eew, decode_p2p, Earthquake, Tsunami
+from yomiage.intensity import max_by_pref, group_scales
+from yomiage.quakes import QuakeTracker, merge_reports
+from yomiage.coalesce import Coalescer
+from yomiage.announce import AnnouncementRenderer
+from yomiage.eew import EEWTracker, format_eew
+from yomiage.tsunami import TsunamiBoard, tsunami_chunks, update_chunks, board_chunks
+from yomiage.state import ActiveState, StateServer
+from yomiage.audio import SoundPlayer
+from yomiage.feed import (
+    CodeFilter, FeedQueue, FirstArrival, drain, expand_links, is_droppable, receive_forever, get_session, close_session,
+)
+
+with open("config.json", encoding="utf-8") as f:
+    CONFIG = json.load(f)
+
+SOUNDS_DIR = CONFIG["SOUNDS_DIR"]
+SOUND_FILES = CONFIG["SOUND_FILES"]
+EEW_URL = CONFIG["EEW_URL"]
+P2PQUAKE_URL = CONFIG["P2PQUAKE_URL"]
+SCALE_TEXT = CONFIG["SCALE_TEXT"]
+TSUNAMI_TEXT = CONFIG["TSUNAMI_TEXT"]
+TYPE_TEXT = CONFIG["TYPE_TEXT"]
+
+configure_client(CONFIG.get("BOUYOMI", {}))
+recorder = open_recorder(CONFIG.get("RECORD_DIR"))
+
+true = True
+false = False
+
+URLS = [
+    "https://www.data.jma.go.jp/developer/xml/feed/eqvol.xml",
+]
+
+# 効果音は受信の接続後に裏で PCM に変換しておき、開いたままの出力先に流す
+# （変換前に鳴らすときは、その場で変換する）
+AUDIO_CONFIG = CONFIG.get("AUDIO", {})
+sound_player = SoundPlayer(
+    SOUNDS_DIR, SOUND_FILES,
+    sink=AUDIO_CONFIG.get("SINK", "device"), path=AUDIO_CONFIG.get("FILE"), buffer_ms=AUDIO_CONFIG.get("BUFFER_MS", 50),
+)
+
+SPEECH_LEAD = AUDIO_CONFIG.get("SPEECH_LEAD", 0.3)
+AT_START = float("inf")
+
+# チャイムを鳴らし始め、鳴り終わる lead 秒前（AT_START なら鳴り始めたとき）に完了する Future を返す
+# 読み上げはこの Future を after にして予約する。文を作る・送る準備はチャイムと並行して進み、
+# 棒読みちゃんが読み始めるのはチャイムが聞こえてから（lead は棒読みちゃんが読み始めるまでの遅れを見込んだ重なり）
+# EEW警報のチャイムは、鳴っている途中の音を打ち切ってすぐに鳴らす
+def start_chime(event_type, lead=SPEECH_LEAD):
+    return sound_player.start(event_type, urgent=event_type == "EEWWarning", lead=lead)
+
+async def speak_bouyomi(text='', voice=0, volume=-1, speed=-1, tone=-1, priority=None):
+    return await get_client().talk(text, voice, volume, speed, tone, priority=priority)
+
+BOUYOMI_CONFIG = CONFIG.get("BOUYOMI", {})
+flow_control = BouyomiFlowControl(
+    get_client(),
+    max_tasks=BOUYOMI_CONFIG.get("MAX_TASKS", 3),
+    clear_on_warning=BOUYOMI_CONFIG.get("CLEAR_ON_WARNING", False),
+)
+scheduler = SpeechScheduler(speak_bouyomi, gate=flow_control)
+
+# 優先度をつけて読み上げを予約する（EEWは津波・地震情報より先に読まれる）
+def speak(text, priority, key=None, replace=True, after=None):
+    return scheduler.submit(text, priority, key, replace, after)
+
+async def process_eew_data(eew):
+    return format_eew(eew)
+
+# 今発表中の津波警報・注意報・地震情報・緊急地震速報。受信の処理で変わった項目だけを反映し、
+# STATE_API の PORT（0 なら使わない）で http://HOST:PORT/state から JSON で読める
+STATE_API = CONFIG.get("STATE_API", {})
+active_state = ActiveState(STATE_API.get("MAX_QUAKES", 16), STATE_API.get("EEW_TTL", 300.0))
+state_server = None
+
+tsunami_items = []
+tsunami_board = TsunamiBoard(on_change=active_state.update_tsunami)
+TSUNAMI_DIFF = CONFIG.get("TSUNAMI_DIFF", True)
+
+# 津波予報は見出しと地域ごとの区切りに分けて、作ったそばから予約する（長い文を1回の /Talk で送らない）
+# 区切りを1つ予約するたびに制御を返すので、先の区切りを送っている間に残りを作る
+# 新しい津波予報が届いたら、前の予報でまだ送っていない区切りは取り消す
+async def speak_tsunami(chunks, cancelled=False):
+    global tsunami_items
+    first = next(chunks, None)
+    if first is None:
+        return
+    for item in tsunami_items:
+        scheduler.cancel(item)
+    if cancelled:
+        start_chime("Tsunamicancel")
+    cue = start_chime("Tsunami")
+    tsunami_items = []
+    for chunk in itertools.chain((first,), chunks):
+        print(chunk, end="")
+        tsunami_items.append(speak(chunk, TSUNAMI, replace=False, after=cue))
+        await asyncio.sleep(0)
+
+# 今出ている津波予報を反映し、前の予報から変わった地域（新たな発表・引き上げ・引き下げ・予想の高さ・解除）だけを読む
+# 前の予報の区切りがまだ送られずに残っていれば、取り消した区切りの地域は読まれていないので、差分ではなく今出ているすべての地域を読む
+# TSUNAMI_DIFF が false なら、従来どおり毎回すべての地域を読む
+async def process_tsunami_data(data):
+    data = sorted(data, key=lambda t: t.time)
+    cancelled = any(tsunami.cancelled for tsunami in data)
+    if not TSUNAMI_DIFF:
+        chunks = tsunami_chunks(data)
+    elif any(item.started is None and not item.cancelled for item in tsunami_items):
+        if all([tsunami_board.apply(tsunami) is None for tsunami in data]):
+            return
+        chunks = board_chunks(tsunami_board)
+    else:
+        chunks = itertools.chain.from_iterable([update_chunks(tsunami_board, tsunami) for tsunami in data])
+    await speak_tsunami(chunks, cancelled)
+
+# 今出ているすべての地域を読み直す（STATE_API の POST /tsunami/reread から呼ぶ）
+async def reread_tsunami():
+    await speak_tsunami(tsunami_board.chunks())
+
+def convert_type(type_str):
+    return TYPE_TEXT.get(type_str, "地震情報")
+
+# 地震情報の読み上げ文は、config.json の ANNOUNCEMENT（省略可）で文言を変えられるひな形から作る
+renderer = AnnouncementRenderer(TYPE_TEXT, SCALE_TEXT, TSUNAMI_TEXT, CONFIG.get("ANNOUNCEMENT"))
+
+# 同じ地震の続報は、前の報から変わった点だけを読み上げる
+quake_tracker = QuakeTracker()
+
+# 数秒のうちに続けて届いた同じ地震の報（震度速報と震源に関する情報など）は、1回の読み上げとチャイムにまとめる
+# EEWを受信したときや、最大震度が引き上げられたときは待たずに読み上げる
+async def display_earthquake_info(quake):
+    scales = max_by_pref(quake.points.prefs(), quake.points.scales())
+    if quake.time == '不明':
+        active_state.update_quake(quake, scales)
+        await quake_windows.add(None, (quake, scales, None), immediate=True)
+        return
+    hypocenter = quake.hypocenter
+    diff = quake_tracker.update(
+        quake.time, (hypocenter.name, hypocenter.depth, hypocenter.magnitude), quake.domestic_tsunami, scales
+    )
+    active_state.update_quake(quake, scales, diff)
+    await quake_windows.add(quake.time, (quake, scales, diff), immediate=not diff.first and diff.max_raised)
+
+async def speak_earthquake_reports(key, reports):
+    quake = merge_reports([report[0] for report in reports])
+    scales = reports[-1][1]
+    diff = reports[0][2]
+    for report in reports[1:]:
+        diff = diff.merge(report[2])
+    # 前の報がまだ読まれずに待っているなら、差分ではなく分かっていることすべての全文で置き換える
+    full = diff is None or diff.first or scheduler.is_pending(EARTHQUAKE, quake.time)
+    if not full and not diff.changed:
+        print(f"{convert_type(quake.issue_type)}: 前の報から変更はありません")
+        return
+    cue = start_chime(quake.issue_type)
+    if full:
+        text = format_earthquake_info(quake, diff.event.scales if diff else scales)
+    else:
+        text = format_earthquake_update(quake, diff)
+    print(text)
+    speak(text, EARTHQUAKE, key=quake.time, after=cue)
+
+quake_windows = Coalescer(speak_earthquake_reports, CONFIG.get("QUAKE_COALESCE", 0))
+
+def format_earthquake_info(quake, scales):
+    return renderer.render(quake, group_scales(scales))
+
+# 続報で変わった点（震源・津波の有無・引き上げられた最大震度・新たに観測した地域）だけの文
+def format_earthquake_update(quake, diff):
+    return renderer.render_update(quake, diff)
+
+# ピア分布（555）や地震感知情報（561）などは、解析せずに捨てる
+p2p_filter = CodeFilter({551, 552})
+
+async def on_message(message):
+    if not p2p_filter.accept(message):
+        return
+    record = decode_p2p(message)
+    if isinstance(record, Earthquake):
+        await display_earthquake_info(record)
+    elif isinstance(record, Tsunami):
+        await process_tsunami_data([record])
+
+# EventID ごとに最新の報だけを読み上げる。最大震度・警報かどうか・マグニチュードが大きく変わらない続報は読み上げない
+eew_tracker = EEWTracker(CONFIG.get("EEW_MAGNITUDE_THRESHOLD", 0.5))
+EEW_FIRST_PHRASE = CONFIG.get("EEW_FIRST_PHRASE", "緊急地震速報。強い揺れに警戒してください")
+
+async def on_eew_message(message, last):
+    eew = decode_eew(message)
+    if eew.type == 'heartbeat':
+        return last
+    active_state.update_eew(eew)
+    # 第1段: 警報を初めて受け取ったら、詳しい文を組み立てる前にチャイムと短い呼びかけを出す
+    # （EEW_FIRST_PHRASE を空にすると第1段を使わない）
+    alerted = bool(EEW_FIRST_PHRASE) and eew_tracker.first_warning(eew)
+    if alerted:
+        cue = start_chime("EEWWarning", lead=AT_START)
+        speak(EEW_FIRST_PHRASE, EEW_WARNING, key=("first", eew.event_id), after=cue)
+    # 第2段: 震源・マグニチュードなどの詳しい文
+    slot, material = eew_tracker.update(eew)
+    if not material:
+        print(f"緊急地震速報 第{eew.serial}報: 前に読み上げた報から大きな変化はありません")
+        return last
+    # 第1段でチャイムを鳴らした報と取消は、チャイムを鳴らさない
+    cue = None if alerted or eew.is_cancel else start_chime("EEWWarning" if eew.is_warn else "EEWForecast")
+    new_msg = await process_eew_data(eew)
+    if new_msg:
+        print(new_msg)
+        # 新しい報を送る前に前の報を取り下げる（後から送った新しい報まで消さないように）
+        await cut_short(slot.item)
+        item = speak(new_msg, EEW_WARNING if eew.is_warn else EEW_FORECAST, key=eew.event_id, after=cue)
+        eew_tracker.submitted(slot, eew, item)
+        await quake_windows.flush_all()
+    return new_msg or last
+
+# 同じ地震の前の報がまだ送られずに待っていれば取り消す
+# 棒読みちゃんに送ったあとなら、棒読みちゃんに残っているのがその報だけだと確かめられたときだけ消す・打ち切る
+async def cut_short(previous):
+    if previous is None:
+        return
+    if previous.started is None:
+        scheduler.cancel(previous)
+    elif await flow_control.withdraw(previous):
+        print("前の報の読み上げを取り下げました")
+
+feed_queues = {}
+feed_links = {}
+disconnect_gaps = {}
+
+# 受信ループは読み取ってキューに積むだけにし、処理は別タスクで行う
+# （読み上げ中も受信が止まらず、pingにも応答できる）
+# url がリストなら、または WS_LINKS が2以上なら複数の接続を張り、先に届いた電文だけを処理する
+# connected（asyncio.Event）は、どれかの接続がつながったときにセットされる
+async def ws_handler(url, handler, last=None, feed=None, connected=None):
+    name = feed or str(url)
+    queue = feed_queues[name] = FeedQueue(CONFIG.get("FEED_QUEUE_SIZE", 256))
+    worker = asyncio.create_task(drain(queue, handler, last))
+
+    def on_frame(frame):
+        if recorder and feed:
+            recorder.record(feed, frame)
+        queue.put(frame, is_droppable(frame))
+
+    links = expand_links(url, CONFIG.get("WS_LINKS", 1))
+    arrival = feed_links[name] = FirstArrival(on_frame)
+    try:
+        await asyncio.gather(*(
+            receive_forever(
+                link_url, arrival.link(f"{name}#{n}"), name=f"{name}#{n}",
+                heartbeat=CONFIG.get("WS_HEARTBEAT", 5.0),
+                gaps=disconnect_gaps.setdefault(f"{name}#{n}", []), connected=connected,
+            )
+            for n, link_url in enumerate(links)
+        ))
+    finally:
+        worker.cancel()
+
+async def fetch_xml(url):
+    try:
+        async with get_session().get(url) as response:
+            if response.status == 200:
+                return await response.text()
+            else:
+                print(f"Error fetching {url}: {response.status}")
+                return None
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Error fetching {url}: {e}")
+        return None
+
+def strip_ns(elem):
+    for e in elem.iter():
+        if '}' in e.tag:
+            e.tag = e.tag.split('}', 1)[1]
+
+# XMLの解析器は使うときに初めて読み込む（起動時には読み込まない）
+def parse_xml(xml_data):
+    import xml.etree.ElementTree as ET
+    try:
+        root = ET.fromstring(xml_data)
+    except ET.ParseError as e:
+        print("XML parse error:", e)
+        return None
+    strip_ns(root)
+    return root
+
+def format_observed_time(time_str):
+    try:
+        dt = datetime.fromisoformat(time_str)
+        return f"{dt.day}日{dt.hour}時{dt.minute}分"
+    except Exception as e:
+        return time_str
+
+def fetch_and_parse_individual_xml(xml_data):
+    root = parse_xml(xml_data)
+    if root is None:
+        return None
+
+    tsunami_info = []
+
+    tsunami_elem = root.find(".//Tsunami")
+    if tsunami_elem is not None:
+        observation = tsunami_elem.find("Observation")
+        if observation is not None:
+            for item in observation.findall("Item"):
+                area_name = item.find("Area/Name").text if item.find("Area/Name") is not None else "不明"
+                for station in item.findall("Station"):
+                    station_name = station.find("Name").text if station.find("Name") is not None else "不明"
+                    max_time = station.find("MaxHeight/DateTime").text if station.find("MaxHeight/DateTime") is not None else ""
+                    arrival_time = station.find("FirstHeight/ArrivalTime").text if station.find("FirstHeight/ArrivalTime") is not None else ""
+                    observed_time = max_time if max_time != "" else (arrival_time if arrival_time != "" else "不明")
+                    tsunami_height_elem = station.find("MaxHeight/TsunamiHeight")
+                    tsunami_height = None
+                    condition = None
+                    if tsunami_height_elem is not None:
+                        tsunami_height = tsunami_height_elem.attrib.get("description", None)
+                        condition = tsunami_height_elem.attrib.get("condition", None)
+                        if tsunami_height:
+                            tsunami_height = tsunami_height.translate(str.maketrans(
+                                'ａｂｃｄｅｆｇｈｉｊｋｌｍｎｏｐｑｒｓｔｕｖｗｘｙｚＡＢＣＤＥＦＧＨＩＪＫＬＭＮＯＰＱＲＳＴＵＶＷＸＹＺ１２３４５６７８９０．',
+                                'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ1234567890.'
+                            ))
+                    condition_elem = station.find("MaxHeight/Condition")
+                    if not tsunami_height and condition_elem is not None:
+                        tsunami_height = condition_elem.text if condition_elem.text else None
+                    info = {
+                        "kind": "津波観測",
+                        "observed_time": observed_time,
+                        "height": tsunami_height,
+                        "station": station_name,
+                        "area": area_name,
+                        "condition": condition
+                    }
+                    tsunami_info.append(info)
+    return tsunami_info
+
+def parse_event_links(xml_data):
+    root = parse_xml(xml_data)
+    if root is None:
+        return {"tsunami": [], "long_period": []}
+    event_links = {"tsunami": [], "long_period": []}
+    for entry in root.findall("./entry"):
+        title = entry.find("title").text
+        link = entry.find("link").attrib.get("href")
+        if "VTSE51" in link:
+            event_links["tsunami"].append(link)
+        elif "VXSE62" in link:
+            event_links["long_period"].append(link)
+    return event_links
+
+def extract_height_value(height_str):
+    try:
+        if "m以上" in height_str:
+            return float(height_str.replace("m以上", ""))
+        return float(height_str.replace("m", ""))
+    except ValueError:
+        return -1
+    
+async def process_long_period_motion(xml_data):
+    root = parse_xml(xml_data)
+    if root is None:
+        return None
+
+    long_period_info = {}
+
+    for info in root.findall(".//Information[@type='長周期地震動に関する観測情報（細分区域）']"):
+        for item in info.findall("Item"):
+            kind_name = item.find("Kind/Name").text if item.find("Kind/Name") is not None else "不明"
+            for area in item.findall("Areas/Area"):
+                area_name = area.find("Name").text if area.find("Name") is not None else "不明"
+                if area_name not in long_period_info:
+                    long_period_info[area_name] = []
+                long_period_info[area_name].append(kind_name)
+
+    # チャイムは地域ごとではなく1回だけ鳴らし、どの地域の文もチャイムの後に読む
+    cue = start_chime("SeismicWarning") if long_period_info else None
+    for area_name, kinds in long_period_info.items():
+        kinds_text = "、".join(kinds)
+        message = f"先ほどの地震により長周期地震動を観測しました。{kinds_text}を{area_name}で観測しました。"
+        print(message)
+        speak(message, EARTHQUAKE, key=area_name, after=cue)
+
+    return long_period_info
+
+last_tsunami_info = None
+last_long_period_info = None
+
+async def process_network_data():
+    global last_tsunami_info, last_long_period_info
+    while True:
+        all_tsunami_info = []
+        all_long_period_info = []
+        
+        for url in URLS:
+            xml_data = await fetch_xml(url)
+            if not xml_data:
+                continue
+
+            event_links = parse_event_links(xml_data)
+            
+            for link in event_links["tsunami"]:
+                individual_xml = await fetch_xml(link)
+                if individual_xml:
+                    tsunami_info = fetch_and_parse_individual_xml(individual_xml)
+                    if tsunami_info:
+                        all_tsunami_info.extend(tsunami_info)
+
+            for link in event_links["long_period"]:
+                long_period_xml = await fetch_xml(link)
+                if long_period_xml:
+                    long_period_info = await process_long_period_motion(long_period_xml)
+                    if long_period_info:
+                        all_long_period_info.extend(long_period_info)
+
+        sorted_tsunami_info = sorted(
+            all_tsunami_info, 
+            key=lambda x: extract_height_value(x['height']), 
+            reverse=True
+        )
+
+        if sorted_tsunami_info:
+            if sorted_tsunami_info == last_tsunami_info:
+                await asyncio.sleep(60)
+                continue
+
+            last_tsunami_info = sorted_tsunami_info
+
+            header_message = "津波観測情報。沿岸で津波を観測しています。観測地点と観測時刻、観測した津波の最大波をお伝えします。"
+            cue = start_chime("Observation")
+            print(header_message)
+            speak(header_message, OBSERVATION, key="header", after=cue)
+
+            for info in sorted_tsunami_info:
+                formatted_time = format_observed_time(info['observed_time']) if info['observed_time'] != "不明" else "不明"
+                height_message = info['height']
+                condition_message = f"、{info['condition']}" if info['condition'] else ""
+                message = f"{info['station']}、{formatted_time}、{height_message}{condition_message}。"
+                print(message)
+                speak(message, OBSERVATION, key=info['station'])
+
+        if all_long_period_info:
+            if all_long_period_info == last_long_period_info:
+                await asyncio.sleep(60)
+                continue
+
+            last_long_period_info = all_long_period_info
+
+        await asyncio.sleep(60)
+
+# 発表中の情報を読むローカルAPIを開く（STATE_API の PORT が 0 なら開かない）
+async def start_state_api():
+    global state_server
+    host, port = STATE_API.get("HOST", "127.0.0.1"), STATE_API.get("PORT", 50090)
+    if not port:
+        return
+    try:
+        state_server = await StateServer(
+            active_state, host, port, STATE_API.get("ALLOW_ORIGIN") or None,
+            reread=reread_tsunami, token=STATE_API.get("REREAD_TOKEN"),
+        ).start()
+        print(f"状態API: http://{host}:{state_server.port}/state")
+    except OSError as e:
+        print(f"状態APIを開始できませんでした: {e}")
+
+# 急がない処理（音声の読み込み・気象庁XMLの取得）は、EEW / P2P の接続がそろってから始める
+# STARTUP_GRACE 秒たってもそろわなければ、待たずに始める
+async def start_background(connected):
+    try:
+        await asyncio.wait_for(asyncio.gather(*(event.wait() for event in connected)), CONFIG.get("STARTUP_GRACE", 5.0))
+    except asyncio.TimeoutError:
+        print("受信の接続を待たずに、音声とXMLの取得を始めます")
+    await start_state_api()
+    try:
+        loaded = await asyncio.to_thread(sound_player.preload)
+        print(f"効果音を読み込みました: {loaded}/{len(set(SOUND_FILES.values()))}件 {sound_player.stats()['sink']}")
+    except Exception as e:
+        print(f"音声の読み込みに失敗しました: {e}")
+    await process_network_data()
+
+async def main():
+    connected = [asyncio.Event(), asyncio.Event()]
+    try:
+        await asyncio.gather(
+            ws_handler(EEW_URL, on_eew_message, feed="eew", connected=connected[0]),
+            ws_handler(P2PQUAKE_URL, lambda msg, _: on_message(msg), feed="p2p", connected=connected[1]),
+            scheduler.run(),
+            start_background(connected),
+        )
+    finally:
+        print(f"読み上げキュー: {scheduler.stats()} 棒読みちゃん: {flow_control.stats()} {get_client().stats()}")
+        for name, queue in feed_queues.items():
+            print(f"受信キュー（{name}）: {queue.stats()} 接続ごとの先着 {feed_links[name].stats()}")
+        print(f"P2P電文の解析: {p2p_filter.stats()} 地震情報のまとめ: {quake_windows.stats()}")
+        print(f"緊急地震速報: {eew_tracker.stats()} 効果音: {sound_player.stats()}")
+        print(f"発表中の情報: {active_state.stats()} 状態API: {state_server.stats() if state_server else '使っていません'}")
+        for name, gaps in disconnect_gaps.items():
+            if gaps:
+                print(f"切断（{name}）: {len(gaps)}回 最長 {max(gaps):.2f}秒")
+        if state_server is not None:
+            await state_server.stop()
+        await close_session()
+        await close_client()
+        sound_player.close()
+
+if __name__ == '__main__':
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,161 @@
+# 効果音を鳴らすよう頼んでから、最初のサンプルが出力先に渡るまでの時間を測る
+# 毎回: 従来の playsound と同じく、鳴らすたびにファイルを開いて変換し、出力先を作る
+# 常駐: yomiage.audio.SoundPlayer と同じく、変換済みの PCM を開いたままの出力先に流す
+# 出力先は音を出さない NullSink（10ミリ秒ごとに読み出す）と、miniaudio があれば実際のデバイス
+# playsound 自体が使える環境なら、呼んでから戻るまでの時間と音の長さの差（再生以外にかかった時間）も表示する
+# 変換できない音を続けて鳴らしたとき、SoundPlayer が playsound で呼んだ順に1つずつ鳴らすかも確かめる
+# （playsound の代わりに、呼ばれた時刻を記録して少し待つ関数を使う）
+# 緊急の音（urgent、鳴り始めに cue を完了させるもの）は、前の音が鳴っていても待たずに鳴らし、cue もすぐに完了するかも確かめる
+# 使い方: python bench/bench_audio.py [回数]
+import os
+import sys
+import time
+import wave
+import random
+import asyncio
+import tempfile
+import threading
+import contextlib
+
+from common import ROOT, percentile
+from yomiage import audio
+from yomiage.audio import SoundPlayer, PCMStream, NullSink, DeviceSink, decode_file, get_miniaudio, play_file, SAMPLE_RATE, FRAME_BYTES
+
+SOUNDS = os.path.join(ROOT, "TEST", "NON TEST", "Sounds")
+
+def write_wav(path, seconds):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes(bytes(int(SAMPLE_RATE * seconds) * FRAME_BYTES))
+
+# 前の音を打ち切って pcm を流し、requested（perf_counter）から最初のサンプルが読み出されるまでの秒数を返す
+def first_sample(stream, pcm, requested):
+    played = stream.played
+    sound = stream.submit(pcm, urgent=True)
+    while stream.played == played:
+        time.sleep(0.0002)
+    return sound.submitted + stream.latencies[-1] - requested
+
+def per_call(sink_type, path, runs):
+    times = []
+    for _ in range(runs):
+        time.sleep(random.uniform(0.0, 0.05))
+        requested = time.perf_counter()
+        pcm = decode_file(path)
+        stream = PCMStream()
+        sink = sink_type(stream)
+        times.append(first_sample(stream, pcm, requested))
+        sink.close()
+    return times
+
+def resident(sink_type, path, runs):
+    pcm = decode_file(path)
+    stream = PCMStream()
+    sink = sink_type(stream)
+    times = []
+    for _ in range(runs):
+        time.sleep(random.uniform(0.0, 0.05))
+        times.append(first_sample(stream, pcm, time.perf_counter()))
+    sink.close()
+    return times
+
+def playsound_overhead(path, seconds, runs, timeout=10.0):
+    times = []
+    for _ in range(runs):
+        result = []
+        def play():
+            try:
+                started = time.perf_counter()
+                play_file(path)
+                result.append(time.perf_counter() - started - seconds)
+            except Exception as e:
+                result.append(e)
+        thread = threading.Thread(target=play, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        if not result or isinstance(result[0], Exception):
+            return result[0] if result else TimeoutError("playsound が戻りません")
+        times.append(result[0])
+    return times
+
+# 読み込めない音を names の順に start し、[(音, 鳴り始め, 鳴り終わり)] と、cue が完了した順の音を返す
+# urgent の音は urgent=True, lead=無限大（鳴り始めに cue を完了させる）で、gap 秒あけて start する
+async def fallback_order(workdir, names, seconds=0.05, urgent=(), gap=0.0):
+    played = []
+    def record(path):
+        started = time.perf_counter()
+        time.sleep(seconds)
+        played.append((os.path.basename(path), started, time.perf_counter()))
+    cued = []
+    player = SoundPlayer(os.path.join(workdir, "missing"), {name: f"{name}.mp3" for name in names})
+    original, audio.play_file = audio.play_file, record
+    try:
+        with contextlib.redirect_stdout(None):
+            cues = []
+            for name in names:
+                if name in urgent:
+                    await asyncio.sleep(gap)
+                    cues.append(player.start(name, urgent=True, lead=float("inf")))
+                else:
+                    cues.append(player.start(name))
+                cues[-1].add_done_callback(lambda _, name=name: cued.append((name, time.perf_counter())))
+            await asyncio.gather(*cues)
+            await asyncio.gather(*player._tasks)
+    finally:
+        audio.play_file = original
+    return played, cued
+
+def check_fallback_order(workdir):
+    names = ["Tsunamicancel", "Tsunami", "EEWWarning"]
+    played, cued = asyncio.run(fallback_order(workdir, names))
+    assert [name for name, _, _ in played] == [f"{name}.mp3" for name in names], played
+    assert all(later[1] >= earlier[2] for earlier, later in zip(played, played[1:])), played
+    assert [name for name, _ in cued] == names, cued
+    print(f"playsound fallback: {len(names)} sounds in call order, no overlap")
+
+def check_urgent_fallback(workdir, seconds=0.3):
+    names = ["Tsunami", "EEWWarning"]
+    started = time.perf_counter()
+    played, cued = asyncio.run(fallback_order(workdir, names, seconds, urgent={"EEWWarning"}, gap=0.05))
+    starts = {name: start - started for name, start, _ in played}
+    cue_at = dict(cued)["EEWWarning"] - started
+    # 津波のチャイムが鳴り終わる（seconds 秒）のを待たずに、緊急地震速報のチャイムが鳴り始め、cue も完了する
+    assert starts["EEWWarning.mp3"] < seconds and cue_at < seconds, (starts, cue_at)
+    print(f"playsound fallback: urgent chime started at {starts['EEWWarning.mp3'] * 1000:.0f} ms, "
+          f"cue at {cue_at * 1000:.0f} ms (previous chime {seconds * 1000:.0f} ms)")
+
+def line(name, seconds):
+    ms = [s * 1000 for s in seconds]
+    return f"{name:<30}{len(ms):>6}{percentile(ms, 50):>10.2f}{percentile(ms, 99):>10.2f}"
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with tempfile.TemporaryDirectory() as workdir:
+        if get_miniaudio() is not None:
+            path = os.path.join(SOUNDS, "Eewwarning.mp3")
+        else:
+            path = os.path.join(workdir, "chime.wav")
+            write_wav(path, 2.0)
+        seconds = len(decode_file(path)) / FRAME_BYTES / SAMPLE_RATE
+        started = time.perf_counter()
+        for _ in range(runs):
+            decode_file(path)
+        print(f"sound: {os.path.basename(path)} ({seconds:.2f} s)  decode: {(time.perf_counter() - started) / runs * 1000:.2f} ms")
+        print(f"{'time to first sample':<30}{'count':>6}{'p50 ms':>10}{'p99 ms':>10}")
+        sinks = [("null", NullSink)]
+        if get_miniaudio() is not None:
+            sinks.append(("device", DeviceSink))
+        else:
+            print("miniaudio がないため、デバイスへの出力は測りません")
+        for name, sink_type in sinks:
+            print(line(f"{name}: per call", per_call(sink_type, path, runs)))
+            print(line(f"{name}: resident", resident(sink_type, path, runs)))
+        check_fallback_order(workdir)
+        check_urgent_fallback(workdir)
+        overhead = playsound_overhead(path, seconds, min(runs, 5))
+        if isinstance(overhead, Exception):
+            print(f"playsound: 使えません（{type(overhead).__name__}: {overhead}）")
+        else:
+            print(line("playsound: call - duration", overhead))
@@ -0,0 +1,179 @@
+# 棒読みちゃんが落ちてから復旧するまでの、ブレーカー（yomiage.breaker）の動きを確かめて測る
+# 開く → 退避（EEWを残して優先度の低いものから捨てる）→ 復旧 → 優先度順の読み直し、
+# 読み直しの途中で再び落ちたとき（残りを戻して開き直す）、古いEEWを読み直さないことを確かめる
+# 1回だけ失敗して（開かずに）退避したものは、次の送信の前に送り直すことも確かめる
+# 非同期版は棒読みちゃんの代役に、同期版は記録するだけの偽のクライアントに送る
+# 使い方: python bench/bench_breaker.py
+import time
+import asyncio
+
+from common import percentile
+from yomiage.bouyomi import create_client
+from yomiage.breaker import CircuitBreaker, SyncCircuitBreaker, OPEN, CLOSED
+from yomiage.mock_bouyomi import MockBouyomi
+from yomiage.scheduler import EEW_WARNING, TSUNAMI, EARTHQUAKE, OBSERVATION
+
+# up が False の間、または down_after 回送ったあとは、接続できないものとして失敗する
+class Switch:
+    def __init__(self, client):
+        self.client = client
+        self.up = True
+        self.down_after = None
+
+    def _check(self):
+        if self.down_after is not None:
+            if self.down_after == 0:
+                self.up = False
+                self.down_after = None
+            else:
+                self.down_after -= 1
+        if not self.up:
+            raise ConnectionError("棒読みちゃんが停止しています")
+
+    async def talk(self, text, *args, timeout=None):
+        self._check()
+        return await self.client.talk(text, *args, timeout=timeout)
+
+    async def get_task_count(self, timeout=None):
+        if not self.up:
+            raise ConnectionError("棒読みちゃんが停止しています")
+        return await self.client.get_task_count(timeout=timeout)
+
+    async def close(self):
+        await self.client.close()
+
+async def wait_state(breaker, state, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while breaker.state != state and time.perf_counter() < deadline:
+        await asyncio.sleep(0.005)
+    assert breaker.state == state, breaker.stats()
+
+async def check_async():
+    async with MockBouyomi(chars_per_second=1000.0) as mock:
+        switch = Switch(create_client(dict(mock.config, TRANSPORT="http")))
+        breaker = CircuitBreaker(switch, timeout=0.5, probe_interval=0.02, buffer_size=3)
+        # 1回だけ失敗したもの（開かない）は、次に送るときに先に送り直す
+        switch.up = False
+        await breaker.talk("地震一時", priority=EARTHQUAKE)
+        assert breaker.state == CLOSED and len(breaker.buffer) == 1
+        switch.up = True
+        await breaker.talk("地震次", priority=EARTHQUAKE)
+        await mock.wait_for_arrivals(2)
+        assert [a.text for a in mock.arrivals] == ["地震一時", "地震次"] and not breaker.buffer
+        assert breaker.replayed == 1
+        mock.arrivals.clear()
+        breaker.replayed = 0
+        switch.up = False
+        # 観測情報は退避しない。2回失敗して開く
+        await breaker.talk("観測0", priority=OBSERVATION)
+        await breaker.talk("観測1", priority=OBSERVATION)
+        assert breaker.state == OPEN and breaker.dropped == 2
+        # EEW警報のあとに地震情報が3件届いても、EEWは残り、古い地震情報から捨てる
+        fast = []
+        for text, priority in [("EEW", EEW_WARNING), ("地震0", EARTHQUAKE), ("地震1", EARTHQUAKE),
+                               ("地震2", EARTHQUAKE), ("津波", TSUNAMI)]:
+            started = time.perf_counter()
+            await breaker.talk(text, priority=priority)
+            fast.append((time.perf_counter() - started) * 1e6)
+        assert [item.text for item in breaker.buffer] == ["EEW", "地震2", "津波"], breaker.buffer
+        assert breaker.dropped == 4
+        # 復旧したら優先度順に読み直す
+        switch.up = True
+        await wait_state(breaker, CLOSED)
+        await mock.wait_for_arrivals(3)
+        assert [a.text for a in mock.arrivals] == ["EEW", "津波", "地震2"]
+        assert breaker.replayed == 3
+
+        # 読み直しの途中で落ちたら、残りを戻して開き直し、次の復旧で読み直す
+        switch.up = False
+        await breaker.talk("地震3", priority=EARTHQUAKE)
+        await breaker.talk("地震4", priority=EARTHQUAKE)
+        await wait_state(breaker, OPEN)
+        await breaker.talk("津波2", priority=TSUNAMI)
+        switch.down_after = 1
+        switch.up = True
+        deadline = time.perf_counter() + 2.0
+        while breaker.replayed < 4 and time.perf_counter() < deadline:
+            await asyncio.sleep(0.005)
+        await wait_state(breaker, OPEN)
+        assert [item.text for item in breaker.buffer] == ["地震3", "地震4"], breaker.buffer
+        switch.up = True
+        await wait_state(breaker, CLOSED)
+        await mock.wait_for_arrivals(6)
+        assert [a.text for a in mock.arrivals[3:]] == ["津波2", "地震3", "地震4"]
+
+        # 古いEEWは読み直さない（地震情報は読み直す）
+        breaker.eew_max_age = 0.05
+        switch.up = False
+        await breaker.talk("EEW古", priority=EEW_WARNING)
+        await breaker.talk("地震5", priority=EARTHQUAKE)
+        await wait_state(breaker, OPEN)
+        dropped = breaker.dropped
+        await asyncio.sleep(0.1)
+        switch.up = True
+        await wait_state(breaker, CLOSED)
+        await mock.wait_for_arrivals(7)
+        assert [a.text for a in mock.arrivals[6:]] == ["地震5"] and breaker.dropped == dropped + 1
+        stats = breaker.stats()
+        await breaker.close()
+        return fast, stats
+
+# 同期版の偽のクライアント（送った本文を記録する）
+class SyncSwitch(Switch):
+    def __init__(self):
+        super().__init__(None)
+        self.sent = []
+
+    def talk(self, text, *args, timeout=None):
+        self._check()
+        self.sent.append(text)
+        return 200
+
+    def get_task_count(self, timeout=None):
+        if not self.up:
+            raise ConnectionError("棒読みちゃんが停止しています")
+        return 0
+
+    def close(self):
+        pass
+
+def wait_sync(breaker, state, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while breaker.state != state and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    assert breaker.state == state, breaker.stats()
+
+def check_sync():
+    switch = SyncSwitch()
+    breaker = SyncCircuitBreaker(switch, probe_interval=0.02, buffer_size=3)
+    switch.up = False
+    breaker.talk("地震一時", priority=EARTHQUAKE)
+    assert breaker.state == CLOSED and len(breaker.buffer) == 1
+    switch.up = True
+    breaker.talk("地震次", priority=EARTHQUAKE)
+    assert switch.sent == ["地震一時", "地震次"] and not breaker.buffer and breaker.replayed == 1
+    switch.sent.clear()
+    breaker.replayed = 0
+    switch.up = False
+    for text, priority in [("EEW", EEW_WARNING), ("地震0", EARTHQUAKE), ("地震1", EARTHQUAKE),
+                           ("地震2", EARTHQUAKE), ("津波", TSUNAMI)]:
+        breaker.talk(text, priority=priority)
+    assert breaker.state == OPEN
+    assert [item.text for item in breaker.buffer] == ["EEW", "地震2", "津波"], breaker.buffer
+    switch.down_after = 1
+    switch.up = True
+    deadline = time.perf_counter() + 2.0
+    while breaker.replayed < 1 and time.perf_counter() < deadline:
+        time.sleep(0.005)
+    wait_sync(breaker, OPEN)
+    assert switch.sent == ["EEW"] and [item.text for item in breaker.buffer] == ["津波", "地震2"]
+    switch.up = True
+    wait_sync(breaker, CLOSED)
+    assert switch.sent == ["EEW", "津波", "地震2"] and breaker.replayed == 3
+    return breaker.stats()
+
+if __name__ == "__main__":
+    fast, stats = asyncio.run(check_async())
+    print(f"async: open / buffer / recover / replay order ok  {stats}")
+    print(f"       talk while open: p50 {percentile(fast, 50):.1f} us, max {max(fast):.1f} us")
+    print(f"sync:  open / buffer / recover / replay order ok  {check_sync()}")
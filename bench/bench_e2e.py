@@ -0,0 +1,89 @@
+# 統合版（NontestandTsunami2.py）に P2P 551/552 と Wolfx EEW の電文を流し込み、
+# WebSocketで送ってから棒読みちゃんの代役に読み上げ要求が届くまでの時間を測る
+# 使い方: python bench/bench_e2e.py [各電文の件数] [送信間隔ミリ秒]
+import io
+import sys
+import time
+import asyncio
+import tempfile
+import contextlib
+
+from common import FeedServer, load_integrated, integrated_config, percentile, quake_payload, tsunami_payload, eew_payload
+from yomiage.mock_bouyomi import MockBouyomi
+
+P2P_PATH = "v2/ws"
+EEW_PATH = "jma_eew"
+
+def frames(count):
+    for i in range(count):
+        # 読み上げ文に必ず含まれる目印で、送った電文と届いた読み上げを対応づける
+        # 津波予報は区切りごとに届くので、最初の地域の1行で対応づける
+        yield "EEW", EEW_PATH, eew_payload(i), f"震源地は震源{i}、", "緊急地震速報"
+        yield "551", P2P_PATH, quake_payload(i), f"震源地は震源{i}、", "地震情報"
+        yield "552", P2P_PATH, tsunami_payload(i), f"沿岸{i}-0、", f"沿岸{i}-0、"
+
+def match(arrival, sent):
+    for (kind, marker, prefix), started in sent.items():
+        if marker in arrival.text and arrival.text.startswith(prefix):
+            return kind, arrival.received - started
+    return None, None
+
+async def run(count, interval):
+    with tempfile.TemporaryDirectory() as workdir:
+        async with MockBouyomi(chars_per_second=1e6) as mock:
+            feed = await FeedServer().start()
+            bouyomi = dict(integrated_config().get("BOUYOMI", {}), TRANSPORT="http", **mock.config)
+            # 地震情報をまとめる待ち時間（QUAKE_COALESCE）は意図した遅れなので、ここでは測らない
+            module = load_integrated(
+                workdir, EEW_URL=feed.url(EEW_PATH), P2PQUAKE_URL=feed.url(P2P_PATH),
+                SOUND_FILES={}, BOUYOMI=bouyomi, QUAKE_COALESCE=0,
+            )
+            tasks = [
+                asyncio.create_task(module.ws_handler(module.EEW_URL, module.on_eew_message)),
+                asyncio.create_task(module.ws_handler(module.P2PQUAKE_URL, lambda msg, _: module.on_message(msg))),
+                asyncio.create_task(module.scheduler.run()),
+            ]
+            links = module.CONFIG.get("WS_LINKS", 1)
+            await feed.wait_connected(EEW_PATH, links)
+            await feed.wait_connected(P2P_PATH, links)
+            sent = {}
+            for kind, path, payload, marker, prefix in frames(count):
+                sent[(kind, marker, prefix)] = time.perf_counter()
+                await feed.send(path, payload)
+                await asyncio.sleep(interval)
+            deadline = time.perf_counter() + 5.0
+            while sum(1 for arrival in mock.arrivals if match(arrival, sent)[0]) < len(sent):
+                if time.perf_counter() > deadline:
+                    break
+                await asyncio.sleep(0.01)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await module.close_session()
+            await module.close_client()
+            await feed.stop()
+    latencies = {}
+    for arrival in mock.arrivals:
+        kind, latency = match(arrival, sent)
+        if kind:
+            latencies.setdefault(kind, []).append(latency * 1000)
+    return len(sent), latencies
+
+def report(total, latencies):
+    print(f"{'kind':<6}{'spoken':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    everything = []
+    for kind in ("EEW", "551", "552"):
+        values = latencies.get(kind, [])
+        everything += values
+        if values:
+            print(f"{kind:<6}{len(values):>8}{percentile(values, 50):>10.2f}{percentile(values, 99):>10.2f}{max(values):>10.2f}")
+    if everything:
+        print(f"{'all':<6}{len(everything):>8}{percentile(everything, 50):>10.2f}{percentile(everything, 99):>10.2f}{max(everything):>10.2f}")
+    print(f"frames sent: {total}")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    interval = (float(sys.argv[2]) if len(sys.argv) > 2 else 20.0) / 1000
+    with contextlib.redirect_stdout(io.StringIO()):
+        total, latencies = asyncio.run(run(count, interval))
+    report(total, latencies)
@@ -0,0 +1,82 @@
+# EEW警報をWebSocketで送ってから、棒読みちゃんの代役に最初の読み上げ要求が届くまでの時間を測る
+# 第1段（チャイムと短い呼びかけ）を使う場合と、使わない場合（チャイムを鳴らし終えてから詳しい文）を比べる
+# チャイムは chime 秒の無音の wav を作り、音を出さない出力先（yomiage.audio.NullSink）で実際の長さだけ流す
+# 使い方: python bench/bench_eew_stages.py [件数] [チャイムの秒数]
+import io
+import os
+import sys
+import wave
+import time
+import asyncio
+import tempfile
+import contextlib
+
+from common import FeedServer, load_integrated, integrated_config, percentile, eew_payload
+from yomiage.mock_bouyomi import MockBouyomi
+
+EEW_PATH = "jma_eew"
+
+def write_chime(path, seconds):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(44100)
+        f.writeframes(bytes(int(44100 * seconds) * 4))
+
+async def run(count, chime, first_phrase):
+    with tempfile.TemporaryDirectory() as workdir:
+        async with MockBouyomi(chars_per_second=1e6) as mock:
+            feed = await FeedServer().start()
+            bouyomi = dict(integrated_config().get("BOUYOMI", {}), TRANSPORT="http", **mock.config)
+            write_chime(os.path.join(workdir, "chime.wav"), chime)
+            module = load_integrated(
+                workdir, EEW_URL=feed.url(EEW_PATH), BOUYOMI=bouyomi, WS_LINKS=1, EEW_FIRST_PHRASE=first_phrase,
+                SOUNDS_DIR=workdir, SOUND_FILES={"EEWWarning": "chime.wav"}, AUDIO={"SINK": "null"},
+            )
+            module.sound_player.preload()
+            tasks = [
+                asyncio.create_task(module.ws_handler(module.EEW_URL, module.on_eew_message)),
+                asyncio.create_task(module.scheduler.run()),
+            ]
+            await feed.wait_connected(EEW_PATH)
+            sent = {}
+            for i in range(count):
+                sent[i] = time.perf_counter()
+                await feed.send(EEW_PATH, eew_payload(i, warn=True))
+                await asyncio.sleep(chime + 0.1)
+            await mock.wait_for_arrivals(count * (2 if first_phrase else 1), timeout=5.0)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await module.close_session()
+            await module.close_client()
+            module.sound_player.close()
+            await feed.stop()
+    first, detail = [], []
+    for i, started in sent.items():
+        marker = f"震源地は震源{i}、"
+        arrivals = [a for a in mock.arrivals if a.received >= started]
+        details = [a for a in arrivals if marker in a.text]
+        if not details:
+            continue
+        detail.append((details[0].received - started) * 1000)
+        first.append((min(a.received for a in arrivals if a.received <= details[0].received) - started) * 1000)
+    return first, detail
+
+def line(name, values):
+    if values:
+        return f"{name:<26}{len(values):>6}{percentile(values, 50):>10.2f}{percentile(values, 99):>10.2f}"
+    return f"{name:<26}{0:>6}"
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    chime = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    phrase = integrated_config().get("EEW_FIRST_PHRASE") or "緊急地震速報。強い揺れに警戒してください"
+    with contextlib.redirect_stdout(io.StringIO()):
+        one_first, one_detail = asyncio.run(run(count, chime, ""))
+        two_first, two_detail = asyncio.run(run(count, chime, phrase))
+    print(f"chime length: {chime:.2f} s")
+    print(f"{'':<26}{'count':>6}{'p50 ms':>10}{'p99 ms':>10}")
+    print(line("single stage: first Talk", one_first))
+    print(line("two stage: first Talk", two_first))
+    print(line("two stage: detail Talk", two_detail))
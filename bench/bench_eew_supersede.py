@@ -0,0 +1,80 @@
+# 同じ地震のEEWの続報が、前の報を棒読みちゃんが待たせている間・読み上げている間に届いたときの動きを確かめる
+# 棒読みちゃんの代役（読む速さを遅くしたもの）に対して統合版を動かし、消した（Clear）・打ち切った（Skip）回数を見る
+# （CLEAR_ON_WARNING は切り、続報の取り下げで送った Clear / Skip だけを数える）
+#   queued : 第1報の詳しい文が呼びかけの後ろで待っている → 詳しい文だけを消す（読み上げ中の呼びかけは打ち切らない）
+#   playing: 第1報の詳しい文を読み上げている → 打ち切る
+#   other  : 第1報の後にほかの読み上げを送った → 棒読みちゃんに残っているのが第1報だけだと確かめられないので何もしない
+# 使い方: python bench/bench_eew_supersede.py
+import io
+import os
+import time
+import asyncio
+import tempfile
+import contextlib
+
+from common import FeedServer, load_integrated, integrated_config, eew_payload
+from bench_eew_stages import write_chime
+from yomiage.mock_bouyomi import MockBouyomi
+from yomiage.scheduler import TSUNAMI
+
+EEW_PATH = "jma_eew"
+PHRASE = "緊急地震速報。強い揺れに警戒してください"
+CHARS_PER_SECOND = 10.0
+
+async def wait_until(condition, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            raise AssertionError("時間内に条件がそろいませんでした")
+        await asyncio.sleep(0.01)
+
+async def run(case):
+    with tempfile.TemporaryDirectory() as workdir:
+        async with MockBouyomi(chars_per_second=CHARS_PER_SECOND) as mock:
+            feed = await FeedServer().start()
+            bouyomi = dict(integrated_config().get("BOUYOMI", {}), TRANSPORT="http", CLEAR_ON_WARNING=False, **mock.config)
+            write_chime(os.path.join(workdir, "chime.wav"), 0.05)
+            module = load_integrated(
+                workdir, EEW_URL=feed.url(EEW_PATH), BOUYOMI=bouyomi, WS_LINKS=1, EEW_FIRST_PHRASE=PHRASE,
+                SOUNDS_DIR=workdir, SOUND_FILES={"EEWWarning": "chime.wav"}, AUDIO={"SINK": "null"},
+            )
+            module.sound_player.preload()
+            tasks = [
+                asyncio.create_task(module.ws_handler(module.EEW_URL, module.on_eew_message)),
+                asyncio.create_task(module.scheduler.run()),
+            ]
+            await feed.wait_connected(EEW_PATH)
+            await feed.send(EEW_PATH, eew_payload(0, serial=1, warn=True))
+            await mock.wait_for_arrivals(2, timeout=5.0)
+            detail = mock.arrivals[1]
+            if case == "playing":
+                await wait_until(lambda: time.perf_counter() > detail.started + 0.2)
+            elif case == "other":
+                module.speak("津波の読み上げ", TSUNAMI)
+                await mock.wait_for_arrivals(3, timeout=5.0)
+            update = dict(eew_payload(0, serial=2, warn=True), Magunitude=8.0)
+            await feed.send(EEW_PATH, update)
+            await wait_until(lambda: any("8.0" in a.text for a in mock.arrivals))
+            result = (mock.cleared, mock.skipped, module.flow_control.withdrawn)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await module.close_session()
+            await module.close_client()
+            module.sound_player.close()
+            await feed.stop()
+    return result
+
+# 事例ごとの (Clear の回数, Skip の回数, 取り下げた回数)
+EXPECTED = {
+    "queued": (1, 0, 1),
+    "playing": (0, 1, 1),
+    "other": (0, 0, 0),
+}
+
+if __name__ == "__main__":
+    for case, expected in EXPECTED.items():
+        with contextlib.redirect_stdout(io.StringIO()):
+            cleared, skipped, withdrawn = asyncio.run(run(case))
+        assert (cleared, skipped, withdrawn) == expected, (case, cleared, skipped, withdrawn)
+        print(f"{case:<8} clear {cleared}  skip {skipped}  withdrawn {withdrawn}  ok")
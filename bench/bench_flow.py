@@ -0,0 +1,106 @@
+# 地震情報・観測情報が大量に届いたあとにEEW警報が来たときの、棒読みちゃん側の滞留を比較する
+# 比べる前に、送る・待たせる・消してから送るの判定と、棒読みちゃんへの Clear / Skip を確かめる
+# 使い方: python bench/bench_flow.py
+import time
+import asyncio
+
+import common  # noqa: F401  リポジトリ直下を import パスに追加する
+from yomiage.bouyomi import create_client
+from yomiage.flow import BouyomiFlowControl, decide, SEND, CLEAR
+from yomiage.mock_bouyomi import MockBouyomi
+from yomiage.scheduler import (
+    SpeechScheduler, SpeechItem, HOLD, EEW_WARNING, EEW_FORECAST, TSUNAMI, EARTHQUAKE, OBSERVATION,
+)
+
+EEW_TEXT = "緊急地震速報（警報）第1報。推定最大震度は6弱です。"
+
+# (優先度, 待ち件数, 再生中か, clear_on_warning, 期待する判定)。max_tasks は 3
+DECISIONS = [
+    (EEW_WARNING, 5, True, True, CLEAR),
+    (EEW_WARNING, 0, True, True, CLEAR),
+    (EEW_WARNING, 0, False, True, SEND),
+    (EEW_WARNING, 5, True, False, SEND),
+    (EEW_FORECAST, 9, True, True, SEND),
+    (TSUNAMI, 9, True, True, SEND),
+    (EARTHQUAKE, 3, True, True, HOLD),
+    (EARTHQUAKE, 2, True, True, SEND),
+    (OBSERVATION, 3, False, False, HOLD),
+    (OBSERVATION, 0, False, False, SEND),
+]
+
+def check_decide():
+    for priority, task_count, now_playing, clear_on_warning, expected in DECISIONS:
+        action = decide(priority, task_count, now_playing, 3, clear_on_warning)
+        assert action == expected, (priority, task_count, now_playing, clear_on_warning, action)
+
+# 棒読みちゃんの代役に対して BouyomiFlowControl.check の判定と Clear / Skip の回数を確かめる
+# 続けて送ったEEW警報どうしは消し合わない（_warnings_only）。間に別の読み上げを送れば、次の警報でまた消す
+async def check_gate():
+    async with MockBouyomi(chars_per_second=5.0) as mock:
+        client = create_client(dict(mock.config, TRANSPORT="http"))
+        gate = BouyomiFlowControl(client, max_tasks=3, clear_on_warning=True, poll_interval=0.0)
+
+        async def check(text, priority):
+            action = await gate.check(SpeechItem(text, priority, None, 0))
+            if action != HOLD:
+                await client.talk(text)
+            return action
+
+        for i in range(5):
+            await client.talk(f"観測点{i}の観測情報です。")
+        assert await check("地震情報です。", EARTHQUAKE) == HOLD
+        assert (mock.cleared, mock.skipped) == (0, 0)
+        assert await check("津波情報です。", TSUNAMI) == SEND
+        assert await check("緊急地震速報（警報）第1報。", EEW_WARNING) == CLEAR
+        assert (mock.cleared, mock.skipped) == (1, 1)
+        # 待っていた読み上げは消え、警報だけが読まれている
+        assert mock.task_count() == 0 and mock.now_playing()
+        assert await check("緊急地震速報（警報）第2報。", EEW_WARNING) == SEND
+        assert (mock.cleared, mock.skipped) == (1, 1)
+        assert await check("緊急地震速報（予報）第1報。", EEW_FORECAST) == SEND
+        assert await check("緊急地震速報（警報）第3報。", EEW_WARNING) == CLEAR
+        assert (mock.cleared, mock.skipped) == (2, 2)
+        assert gate.stats()["held"] == 1 and gate.stats()["clears"] == 2
+        await client.close()
+
+async def run(use_gate):
+    async with MockBouyomi(chars_per_second=400.0) as mock:
+        client = create_client(dict(mock.config, TRANSPORT="http"))
+        gate = BouyomiFlowControl(client, max_tasks=3, clear_on_warning=True, poll_interval=0.02) if use_gate else None
+        scheduler = SpeechScheduler(lambda text, priority: client.talk(text), gate=gate, hold_interval=0.02)
+        worker = asyncio.create_task(scheduler.run())
+        max_backlog = 0
+        for i in range(40):
+            scheduler.submit(f"観測点{i}、{i % 12 + 1}時{i}分、0.{i % 9 + 1}メートル。" * 3, OBSERVATION, key=i)
+            if i % 10 == 0:
+                scheduler.submit(f"地震情報。{i}時ごろ地震がありました。" * 4, EARTHQUAKE, key=i)
+            await asyncio.sleep(0.005)
+            max_backlog = max(max_backlog, mock.task_count())
+        submitted = time.perf_counter()
+        eew = scheduler.submit(EEW_TEXT, EEW_WARNING)
+        await eew.done
+        assert mock.cleared == (1 if use_gate else 0)
+        # EEWが実際に読み始められるまでの時間（モック内の再生開始時刻から求める）
+        start = next(a.started for a in mock.arrivals if a.text == EEW_TEXT)
+        worker.cancel()
+        await client.close()
+        return {
+            "max_backlog": max_backlog,
+            "talks": len(mock.arrivals),
+            "eew_audible_ms": (max(start, submitted) - submitted) * 1000,
+            "scheduler": scheduler.stats(),
+            "gate": gate.stats() if gate else None,
+        }
+
+async def main():
+    check_decide()
+    await check_gate()
+    print(f"decisions: {len(DECISIONS)} cases ok, gate: hold / clear / skip ok")
+    for use_gate in (False, True):
+        result = await run(use_gate)
+        print(f"flow control {'on ' if use_gate else 'off'}: backlog max {result['max_backlog']:>3} tasks, "
+              f"{result['talks']:>3} talks, EEW audible after {result['eew_audible_ms']:.1f} ms, "
+              f"merged {result['scheduler']['merged']}, gate {result['gate']}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,72 @@
+# 観測点の多い DetailScale で、都道府県ごとの最大震度の集計にかかる時間を比べる
+# 従来の集計と yomiage.intensity.group_by_scale の読み上げ文が一致することも確かめる
+# 使い方: python bench/bench_intensity.py [観測点の数] [繰り返し回数]
+import sys
+import time
+import random
+
+from common import PREFS, SCALES
+from yomiage import intensity
+
+SCALE_TEXT = {10: "震度1", 20: "震度2", 30: "震度3", 40: "震度4", 45: "震度5弱", 46: "震度5弱以上と推定",
+              50: "震度5強", 55: "震度6弱", 60: "震度6強", 70: "震度7"}
+
+# 変更前の format_points_info と同じ集計
+def format_loop(points):
+    max_scale_region = {}
+    for point in points:
+        scale = point.get('scale', -1)
+        if scale > 0:
+            pref = point.get('pref', '不明')
+            max_scale_region[pref] = max(max_scale_region.get(pref, 0), scale)
+    if not max_scale_region:
+        return ""
+    max_scale = max(max_scale_region.values())
+    areas_max = "、".join(pref for pref, s in max_scale_region.items() if s == max_scale)
+    text = f"最大{SCALE_TEXT[max_scale]}を{areas_max}で観測しました。"
+    other = {}
+    for pref, s in max_scale_region.items():
+        if s < max_scale:
+            other.setdefault(s, []).append(pref)
+    if other:
+        others = "、".join(f"{SCALE_TEXT[s]}を{'、'.join(prefs)}" for s, prefs in sorted(other.items(), reverse=True))
+        text += f"また、{others}で観測しました。"
+    return text
+
+def format_grouped(points):
+    groups = intensity.group_by_scale([point.get('pref', '不明') for point in points],
+                                      [point.get('scale', -1) for point in points])
+    if not groups:
+        return ""
+    max_scale, areas_max = groups[0]
+    text = f"最大{SCALE_TEXT[max_scale]}を{'、'.join(areas_max)}で観測しました。"
+    if other := groups[1:]:
+        others = "、".join(f"{SCALE_TEXT[s]}を{'、'.join(prefs)}" for s, prefs in other)
+        text += f"また、{others}で観測しました。"
+    return text
+
+def report_points(count, seed):
+    rng = random.Random(seed)
+    prefs = PREFS + [f"県{n}" for n in range(27)]
+    return [{"pref": rng.choice(prefs), "addr": f"観測点{n}", "isArea": False, "scale": rng.choice(SCALES + [-1])}
+            for n in range(count)]
+
+def timed(function, reports, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for points in reports:
+            function(points)
+        elapsed = (time.perf_counter() - started) / len(reports)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    reports = [report_points(count, seed) for seed in range(20)]
+    for points in reports:
+        assert format_loop(points) == format_grouped(points)
+    print(f"points per report: {count}")
+    print(f"dict loop (before): {timed(format_loop, reports, repeat) * 1000:.3f} ms")
+    print(f"group_by_scale:     {timed(format_grouped, reports, repeat) * 1000:.3f} ms")
@@ -0,0 +1,114 @@
+# 地震情報1件ごとに、チャイムと読み上げを順番に行う場合と、並行して進める場合の時間を比べる
+# 直列: チャイムを鳴らし終えてから文を作り、読み上げを予約する（以前の鳴らし方）
+# 並行: 統合版の on_message。チャイムを鳴らし始めてから文を作り、チャイムが鳴り終わる SPEECH_LEAD 秒前に読み上げを送る
+# 処理: 電文を受け取ってから次の電文を処理できるようになるまで
+# 読み上げ: 電文を受け取ってから、棒読みちゃんの代役に読み上げ要求が届くまで
+# チャイム→読み上げ: チャイムの最初のサンプルから読み上げ要求までの時間（負ならチャイムより先に読み始めている）
+# 使い方: python bench/bench_pipeline.py [件数] [チャイムの秒数]
+import io
+import sys
+import time
+import wave
+import asyncio
+import tempfile
+import contextlib
+
+from common import load_integrated, integrated_config, percentile, quake_payload
+from yomiage.audio import NullSink
+from yomiage.mock_bouyomi import MockBouyomi
+from yomiage.records import decode_p2p
+from yomiage.intensity import max_by_pref
+from yomiage.scheduler import EARTHQUAKE
+
+# 音が鳴り始めた時刻を記録する出力先
+class StartRecorder(NullSink):
+    def __init__(self, stream):
+        self.starts = []
+        self._active = False
+        super().__init__(stream)
+
+    def write(self, data):
+        if not self._active:
+            self.starts.append(time.perf_counter())
+        self._active = True
+
+    def _run(self):
+        next_read = time.perf_counter()
+        while not self._stop.is_set():
+            data, active = self.stream.read(self.frames)
+            if active:
+                self.write(data)
+            else:
+                self._active = False
+            next_read += self.period
+            self._stop.wait(max(0.0, next_read - time.perf_counter()))
+
+def write_chime(path, seconds):
+    with wave.open(path, "wb") as f:
+        f.setnchannels(2)
+        f.setsampwidth(2)
+        f.setframerate(44100)
+        f.writeframes(bytes(int(44100 * seconds) * 4))
+
+async def serial(module, frame):
+    quake = decode_p2p(frame)
+    await module.sound_player.play(quake.issue_type)
+    scales = max_by_pref(quake.points.prefs(), quake.points.scales())
+    module.speak(module.format_earthquake_info(quake, scales), EARTHQUAKE, key=quake.time)
+
+async def pipelined(module, frame):
+    await module.on_message(frame)
+
+async def arrival(mock, marker, since, timeout=10.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        for a in mock.arrivals:
+            if a.received >= since and marker in a.text:
+                return a.received
+        await asyncio.sleep(0.001)
+    return None
+
+async def run(mode, count, chime, lead):
+    handled, spoken, gaps = [], [], []
+    with tempfile.TemporaryDirectory() as workdir:
+        async with MockBouyomi(chars_per_second=1e6) as mock:
+            write_chime(f"{workdir}/chime.wav", chime)
+            bouyomi = dict(integrated_config().get("BOUYOMI", {}), TRANSPORT="http", **mock.config)
+            module = load_integrated(
+                workdir, BOUYOMI=bouyomi, QUAKE_COALESCE=0, SOUNDS_DIR=workdir,
+                SOUND_FILES={"DetailScale": "chime.wav"}, AUDIO={"SINK": "null", "SPEECH_LEAD": lead},
+            )
+            sink = module.sound_player.sink = StartRecorder(module.sound_player.stream)
+            module.sound_player.preload()
+            runner = asyncio.create_task(module.scheduler.run())
+            for i in range(count):
+                frame = module.json.dumps(quake_payload(i, points=200), ensure_ascii=False)
+                started = time.perf_counter()
+                await mode(module, frame)
+                handled.append((time.perf_counter() - started) * 1000)
+                received = await arrival(mock, f"震源地は震源{i}、", started)
+                spoken.append((received - started) * 1000)
+                gaps.append((received - sink.starts[-1]) * 1000)
+                await asyncio.sleep(chime + 0.1)
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+            await module.close_client()
+            module.sound_player.close()
+    return handled, spoken, gaps
+
+def line(name, values):
+    return f"{name:<12}{percentile(values[0], 50):>12.1f}{percentile(values[1], 50):>14.1f}{percentile(values[2], 50):>20.1f}{min(values[2]):>10.1f}"
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    chime = float(sys.argv[2]) if len(sys.argv) > 2 else 1.0
+    lead = integrated_config().get("AUDIO", {}).get("SPEECH_LEAD", 0.3)
+    with contextlib.redirect_stdout(io.StringIO()):
+        before = asyncio.run(run(serial, count, chime, lead))
+        after = asyncio.run(run(pipelined, count, chime, lead))
+    print(f"chime: {chime:.2f} s  SPEECH_LEAD: {lead:.2f} s  announcements: {count}")
+    print(f"{'p50 ms':<12}{'handler':>12}{'speech sent':>14}{'chime -> speech':>20}{'min':>10}")
+    print(line("serial", before))
+    print(line("overlapped", after))
+    print(f"saved per announcement: handler {percentile(before[0], 50) - percentile(after[0], 50):.1f} ms, "
+          f"speech {percentile(before[1], 50) - percentile(after[1], 50):.1f} ms")
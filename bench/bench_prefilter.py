@@ -0,0 +1,72 @@
+# P2P電文を全部 json.loads する場合と、code を先に見て扱わない電文を捨てる場合のCPU時間を比べる
+# 先に見る code が、json.loads で読んだ最上位の code と同じかも確かめる（入れ子の中の "code" に惑わされない）
+# 使い方: python bench/bench_prefilter.py [記録ファイル | --synthetic 件数] [繰り返し回数]
+import sys
+import json
+import time
+
+from common import synthetic_archive
+from yomiage.feed import CodeFilter, frame_code, is_droppable
+from yomiage.recorder import load_frames
+
+HANDLED = {551, 552}
+
+# 入れ子の中に "code" がある電文（最上位の code の前・後ろ、最上位に code がないもの）
+NESTED = [
+    '{"_id": "a", "area": {"code": 555}, "code": 551}',
+    '{"_id": "b", "code": 9611, "areas": [{"code": 551}]}',
+    '{"_id": "c", "items": [{"code": 552}], "code": 555}',
+    '{"type": "heartbeat", "detail": {"code": 551}}',
+]
+
+# frame_code が json.loads の最上位の code と同じで、CodeFilter・is_droppable もそれに従うか
+def check_codes(frames):
+    code_filter = CodeFilter(HANDLED)
+    for frame in list(frames) + NESTED:
+        code = json.loads(frame).get("code")
+        assert frame_code(frame) == code, frame
+        if code is not None:
+            assert code_filter.accept(frame) == (code in HANDLED), frame
+            assert is_droppable(frame) == (code in {555, 561, 9611}), frame
+    print(f"frame_code agrees with json.loads on {len(frames) + len(NESTED)} frames ({len(NESTED)} with nested codes)")
+
+def decode_all(frames):
+    handled = 0
+    for frame in frames:
+        if json.loads(frame).get("code") in HANDLED:
+            handled += 1
+    return handled
+
+def decode_filtered(frames):
+    handled = 0
+    code_filter = CodeFilter(HANDLED)
+    for frame in frames:
+        if code_filter.accept(frame) and json.loads(frame).get("code") in HANDLED:
+            handled += 1
+    return handled, code_filter
+
+def measure(function, frames, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        result = function(frames)
+    return time.process_time() - started, result
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and args[0] == "--synthetic":
+        archive = synthetic_archive(int(args[1]))
+        args = args[2:]
+    elif args:
+        archive = load_frames(args[0])
+        args = args[1:]
+    else:
+        archive = synthetic_archive(20000)
+    repeat = int(args[0]) if args else 5
+    frames = [entry["frame"] for entry in archive if entry["feed"] == "p2p"]
+    check_codes(frames)
+    full, handled = measure(decode_all, frames, repeat)
+    filtered, (handled_filtered, code_filter) = measure(decode_filtered, frames, repeat)
+    assert handled == handled_filtered
+    print(f"P2P frames: {len(frames)} x {repeat} (handled {handled}, skipped {code_filter.skipped})")
+    print(f"json.loads every frame: {full * 1000:.1f} ms CPU")
+    print(f"code prefilter first:   {filtered * 1000:.1f} ms CPU ({(1 - filtered / full) * 100:.0f}% saved)")
@@ -0,0 +1,65 @@
+# 配信側から切断されてから、受信ループが再接続するまでの時間を測る
+# 接続を受け付けてすぐ切る配信側に、一定時間で何回つなぎ直すかも数える
+# （バックオフを接続のたびに戻していた以前の動き stable_after=0 と、既定の stable_after を比べる）
+# 使い方: python bench/bench_reconnect.py [切断回数]
+import io
+import sys
+import time
+import asyncio
+import contextlib
+
+from common import FeedServer, percentile
+from yomiage.feed import receive_forever, close_session
+
+PATH = "v2/ws"
+# 接続が続いたとみなすまでの秒数（測定を短くするため、既定の 10 秒より短くする）
+STABLE_AFTER = 0.2
+FLAP_SECONDS = 3.0
+
+async def run(count):
+    feed = await FeedServer().start()
+    gaps = []
+    task = asyncio.create_task(
+        receive_forever(feed.url(PATH), lambda frame: None, gaps=gaps, stable_after=STABLE_AFTER)
+    )
+    await feed.wait_connected(PATH)
+    observed = []
+    for _ in range(count):
+        await asyncio.sleep(STABLE_AFTER)
+        started = time.perf_counter()
+        await feed.drop(PATH)
+        while feed.clients.get(PATH):
+            await asyncio.sleep(0.001)
+        await feed.wait_connected(PATH)
+        observed.append(time.perf_counter() - started)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await close_session()
+    await feed.stop()
+    return observed, gaps
+
+# 接続してすぐ切られ続けたとき、FLAP_SECONDS 秒で何回接続したか
+async def flap(stable_after):
+    feed = await FeedServer().start()
+    feed.flapping.add(PATH)
+    task = asyncio.create_task(receive_forever(feed.url(PATH), lambda frame: None, stable_after=stable_after))
+    await asyncio.sleep(FLAP_SECONDS)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await close_session()
+    await feed.stop()
+    return feed.connections[PATH]
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with contextlib.redirect_stdout(io.StringIO()):
+        observed, gaps = asyncio.run(run(count))
+        flaps = {stable_after: asyncio.run(flap(stable_after)) for stable_after in (0.0, 10.0)}
+    observed = [value * 1000 for value in observed]
+    gaps = [value * 1000 for value in gaps]
+    print(f"reconnects: {len(observed)} (fixed 5 s sleep before: 5000 ms each)")
+    print(f"server side  p50 {percentile(observed, 50):.1f} ms  p99 {percentile(observed, 99):.1f} ms  max {max(observed):.1f} ms")
+    if gaps:
+        print(f"client gaps  p50 {percentile(gaps, 50):.1f} ms  p99 {percentile(gaps, 99):.1f} ms  max {max(gaps):.1f} ms")
+    for stable_after, connections in flaps.items():
+        print(f"flapping server, stable_after={stable_after:g} s: {connections} connections in {FLAP_SECONDS:g} s")
@@ -0,0 +1,84 @@
+# 大きな DetailScale（551）と EEW を、辞書のまま扱う場合と yomiage.records のレコードに変換する場合で比べる
+# 処理時間は「解析＋読み上げ文に使う項目をすべて読む」まで（551 は都道府県ごとの最大震度の集計を含む）
+# メモリは解析結果を保持したときの使用量
+# 使い方: python bench/bench_records.py [観測点の数] [電文の件数]
+import sys
+import json
+import time
+import tracemalloc
+
+from common import quake_payload, eew_payload
+from yomiage import records
+from yomiage.intensity import max_by_pref
+
+# 従来の読み方（辞書の .get と、観測点を1件ずつ見る集計）
+def read_dict(raw):
+    data = json.loads(raw)
+    issue = data.get('issue', {})
+    eq = data.get('earthquake', {})
+    hypocenter = eq.get('hypocenter', {})
+    fields = [issue.get('type', 'Other'), eq.get('time', '不明'), hypocenter.get('name'),
+              hypocenter.get('depth', -1), hypocenter.get('magnitude', -1),
+              eq.get('domesticTsunami', ''), eq.get('foreignTsunami', None)]
+    max_scale_region = {}
+    for point in data.get('points', []):
+        scale = point.get('scale', -1)
+        if scale > 0:
+            pref = point.get('pref', '不明')
+            max_scale_region[pref] = max(max_scale_region.get(pref, 0), scale)
+    fields.append(max_scale_region)
+    return data, fields
+
+def read_record(raw):
+    quake = records.decode_quake(raw)
+    hypocenter = quake.hypocenter
+    fields = [quake.issue_type, quake.time, hypocenter.name, hypocenter.depth, hypocenter.magnitude,
+              quake.domestic_tsunami, quake.foreign_tsunami]
+    fields.append(max_by_pref(quake.points.prefs(), quake.points.scales()))
+    return quake, fields
+
+def read_eew_dict(raw):
+    data = json.loads(raw)
+    fields = [data.get('EventID'), data.get('Serial', '不明'), data.get('isWarn', False), data.get('isFinal', False),
+              data.get('isCancel', False), data.get('MaxIntensity', '不明'), data.get('Hypocenter', '不明'),
+              data.get('Depth', '不明'), data.get('Magunitude', '不明')]
+    return data, fields
+
+def read_eew_record(raw):
+    eew = records.decode_eew(raw)
+    fields = [eew.event_id, eew.serial, eew.is_warn, eew.is_final, eew.is_cancel, eew.max_intensity,
+              eew.hypocenter, eew.depth, eew.magnitude]
+    return eew, fields
+
+def timed(function, frames, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for raw in frames:
+            function(raw)
+        elapsed = (time.perf_counter() - started) / len(frames)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def retained(function, frames):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [function(raw)[0] for raw in frames]
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del kept
+    return size / len(frames)
+
+if __name__ == "__main__":
+    points = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    frames = [json.dumps(quake_payload(i, points=points), ensure_ascii=False) for i in range(count)]
+    eews = [json.dumps(eew_payload(i % 10, serial=i % 5 + 1, warn=i % 2 == 0), ensure_ascii=False) for i in range(1000)]
+    assert read_dict(frames[0])[1] == read_record(frames[0])[1]
+    assert read_eew_dict(eews[0])[1] == read_eew_record(eews[0])[1]
+    print(f"decoder: {records.loads.__module__}  points per message: {points}  messages: {count}")
+    print(f"{'':<16}{'decode+read':>14}{'retained KiB':>14}")
+    for name, function in (("551 dict", read_dict), ("551 records", read_record)):
+        print(f"{name:<16}{timed(function, frames) * 1000:>11.3f} ms{retained(function, frames) / 1024:>14.1f}")
+    for name, function in (("EEW dict", read_eew_dict), ("EEW records", read_eew_record)):
+        print(f"{name:<16}{timed(function, eews) * 1e6:>11.2f} us{retained(function, eews) / 1024:>14.2f}")
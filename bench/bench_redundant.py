@@ -0,0 +1,67 @@
+# 同じ配信に複数の接続を張ったとき、先着した電文を使うと遅延がどれだけ縮むかを測る
+# 配信側で接続ごとに独立した遅れ（指数分布）を足し、経路ごとのばらつきを再現する
+# 使い方: python bench/bench_redundant.py [電文の件数] [接続数] [平均の遅れミリ秒]
+import io
+import sys
+import time
+import random
+import asyncio
+import contextlib
+
+from common import FeedServer, percentile, quake_payload
+from yomiage.feed import FirstArrival, receive_forever, close_session
+
+async def send_late(ws, text, delay):
+    await asyncio.sleep(delay)
+    await ws.send_str(text)
+
+async def run(count, links, mean_delay):
+    feed = await FeedServer().start()
+    received = {}
+    single = {}
+
+    def on_frame(frame):
+        received[frame] = time.perf_counter()
+
+    def on_link0(frame):
+        single[frame] = time.perf_counter()
+
+    arrival = FirstArrival(on_frame)
+    paths = [f"link{n}" for n in range(links)]
+    tasks = []
+    for n, path in enumerate(paths):
+        first = arrival.link(path)
+        callback = first if n else (lambda frame, first=first: (on_link0(frame), first(frame)))
+        tasks.append(asyncio.create_task(receive_forever(feed.url(path), callback, name=path)))
+    for path in paths:
+        await feed.wait_connected(path)
+    sent = {}
+    for i in range(count):
+        text = f'{{"code": 551, "id": "quake-{i}"}}'
+        sent[text] = time.perf_counter()
+        await asyncio.gather(*(
+            send_late(ws, text, random.expovariate(1 / mean_delay))
+            for path in paths for ws in feed.clients[path]
+        ))
+    await asyncio.sleep(mean_delay * 5)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await close_session()
+    await feed.stop()
+    first = [(received[text] - started) * 1000 for text, started in sent.items() if text in received]
+    only = [(single[text] - started) * 1000 for text, started in sent.items() if text in single]
+    return first, only, arrival.stats()
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    links = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    mean_delay = (float(sys.argv[3]) if len(sys.argv) > 3 else 20.0) / 1000
+    with contextlib.redirect_stdout(io.StringIO()):
+        first, only, stats = asyncio.run(run(count, links, mean_delay))
+    print(f"{'':<14}{'frames':>8}{'p50 ms':>10}{'p99 ms':>10}")
+    print(f"{'single link':<14}{len(only):>8}{percentile(only, 50):>10.2f}{percentile(only, 99):>10.2f}")
+    print(f"{'first arrival':<14}{len(first):>8}{percentile(first, 50):>10.2f}{percentile(first, 99):>10.2f}")
+    print(f"duplicates discarded: {stats['duplicates']}")
+    for name, link in stats["links"].items():
+        print(f"  {name}: win rate {link['win_rate']:.0%}, avg delta when late {link['avg_delta_ms']:.2f} ms")
@@ -0,0 +1,98 @@
+# 地震情報の読み上げ文を作る時間を、変更前の関数（+= の連結と毎回の時刻の解析）と
+# yomiage.announce.AnnouncementRenderer（組み立て済みのひな形）で比べる
+# 使い方: python bench/bench_render.py [繰り返し回数]
+import sys
+import time
+import timeit
+from datetime import datetime
+
+from common import integrated_config
+from golden_cases import cases
+from yomiage.announce import AnnouncementRenderer, origin_clock
+from yomiage.intensity import max_by_pref, group_scales
+from yomiage.records import quake_from_dict
+
+CONFIG = integrated_config()
+SCALE_TEXT = CONFIG["SCALE_TEXT"]
+TSUNAMI_TEXT = CONFIG["TSUNAMI_TEXT"]
+TYPE_TEXT = CONFIG["TYPE_TEXT"]
+
+# 以下、変更前の統合版の関数
+def convert_scale_to_text(scale):
+    return SCALE_TEXT.get(str(scale), "不明")
+
+def convert_tsunami(tsunami, foreign_tsunami=None, domestic=True):
+    if foreign_tsunami is None and not domestic:
+        return ""
+    return TSUNAMI_TEXT.get(tsunami, "")
+
+def convert_type(type_str):
+    return TYPE_TEXT.get(type_str, "地震情報")
+
+def format_origin_time(t):
+    date_part, time_part = t.split(" ")
+    hour, minute, _ = time_part.split(":")
+    return f"{int(hour)}時{int(minute)}分"
+
+def format_hypocenter_info(hypocenter):
+    text = ""
+    if name := hypocenter.name:
+        text += f"震源地は{name}、"
+    if (depth := hypocenter.depth) >= 0:
+        text += f"震源の深さは{'ごく浅い' if depth == 0 else f'{depth}キロメートル'}。"
+    if (magnitude := hypocenter.magnitude) >= 0:
+        text += f"地震の規模を示すマグニチュードは{magnitude:.1f}と推定されています。"
+    return text
+
+def format_points_info(groups):
+    if not groups:
+        return ""
+    max_scale, areas_max = groups[0]
+    text = f"最大{convert_scale_to_text(max_scale)}を{'、'.join(areas_max)}で観測しました。"
+    if other := groups[1:]:
+        others = "、".join(f"{convert_scale_to_text(s)}を{'、'.join(prefs)}" for s, prefs in other)
+        text += f"また、{others}で観測しました。"
+    return text
+
+def format_earthquake_info(quake, groups):
+    text = f"{convert_type(quake.issue_type)}。"
+    if quake.time != '不明':
+        text += f"{format_origin_time(quake.time)}ごろ地震がありました。"
+    text += format_hypocenter_info(quake.hypocenter)
+    text += convert_tsunami(quake.domestic_tsunami, domestic=True)
+    foreign = quake.foreign_tsunami
+    if foreign not in [None, "Unknown"]:
+        text += convert_tsunami(foreign, domestic=False)
+    if groups:
+        text += format_points_info(groups)
+    return text
+
+def per_call(function, repeat):
+    return min(timeit.repeat(function, number=repeat, repeat=5)) / repeat * 1e6
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    renderer = AnnouncementRenderer(TYPE_TEXT, SCALE_TEXT, TSUNAMI_TEXT)
+    inputs = []
+    for payload in cases():
+        quake = quake_from_dict(payload)
+        scales = max_by_pref(quake.points.prefs(), quake.points.scales())
+        inputs.append((quake, group_scales(scales)))
+    for quake, groups in inputs:
+        assert format_earthquake_info(quake, groups) == renderer.render(quake, groups)
+
+    def before():
+        for quake, groups in inputs:
+            format_earthquake_info(quake, groups)
+
+    def after():
+        for quake, groups in inputs:
+            renderer.render(quake, groups)
+
+    print(f"announcements per run: {len(inputs)}")
+    print(f"render  before: {per_call(before, repeat) / len(inputs):.2f} us  after: {per_call(after, repeat) / len(inputs):.2f} us")
+    stamp = "2024/01/01 16:12:00"
+    strptime = per_call(lambda: datetime.strptime(stamp, '%Y/%m/%d %H:%M:%S'), 10000)
+    split = per_call(lambda: format_origin_time(stamp), 10000)
+    cached = per_call(lambda: origin_clock(stamp), 10000)
+    print(f"time    strptime: {strptime:.2f} us  split: {split:.2f} us  cached: {cached:.3f} us")
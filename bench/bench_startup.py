@@ -0,0 +1,70 @@
+# 統合版を起動してから、EEW / P2P のWebSocketが最初につながるまでの時間を測る
+# 配信の代役に向けた config.json を作業フォルダに書き、統合版を別プロセスで起動しては終了させる
+# Python 自体の起動時間を除いたEEWの接続までの時間（中央値）が予算（ミリ秒）を超えたら、終了コード1で終わる
+# （起動が遅くなったことに気づくため。重いモジュールを起動時に読み込むと超える）
+# 使い方: python bench/bench_startup.py [回数] [予算ms]
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import subprocess
+
+from common import INTEGRATED, FeedServer, integrated_config, percentile
+
+FEEDS = ("eew", "p2p")
+
+async def python_only(runs):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(sys.executable, "-c", "pass")
+        await process.wait()
+        times.append((time.perf_counter() - started) * 1000)
+    return times
+
+async def first_socket(runs, links):
+    connected = {feed: [] for feed in FEEDS}
+    for _ in range(runs):
+        feed = await FeedServer().start()
+        with tempfile.TemporaryDirectory() as workdir:
+            config = dict(integrated_config(), EEW_URL=feed.url("eew"), P2PQUAKE_URL=feed.url("p2p"), WS_LINKS=links)
+            with open(f"{workdir}/config.json", "w", encoding="utf-8") as f:
+                json.dump(config, f, ensure_ascii=False)
+            started = time.perf_counter()
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, INTEGRATED, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                pending = set(FEEDS)
+                while pending and time.perf_counter() - started < 10:
+                    for name in list(pending):
+                        if feed.clients.get(name):
+                            connected[name].append((time.perf_counter() - started) * 1000)
+                            pending.discard(name)
+                    await asyncio.sleep(0.001)
+            finally:
+                process.kill()
+                await process.wait()
+                await feed.stop()
+    return connected
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else 600.0
+    links = integrated_config().get("WS_LINKS", 1)
+    baseline = asyncio.run(python_only(runs))
+    connected = asyncio.run(first_socket(runs, links))
+    print(f"{'':<28}{'count':>6}{'p50 ms':>10}{'max ms':>10}")
+    print(f"{'python only':<28}{len(baseline):>6}{percentile(baseline, 50):>10.1f}{max(baseline):>10.1f}")
+    for name, values in connected.items():
+        if values:
+            print(f"{'first socket: ' + name:<28}{len(values):>6}{percentile(values, 50):>10.1f}{max(values):>10.1f}")
+        else:
+            print(f"{'first socket: ' + name:<28}{0:>6}")
+    eew = connected["eew"]
+    overhead = percentile(eew, 50) - percentile(baseline, 50) if len(eew) == runs else float("inf")
+    if overhead > budget:
+        print(f"予算超過: Python の起動からEEWの接続まで {overhead:.1f} ms（予算 {budget:.0f} ms）")
+        sys.exit(1)
+    print(f"予算内: Python の起動からEEWの接続まで {overhead:.1f} ms（予算 {budget:.0f} ms）")
@@ -0,0 +1,121 @@
+# 発表中の情報（yomiage.state.ActiveState）の更新と、ローカルAPIへの問い合わせを測る
+# 更新: 1件の 552 / 551 / EEW を反映する時間。作り直し（届くたびに全体の JSON を作り直す）と比べる
+#       552 は bench_tsunami_diff.py と同じ、全国の沿岸に広がってから解除されるまでの一連の予報
+# 問い合わせ: GET /state に 200（JSON を返す）と 304（If-None-Match が一致）で答えるまでの時間
+# 読み直し: POST /tsunami/reread が、合言葉の合う同じPCからの要求だけを受け付けるかも確かめる
+# 使い方: python bench/bench_state.py [問い合わせの回数]
+import sys
+import json
+import time
+import asyncio
+
+import aiohttp
+
+from common import percentile, quake_payload, eew_payload
+from bench_tsunami_diff import frames as tsunami_frames
+from yomiage.records import decode_p2p, eew_from_dict
+from yomiage.intensity import max_by_pref
+from yomiage.quakes import QuakeTracker
+from yomiage.tsunami import TsunamiBoard
+from yomiage.state import ActiveState, StateServer
+
+def rebuild(state):
+    return json.dumps({name: state.section(name) for name in ("tsunami", "quakes", "eew")}, ensure_ascii=False)
+
+# (種類, 反映する関数) の一覧を、届く順に作る
+def updates(state):
+    board = TsunamiBoard(on_change=state.update_tsunami)
+    tracker = QuakeTracker()
+    for _, frame in tsunami_frames():
+        yield "552", lambda record=decode_p2p(frame): board.apply(record)
+    for i in range(20):
+        quake = decode_p2p(json.dumps(quake_payload(i // 4, points=200, issue_type="DetailScale"), ensure_ascii=False))
+        scales = max_by_pref(quake.points.prefs(), quake.points.scales())
+        hypocenter = quake.hypocenter
+        def update(quake=quake, scales=scales, hypocenter=hypocenter):
+            diff = tracker.update(
+                quake.time, (hypocenter.name, hypocenter.depth, hypocenter.magnitude), quake.domestic_tsunami, scales
+            )
+            state.update_quake(quake, scales, diff)
+        yield "551", update
+    for i in range(40):
+        eew = eew_from_dict(eew_payload(i // 10, serial=i % 10 + 1, warn=i % 10 > 3, final=i % 10 == 9))
+        yield "EEW", lambda eew=eew: state.update_eew(eew)
+
+def measure_updates(rebuilding):
+    state = ActiveState()
+    times = {}
+    for kind, update in updates(state):
+        started = time.perf_counter()
+        update()
+        if rebuilding:
+            rebuild(state)
+        times.setdefault(kind, []).append((time.perf_counter() - started) * 1e6)
+    return state, times
+
+async def query(state, runs):
+    server = await StateServer(state, port=0).start()
+    url = f"http://127.0.0.1:{server.port}/state"
+    ok, not_modified = [], []
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as response:
+            etag = response.headers["ETag"]
+            size = len(await response.read())
+        for _ in range(runs):
+            started = time.perf_counter()
+            async with session.get(url) as response:
+                await response.read()
+            ok.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            async with session.get(url, headers={"If-None-Match": etag}) as response:
+                assert response.status == 304
+            not_modified.append((time.perf_counter() - started) * 1000)
+    await server.stop()
+    return size, ok, not_modified
+
+# (ヘッダー, 期待する応答) の順に POST /tsunami/reread を送り、読み直しが呼ばれた回数を返す
+async def check_reread(token="secret"):
+    called = []
+    async def reread():
+        called.append(True)
+    cases = [
+        ({}, 403),
+        ({"X-Reread-Token": "wrong"}, 403),
+        ({"X-Reread-Token": token, "Origin": "https://example.com"}, 403),
+        ({"X-Reread-Token": token}, 200),
+    ]
+    server = await StateServer(ActiveState(), port=0, reread=reread, token=token).start()
+    disabled = await StateServer(ActiveState(), port=0, reread=reread).start()
+    async with aiohttp.ClientSession() as session:
+        for headers, status in cases:
+            async with session.post(f"http://127.0.0.1:{server.port}/tsunami/reread", headers=headers) as response:
+                assert response.status == status, (headers, response.status)
+        # 合言葉がなければ、読み直しの要求は受け付けない
+        async with session.post(f"http://127.0.0.1:{disabled.port}/tsunami/reread") as response:
+            assert response.status in (404, 405), response.status
+    await server.stop()
+    await disabled.stop()
+    assert len(called) == 1, called
+    print(f"POST /tsunami/reread: {len(cases)} requests, rejected {server.rejected}, reread {len(called)}")
+
+if __name__ == "__main__":
+    asyncio.run(check_reread())
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    _, incremental = measure_updates(False)
+    state, rebuilt = measure_updates(True)
+    print(f"{'update p50 us':<16}{'count':>6}{'incremental':>13}{'rebuild':>10}")
+    for kind in ("552", "551", "EEW"):
+        print(f"{kind:<16}{len(incremental[kind]):>6}{percentile(incremental[kind], 50):>13.1f}{percentile(rebuilt[kind], 50):>10.1f}")
+    # 最後の予報は解除なので、問い合わせは全国の沿岸に出ている状態で測る
+    state = ActiveState()
+    board = TsunamiBoard(on_change=state.update_tsunami)
+    board.apply(decode_p2p(list(tsunami_frames())[2][1]))
+    for kind, update in updates(state):
+        if kind != "552":
+            update()
+    size, ok, not_modified = asyncio.run(query(state, runs))
+    print()
+    print(f"state: {state.stats()}  /state: {size} bytes")
+    print(f"{'GET /state':<16}{'count':>6}{'p50 ms':>13}{'p99 ms':>10}")
+    print(f"{'200':<16}{len(ok):>6}{percentile(ok, 50):>13.3f}{percentile(ok, 99):>10.3f}")
+    print(f"{'304':<16}{len(not_modified):>6}{percentile(not_modified, 50):>13.3f}{percentile(not_modified, 99):>10.3f}")
@@ -0,0 +1,86 @@
+# tougou の「optimized」版が、通常版より本当に速いかを測る
+# 起動: Python を起動してモジュールを読み込み終えるまで（main は動かさない）の時間を、別プロセスで何回か測った中央値
+# 1電文: EEW と heartbeat の電文を受け取ってから、読み上げ文ができる（または捨てる）までの時間
+# 以前の optimized 版は numba の @jit(nopython=True) を付けていたが、辞書を受け取る関数はコンパイルできず、
+# 呼ぶたびに TypingError になっていた。numba が入っていれば、その import にかかっていた時間も表示する
+# optimized 版の修正は、この誤りを直すためのもの（標準の json で解析するなら、1電文の時間は通常版とほぼ同じ）
+# 使い方: python bench/bench_tougou.py [起動の回数] [電文の件数]
+import os
+import sys
+import json
+import time
+import subprocess
+import importlib.util
+
+from common import ROOT, percentile, eew_payload, heartbeat_payload
+from yomiage import records
+
+TOUGOU = os.path.join(ROOT, "tougou")
+BUILDS = {
+    "plain": os.path.join(TOUGOU, "tougou - test - optimized.py"),
+    "optimized": os.path.join(TOUGOU, "tougou - optimized.py"),
+}
+LOAD = "import importlib.util, sys; spec = importlib.util.spec_from_file_location('tougou', sys.argv[1]); spec.loader.exec_module(importlib.util.module_from_spec(spec))"
+
+def startup(code, args=(), runs=10):
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code, *args], check=True, cwd=ROOT)
+        times.append((time.perf_counter() - started) * 1000)
+    return percentile(times, 50)
+
+def load(path):
+    spec = importlib.util.spec_from_file_location("tougou", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+# 受け取った電文を loads で解析し、heartbeat を捨ててから process（各版の process_eew_data）で読み上げ文を作る
+# 通常版・optimized 版のどちらも、この同じ形で呼んで比べる
+def eew_reader(loads, process):
+    def read(raw, last_message=None):
+        data = loads(raw)
+        if data.get('type') in ('heartbeat', 'pong'):
+            return None
+        return process(data, last_message)
+    return read
+
+# 関数を交互に繰り返し測り、それぞれの最短の1電文あたりの時間（マイクロ秒）を返す（負荷の揺れを両方に同じように受けさせる）
+def per_message(functions, frames, repeat=15):
+    best = [None] * len(functions)
+    for _ in range(repeat):
+        for i, function in enumerate(functions):
+            started = time.perf_counter()
+            for raw in frames:
+                function(raw)
+            elapsed = (time.perf_counter() - started) / len(frames)
+            best[i] = elapsed if best[i] is None else min(best[i], elapsed)
+    return [elapsed * 1e6 for elapsed in best]
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    # 通常版は標準の json、optimized 版は yomiage.records.loads（orjson があれば orjson）で解析する
+    plain = eew_reader(json.loads, load(BUILDS["plain"]).process_eew_data)
+    optimized = eew_reader(records.loads, load(BUILDS["optimized"]).process_eew_data)
+
+    eews = [json.dumps(eew_payload(i, serial=i % 8 + 1, warn=i % 3 == 0, final=i % 8 == 7), ensure_ascii=False)
+            for i in range(count)]
+    heartbeats = [json.dumps(heartbeat_payload(i)) for i in range(count)]
+    assert [plain(raw) for raw in eews + heartbeats] == [optimized(raw) for raw in eews + heartbeats]
+
+    print(f"{'startup':<32}{'p50 ms':>10}")
+    print(f"{'python only':<32}{startup('pass', runs=runs):>10.1f}")
+    for name, path in BUILDS.items():
+        print(f"{name:<32}{startup(LOAD, (path,), runs):>10.1f}")
+    if importlib.util.find_spec("numba") is not None:
+        print(f"{'import numba (removed)':<32}{startup('import numba', runs=runs):>10.1f}")
+    print()
+    print(f"decoder: {records.loads.__module__}")
+    print(f"{'per message':<32}{'EEW us':>10}{'heartbeat us':>14}")
+    functions = (plain, optimized)
+    eew_times = per_message(functions, eews)
+    for name, eew_time, heartbeat_time in zip(BUILDS, eew_times, per_message(functions, heartbeats)):
+        print(f"{name:<32}{eew_time:>10.2f}{heartbeat_time:>14.2f}")
+    print(f"EEW optimized / plain: {eew_times[1] / eew_times[0]:.2f}")
@@ -0,0 +1,39 @@
+# HTTP連携（/Talk）とソケット連携の送信時間を、ローカルの代役サーバーで比較する
+# 使い方: python bench/bench_transport.py [回数]
+import sys
+import asyncio
+import statistics
+from urllib.parse import quote
+
+from common import percentile
+from yomiage.bouyomi import create_client
+from yomiage.mock_bouyomi import MockBouyomi
+
+SHORT_TEXT = "緊急地震速報。強い揺れに警戒してください"
+LONG_TEXT = "大津波警報が発表されている地域をお伝えします。" + "岩手県、予想の高さ10m超、ただちに津波来襲と予測されます。" * 20
+
+async def run(transport, text, count, mock):
+    client = create_client(dict(mock.config, TRANSPORT=transport))
+    try:
+        for _ in range(count):
+            await client.talk(text)
+    finally:
+        await client.close()
+    elapsed = [t.elapsed * 1000 for t in client.timings]
+    return statistics.mean(elapsed), percentile(elapsed, 50), percentile(elapsed, 99)
+
+async def main(count):
+    async with MockBouyomi() as mock:
+        print(f"{'transport':<10}{'text':<8}{'avg ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for label, text in (("short", SHORT_TEXT), ("long", LONG_TEXT)):
+            print(f"[{label}] http query {len(quote(text))} bytes / tcp body {len(text.encode('utf-8'))} bytes")
+            for transport in ("http", "tcp"):
+                avg, p50, p99 = await run(transport, text, count, mock)
+                print(f"{transport:<10}{label:<8}{avg:>10.3f}{p50:>10.3f}{p99:>10.3f}")
+        await mock.wait_for_arrivals(count * 4)
+        received = {t: sum(1 for a in mock.arrivals if a.transport == t) for t in ("http", "tcp")}
+        print(f"received: {received}")
+        assert all(a.text in (SHORT_TEXT, LONG_TEXT) for a in mock.arrivals)
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
@@ -0,0 +1,105 @@
+# 全国の沿岸に津波警報・注意報が出た 552（2011年3月11日の規模、66区域）の読み上げを測る
+# 1回: 読み上げ文をすべて作ってから、1回の /Talk で送る（以前の送り方）
+# 区切り: 統合版の on_message。見出しと地域ごとの区切りを作ったそばから予約し、順に送る
+# 作成: 最初の区切り / 全文ができるまでの時間と、/Talk の URL の長さ（最長の1回）
+# 到着: 電文を受け取ってから、棒読みちゃんの代役に最初の要求 / 最後の要求が届くまで（HTTP とソケット連携）
+# 代役の HTTP サーバー（aiohttp）は 8190 バイトを超える要求行を受け付けないので、長すぎる URL は届かない
+# 使い方: python bench/bench_tsunami.py [回数]
+import io
+import sys
+import json
+import time
+import asyncio
+import logging
+import tempfile
+import contextlib
+
+import yarl
+
+from common import load_integrated, integrated_config, percentile, coastline_tsunami_payload
+from yomiage.bouyomi import BOUYOMI_URL
+from yomiage.mock_bouyomi import MockBouyomi
+from yomiage.records import decode_p2p
+from yomiage.scheduler import TSUNAMI
+from yomiage.tsunami import tsunami_chunks
+
+def talk_url(text):
+    return len(str(yarl.URL(f"{BOUYOMI_URL}/Talk").with_query(text=text, voice=0, volume=-1, speed=-1, tone=-1)))
+
+def build(frame, repeat=200):
+    first, whole = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        next(tsunami_chunks([decode_p2p(frame)]))
+        first.append((time.perf_counter() - started) * 1e6)
+        started = time.perf_counter()
+        "".join(tsunami_chunks([decode_p2p(frame)]))
+        whole.append((time.perf_counter() - started) * 1e6)
+    return percentile(first, 50), percentile(whole, 50)
+
+async def single(module, frame):
+    module.speak("".join(tsunami_chunks([decode_p2p(frame)])), TSUNAMI)
+
+async def chunked(module, frame):
+    await module.on_message(frame)
+
+# 送った文がすべて届くまで待ち、(最初の到着, 最後の到着) を返す。届かなければ None
+async def delivered(mock, expected, since, timeout=1.0):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        arrivals = [a for a in mock.arrivals if a.received >= since]
+        if "".join(a.text for a in arrivals) == expected:
+            return arrivals[0].received, arrivals[-1].received
+        await asyncio.sleep(0.001)
+    return None
+
+async def run(mode, transport, frame, runs):
+    expected = "".join(tsunami_chunks([decode_p2p(frame)]))
+    first, last, lost = [], [], 0
+    with tempfile.TemporaryDirectory() as workdir:
+        async with MockBouyomi(chars_per_second=1e6) as mock:
+            bouyomi = dict(integrated_config().get("BOUYOMI", {}), TRANSPORT=transport, **mock.config)
+            # 同じ予報を何回も流すので、続報の差分ではなく毎回すべての地域を読ませる
+            module = load_integrated(workdir, BOUYOMI=bouyomi, SOUND_FILES={}, TSUNAMI_DIFF=False)
+            runner = asyncio.create_task(module.scheduler.run())
+            for _ in range(runs):
+                started = time.perf_counter()
+                await mode(module, frame)
+                result = await delivered(mock, expected, started)
+                if result is None:
+                    lost += 1
+                    continue
+                first.append((result[0] - started) * 1000)
+                last.append((result[1] - started) * 1000)
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+            await module.close_client()
+    return first, last, lost
+
+def line(name, values):
+    first, last, lost = values
+    if not first:
+        return f"{name:<22}{'-':>12}{'-':>12}{lost:>8}"
+    return f"{name:<22}{percentile(first, 50):>12.2f}{percentile(last, 50):>12.2f}{lost:>8}"
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    frame = json.dumps(coastline_tsunami_payload(0), ensure_ascii=False)
+    chunks = list(tsunami_chunks([decode_p2p(frame)]))
+    text = "".join(chunks)
+    first_us, whole_us = build(frame)
+    print(f"areas: {len(json.loads(frame)['areas'])}  characters: {len(text)}  chunks: {len(chunks)}")
+    print(f"{'build':<22}{'p50 us':>12}{'/Talk URL':>12}")
+    print(f"{'single: whole text':<22}{whole_us:>12.1f}{talk_url(text):>12}")
+    print(f"{'chunked: first chunk':<22}{first_us:>12.1f}{max(talk_url(chunk) for chunk in chunks):>12}")
+    print()
+    # 長すぎる URL を断ったときの代役側のエラー表示は出さない
+    logging.getLogger("aiohttp.server").setLevel(logging.CRITICAL)
+    print(f"{'arrival p50 ms':<22}{'first':>12}{'last':>12}{'lost':>8}")
+    with contextlib.redirect_stdout(io.StringIO()):
+        results = [
+            (f"{transport}: {name}", asyncio.run(run(mode, transport, frame, runs)))
+            for transport in ("http", "tcp") for name, mode in (("single", single), ("chunked", chunked))
+        ]
+    for name, values in results:
+        print(line(name, values))
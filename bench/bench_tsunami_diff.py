@@ -0,0 +1,125 @@
+# 津波警報が長く続くときに、続報のたびにすべての地域を読む場合と、変わった地域だけを読む場合を比べる
+# 2011年3月11日のように、太平洋側の大津波警報から全国の沿岸に広がり、引き上げ・引き下げ・解除を経て
+# すべて解除されるまでの 552 を順に流し、読み上げる文字数と読み上げにかかる時間（毎秒 cps 文字とみなす）、
+# 1報ごとの処理時間（反映と読み上げ文の作成）を測る
+# 統合版で、前の予報をチャイムの後ろで待たせている間に続報が届いても、すべての地域が読まれるかも確かめる
+# 使い方: python bench/bench_tsunami_diff.py [1秒に読む文字数]
+import io
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import contextlib
+
+from common import percentile, coastline_tsunami_payload, load_integrated, integrated_config, COASTLINE_GRADES, TSUNAMI_AREAS
+from bench_eew_stages import write_chime
+from yomiage.mock_bouyomi import MockBouyomi
+from yomiage.records import decode_p2p
+from yomiage.tsunami import TsunamiBoard, tsunami_chunks, update_chunks
+
+def scenario():
+    grades = {name: grade for name, grade in COASTLINE_GRADES.items() if name in TSUNAMI_AREAS[:32]}
+    steps = [("first bulletin", dict(grades))]
+    grades = dict(COASTLINE_GRADES)
+    steps.append(("whole coastline", dict(grades)))
+    for name in TSUNAMI_AREAS[13:16]:
+        grades[name] = "MajorWarning"
+    steps.append(("3 raised", dict(grades)))
+    for n in range(3):
+        steps.append((f"arrivals only {n + 1}", dict(grades)))
+    for name in TSUNAMI_AREAS[22:32]:
+        grades[name] = "Watch"
+    steps.append(("10 lowered", dict(grades)))
+    for name in TSUNAMI_AREAS[5:13]:
+        grades[name] = "Warning"
+    steps.append(("8 lowered", dict(grades)))
+    for name in TSUNAMI_AREAS[46:66]:
+        del grades[name]
+    steps.append(("20 lifted", dict(grades)))
+    for name, grade in grades.items():
+        if grade == "Warning":
+            grades[name] = "Watch"
+    steps.append(("warnings lowered", dict(grades)))
+    for name in TSUNAMI_AREAS[26:46]:
+        del grades[name]
+    steps.append(("20 lifted", dict(grades)))
+    steps.append(("cancelled", None))
+    return steps
+
+def frames():
+    for i, (name, grades) in enumerate(scenario()):
+        if grades is None:
+            payload = coastline_tsunami_payload(i)
+            payload["cancelled"] = True
+        else:
+            payload = coastline_tsunami_payload(i, grades)
+            # 到達予測だけが変わる続報（到達時刻を進める）
+            for area in payload["areas"]:
+                area["firstHeight"]["arrivalTime"] = f"2011/03/11 {16 + i:02d}:00:00"
+        yield name, json.dumps(payload, ensure_ascii=False)
+
+def measure(repeat=50):
+    rows = []
+    board = TsunamiBoard()
+    for name, frame in frames():
+        full = "".join(tsunami_chunks([decode_p2p(frame)]))
+        times = []
+        for n in range(repeat):
+            # 同じ報を繰り返すと2回目からは変化なしになるので、毎回1つ前の状態から反映する
+            trial = TsunamiBoard()
+            trial.areas, trial.time = dict(board.areas), board.time
+            started = time.perf_counter()
+            "".join(update_chunks(trial, decode_p2p(frame)))
+            times.append((time.perf_counter() - started) * 1e6)
+        diff = "".join(update_chunks(board, decode_p2p(frame)))
+        rows.append((name, len(board.areas), len(full), len(diff), percentile(times, 50)))
+    return rows
+
+# 全国の沿岸の予報の区切りがチャイム（chime 秒）を待っている間に、1区域だけ引き上げた続報を流し、
+# 棒読みちゃんの代役に届いた文と、最後の予報で出ているすべての地域を返す
+async def replaced(chime=0.5, gap=0.12):
+    grades = dict(COASTLINE_GRADES)
+    first = json.dumps(coastline_tsunami_payload(0, grades), ensure_ascii=False)
+    grades[TSUNAMI_AREAS[20]] = "MajorWarning"
+    second = json.dumps(coastline_tsunami_payload(1, grades), ensure_ascii=False)
+    with tempfile.TemporaryDirectory() as workdir:
+        async with MockBouyomi(chars_per_second=1e6) as mock:
+            bouyomi = dict(integrated_config().get("BOUYOMI", {}), TRANSPORT="http", **mock.config)
+            write_chime(os.path.join(workdir, "chime.wav"), chime)
+            module = load_integrated(
+                workdir, BOUYOMI=bouyomi, TSUNAMI_DIFF=True, SOUNDS_DIR=workdir,
+                SOUND_FILES={"Tsunami": "chime.wav"}, AUDIO={"SINK": "null"},
+            )
+            module.sound_player.preload()
+            runner = asyncio.create_task(module.scheduler.run())
+            await module.on_message(first)
+            await asyncio.sleep(gap)
+            await module.on_message(second)
+            await asyncio.sleep(chime * 2 + 0.5)
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
+            await module.close_client()
+            module.sound_player.close()
+    return "".join(a.text for a in mock.arrivals), list(grades)
+
+def check_replaced():
+    with contextlib.redirect_stdout(io.StringIO()):
+        spoken, areas = asyncio.run(replaced())
+    missing = [name for name in areas if f"{name}、" not in spoken]
+    assert not missing, f"読まれなかった地域: {len(missing)}/{len(areas)}"
+    print(f"replaced while waiting: all {len(areas)} areas spoken")
+
+if __name__ == "__main__":
+    cps = float(sys.argv[1]) if len(sys.argv) > 1 else 8.0
+    check_replaced()
+    rows = measure()
+    print(f"{'bulletin':<20}{'areas':>6}{'full chars':>12}{'diff chars':>12}{'full s':>9}{'diff s':>9}{'diff us':>9}")
+    for name, areas, full, diff, us in rows:
+        print(f"{name:<20}{areas:>6}{full:>12}{diff:>12}{full / cps:>9.1f}{diff / cps:>9.1f}{us:>9.1f}")
+    full_total = sum(row[2] for row in rows)
+    diff_total = sum(row[3] for row in rows)
+    print(f"{'total':<20}{'':>6}{full_total:>12}{diff_total:>12}{full_total / cps:>9.1f}{diff_total / cps:>9.1f}")
+    print(f"speech time: {full_total / cps / 60:.1f} min -> {diff_total / cps / 60:.1f} min "
+          f"({(1 - diff_total / full_total) * 100:.0f}% less, {cps:g} characters per second)")
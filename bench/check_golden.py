@@ -0,0 +1,42 @@
+# 地震情報の読み上げ文が、ゴールデンデータ（bench/golden/announcements.jsonl）と一字一句同じかを確かめる
+# 入力は bench/golden_cases.py から作る。すべての issue.type を含む
+# 使い方: python bench/check_golden.py          （違いがあれば表示して終了コード1）
+#         python bench/check_golden.py --update （今の出力でゴールデンデータを作り直す）
+import os
+import sys
+import json
+import tempfile
+
+from common import load_integrated
+from golden_cases import cases
+from yomiage.records import quake_from_dict
+from yomiage.intensity import max_by_pref
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "announcements.jsonl")
+
+def render_all():
+    with tempfile.TemporaryDirectory() as workdir:
+        module = load_integrated(workdir, SOUND_FILES={})
+        for n, payload in enumerate(cases()):
+            quake = quake_from_dict(payload)
+            scales = max_by_pref(quake.points.prefs(), quake.points.scales())
+            yield {"case": n, "issue_type": quake.issue_type, "text": module.format_earthquake_info(quake, scales)}
+
+if __name__ == "__main__":
+    results = list(render_all())
+    if "--update" in sys.argv:
+        with open(GOLDEN, "w", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result, ensure_ascii=False) + "\n")
+        print(f"{len(results)} cases written to {GOLDEN}")
+        sys.exit(0)
+    with open(GOLDEN, encoding="utf-8") as f:
+        golden = [json.loads(line) for line in f if line.strip()]
+    failures = [(expected, actual) for expected, actual in zip(golden, results) if expected != actual]
+    if len(golden) != len(results):
+        print(f"case count differs: golden {len(golden)}, rendered {len(results)}")
+    for expected, actual in failures:
+        print(f"case {expected['case']} ({expected['issue_type']})\n  expected: {expected['text']}\n  actual:   {actual['text']}")
+    types = sorted({result["issue_type"] for result in results})
+    print(f"{len(results) - len(failures)}/{len(results)} cases match ({', '.join(types)})")
+    sys.exit(1 if failures or len(golden) != len(results) else 0)
@@ -0,0 +1,254 @@
+# ベンチマーク共通の道具（統合版の読み込み、WebSocket配信の代役、サンプル電文）
+import os
+import sys
+import json
+import asyncio
+import collections
+import importlib.util
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+INTEGRATED = os.path.join(ROOT, "TEST", "NON TEST", "NontestandTsunami2.py")
+
+sys.path.insert(0, ROOT)
+
+PREFS = ["北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県", "茨城県", "栃木県", "群馬県",
+         "埼玉県", "千葉県", "東京都", "神奈川県", "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県"]
+SCALES = [10, 20, 30, 40, 45, 50, 55, 60, 70]
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+def integrated_config():
+    with open(os.path.join(os.path.dirname(INTEGRATED), "config.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+# 統合版を、config.json を差し替えた作業フォルダで読み込む
+def load_integrated(workdir, name="integrated", **overrides):
+    config = integrated_config()
+    config.update(overrides)
+    with open(os.path.join(workdir, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        spec = importlib.util.spec_from_file_location(name, INTEGRATED)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    return module
+
+# P2P / Wolfx のWebSocket配信の代役
+class FeedServer:
+    def __init__(self, host="127.0.0.1"):
+        self.host = host
+        self.port = None
+        self.clients = {}
+        self.connections = collections.Counter()
+        # 接続を受け付けてすぐ切るパス（不調な配信側の再現用）
+        self.flapping = set()
+        self._runner = None
+
+    async def start(self):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get("/{path:.*}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, 0).start()
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self):
+        for clients in self.clients.values():
+            for ws in list(clients):
+                await ws.close()
+        await self._runner.cleanup()
+
+    def url(self, path):
+        return f"ws://{self.host}:{self.port}/{path}"
+
+    async def _handle(self, request):
+        from aiohttp import web
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.connections[request.match_info["path"]] += 1
+        if request.match_info["path"] in self.flapping:
+            await ws.close()
+            return ws
+        clients = self.clients.setdefault(request.match_info["path"], set())
+        clients.add(ws)
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            clients.discard(ws)
+        return ws
+
+    async def wait_connected(self, path, count=1, timeout=5.0):
+        for _ in range(int(timeout * 1000)):
+            if len(self.clients.get(path, ())) >= count:
+                return True
+            await asyncio.sleep(0.001)
+        return False
+
+    # 接続中のクライアントを切断する（再接続の測定用）
+    async def drop(self, path):
+        for ws in list(self.clients.get(path, ())):
+            await ws.close()
+
+    async def send(self, path, payload):
+        text = payload if isinstance(payload, str) else json.dumps(payload, ensure_ascii=False)
+        for ws in list(self.clients.get(path, ())):
+            await ws.send_str(text)
+
+# P2P地震情報 551（各地の震度に関する情報）
+def quake_payload(i, points=40, issue_type="DetailScale"):
+    return {
+        "code": 551,
+        "id": f"quake-{i}",
+        "time": "2024/01/01 16:12:00.000",
+        "issue": {"source": "気象庁", "time": "2024/01/01 16:12:00", "type": issue_type, "correct": "None"},
+        "earthquake": {
+            "time": f"2024/01/01 16:{i % 60:02d}:00",
+            "hypocenter": {"name": f"震源{i}", "latitude": 37.5, "longitude": 137.2, "depth": 10, "magnitude": 7.6},
+            "maxScale": 70,
+            "domesticTsunami": "Warning",
+            "foreignTsunami": "Unknown",
+        },
+        "points": [
+            {"pref": PREFS[n % len(PREFS)], "addr": f"観測点{n}", "isArea": False, "scale": SCALES[(n * 7 + i) % len(SCALES)]}
+            for n in range(points)
+        ],
+    }
+
+# P2P地震情報 552（津波予報）
+def tsunami_payload(i, areas=20):
+    grades = ["MajorWarning", "Warning", "Watch"]
+    return {
+        "code": 552,
+        "id": f"tsunami-{i}",
+        "time": f"2024/01/01 16:{i % 60:02d}:30.000",
+        "cancelled": False,
+        "issue": {"source": "気象庁", "time": f"2024/01/01 16:{i % 60:02d}:30", "type": "Focus"},
+        "areas": [
+            {
+                "grade": grades[n % 3],
+                "immediate": n % 2 == 0,
+                "name": f"沿岸{i}-{n}",
+                "firstHeight": {"arrivalTime": "2024/01/01 16:22:00"},
+                "maxHeight": {"description": "３ｍ", "value": 3},
+            }
+            for n in range(areas)
+        ],
+    }
+
+# 気象庁の津波予報区（66区域）
+TSUNAMI_AREAS = [
+    "北海道太平洋沿岸東部", "北海道太平洋沿岸中部", "北海道太平洋沿岸西部", "北海道日本海沿岸北部", "北海道日本海沿岸南部",
+    "オホーツク海沿岸", "青森県日本海沿岸", "青森県太平洋沿岸", "陸奥湾", "岩手県", "宮城県", "福島県", "茨城県",
+    "千葉県九十九里・外房", "千葉県内房", "伊豆諸島", "小笠原諸島", "相模湾・三浦半島", "静岡県", "愛知県外海",
+    "伊勢・三河湾", "三重県南部", "和歌山県", "徳島県", "高知県", "宮崎県", "鹿児島県東部", "種子島・屋久島地方",
+    "奄美群島・トカラ列島", "沖縄本島地方", "大東島地方", "宮古島・八重山地方", "東京湾内湾", "大阪府",
+    "兵庫県瀬戸内海沿岸", "淡路島南部", "岡山県", "広島県", "香川県", "愛媛県瀬戸内海沿岸", "愛媛県宇和海沿岸",
+    "山口県瀬戸内海沿岸", "福岡県瀬戸内海沿岸", "大分県瀬戸内海沿岸", "大分県豊後水道沿岸", "有明・八代海",
+    "鹿児島県西部", "秋田県", "山形県", "新潟県上中下越", "佐渡", "富山県", "石川県能登", "石川県加賀", "福井県",
+    "京都府", "兵庫県北部", "鳥取県", "島根県出雲・石見", "隠岐", "山口県日本海沿岸", "福岡県日本海沿岸",
+    "佐賀県北部", "長崎県西方", "壱岐・対馬", "熊本県天草灘沿岸",
+]
+COASTLINE_GRADES = {name: "MajorWarning" for name in TSUNAMI_AREAS[:13]}
+COASTLINE_GRADES.update({name: "Warning" for name in TSUNAMI_AREAS[13:32]})
+COASTLINE_GRADES.update({name: "Watch" for name in TSUNAMI_AREAS[32:]})
+COASTLINE_HEIGHTS = {"MajorWarning": ("１０ｍ超", 10), "Warning": ("３ｍ", 3), "Watch": ("１ｍ", 1)}
+
+# 2011年3月11日のように、全国の沿岸（66区域すべて）に大津波警報・津波警報・津波注意報が出ている 552
+# grades（区域名 → 等級）を渡すと、その区域だけをその等級で出す
+def coastline_tsunami_payload(i, grades=None):
+    grades = COASTLINE_GRADES if grades is None else grades
+    areas = []
+    for n, (name, grade) in enumerate(grades.items()):
+        first = {"arrivalTime": f"2011/03/11 15:{14 + n % 40:02d}:00"}
+        if grade == "MajorWarning" and n % 3 == 0:
+            first["condition"] = "第１波の到達を確認"
+        elif n % 5 == 0:
+            first["condition"] = "ただちに津波来襲と予測"
+        description, value = COASTLINE_HEIGHTS[grade]
+        areas.append({
+            "grade": grade, "immediate": "condition" in first, "name": name,
+            "firstHeight": first, "maxHeight": {"description": description, "value": value},
+        })
+    return {
+        "code": 552,
+        "id": f"coastline-{i}",
+        "time": f"2011/03/11 {15 + i // 60:02d}:{i % 60:02d}:00.000",
+        "cancelled": False,
+        "issue": {"source": "気象庁", "time": f"2011/03/11 {15 + i // 60:02d}:{i % 60:02d}:00", "type": "Focus"},
+        "areas": areas,
+    }
+
+# Wolfx 緊急地震速報
+def eew_payload(i, serial=1, warn=False, final=False):
+    return {
+        "type": "jma_eew",
+        "Title": "緊急地震速報（警報）" if warn else "緊急地震速報（予報）",
+        "CodeType": "Ｍ、最大予測震度及び主要動到達予測時刻の緊急地震速報",
+        "Issue": {"Source": "大阪", "Status": "通常"},
+        "EventID": f"20240101161{i:04d}",
+        "Serial": serial,
+        "AnnouncedTime": "2024/01/01 16:10:20",
+        "OriginTime": "2024/01/01 16:10:09",
+        "Hypocenter": f"震源{i}",
+        "Latitude": 37.6,
+        "Longitude": 137.2,
+        "Magunitude": 7.4,
+        "Depth": 10,
+        "MaxIntensity": "6強" if warn else "4",
+        "Accuracy": {"Epicenter": "IPF 法（5 点以上）", "Depth": "IPF 法（5 点以上）", "Magnitude": "防災科研システム"},
+        "MaxIntChange": {"String": "ほとんど変化なし", "Reason": "不明、未設定時、キャンセル時"},
+        "WarnArea": [],
+        "isSea": False,
+        "isTraining": False,
+        "isAssumption": False,
+        "isWarn": warn,
+        "isFinal": final,
+        "isCancel": False,
+        "OriginalText": "",
+        "Pond": "",
+    }
+
+# P2P地震情報 555（ピアの地域分布）
+def peer_payload(i, areas=60):
+    return {
+        "code": 555,
+        "id": f"peers-{i}",
+        "time": "2024/01/01 16:00:00.000",
+        "areas": [{"id": 10 + n * 5, "peer": (n * 13 + i) % 40} for n in range(areas)],
+    }
+
+# P2P地震情報 561（地震感知情報）
+def userquake_payload(i):
+    return {"code": 561, "id": f"user-{i}", "time": "2024/01/01 16:10:10.000", "area": 250 + i % 30}
+
+def heartbeat_payload(i):
+    return {"type": "heartbeat", "ver": "1.0", "id": f"hb-{i}", "timestamp": 1704093000000 + i * 1000}
+
+# 記録ファイル（yomiage.recorder の形式）と同じ形の合成データ
+# 実際の配信と同じく、ほとんどが 555 / 561 / heartbeat で、ときどき地震・津波・EEWが混ざる
+def synthetic_archive(count, start=1704093000.0, interval=0.05):
+    frames = []
+    for i in range(count):
+        if i % 50 == 10:
+            feed, payload = "p2p", quake_payload(i)
+        elif i % 100 == 30:
+            feed, payload = "p2p", tsunami_payload(i)
+        elif i % 25 == 5:
+            feed, payload = "eew", eew_payload(i, serial=i % 5 + 1)
+        elif i % 4 == 0:
+            feed, payload = "eew", heartbeat_payload(i)
+        elif i % 3 == 0:
+            feed, payload = "p2p", userquake_payload(i)
+        else:
+            feed, payload = "p2p", peer_payload(i)
+        frames.append({"t": start + i * interval, "feed": feed, "frame": json.dumps(payload, ensure_ascii=False)})
+    return frames
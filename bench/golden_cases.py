@@ -0,0 +1,34 @@
+# 地震情報の読み上げ文のゴールデンデータ（bench/golden/announcements.jsonl）の入力
+# すべての issue.type について、震源・深さ・マグニチュード・津波・観測点の有無を組み合わせる
+import itertools
+
+from common import quake_payload
+
+ISSUE_TYPES = ["ScalePrompt", "Destination", "ScaleAndDestination", "DetailScale", "Foreign", "Other"]
+HYPOCENTERS = [
+    {"name": "石川県能登地方", "depth": 10, "magnitude": 7.6},
+    {"name": "千葉県東方沖", "depth": 0, "magnitude": 5},
+    {"name": "トンガ諸島", "depth": 35.5, "magnitude": 6.25},
+    {"name": "", "depth": -1, "magnitude": -1},
+]
+TSUNAMIS = [("None", "Unknown"), ("Checking", None), ("Warning", "WarningPacific")]
+POINTS = [0, 12]
+TIMES = ["2024/12/31 09:05:30", None]
+
+def cases():
+    for n, (issue_type, hypocenter, (domestic, foreign), points, origin) in enumerate(
+        itertools.product(ISSUE_TYPES, HYPOCENTERS, TSUNAMIS, POINTS, TIMES)
+    ):
+        payload = quake_payload(n, points=points, issue_type=issue_type)
+        earthquake = payload["earthquake"]
+        earthquake["hypocenter"] = dict(hypocenter, latitude=35.0, longitude=140.0)
+        earthquake["domesticTsunami"] = domestic
+        if foreign is None:
+            del earthquake["foreignTsunami"]
+        else:
+            earthquake["foreignTsunami"] = foreign
+        if origin is None:
+            del earthquake["time"]
+        else:
+            earthquake["time"] = origin
+        yield payload
@@ -0,0 +1,44 @@
+# 記録した電文（yomiage.recorder の JSONL）を統合版のハンドラに流し直す
+# 読み上げは棒読みちゃんの代役に送るので、本物の棒読みちゃんは不要
+# 使い方: python bench/replay.py <記録ファイル> [倍速（0 なら待たずに流す）]
+#         python bench/replay.py --synthetic <件数> [倍速]
+import io
+import sys
+import asyncio
+import tempfile
+import contextlib
+
+from common import load_integrated, integrated_config, synthetic_archive
+from yomiage.mock_bouyomi import MockBouyomi
+from yomiage.recorder import load_frames, replay
+
+async def run(frames, speed):
+    with tempfile.TemporaryDirectory() as workdir:
+        async with MockBouyomi(chars_per_second=1e6) as mock:
+            bouyomi = dict(integrated_config().get("BOUYOMI", {}), TRANSPORT="http", **mock.config)
+            module = load_integrated(workdir, SOUND_FILES={}, BOUYOMI=bouyomi, RECORD_DIR="")
+            worker = asyncio.create_task(module.scheduler.run())
+            handlers = {
+                "eew": module.on_eew_message,
+                "p2p": lambda msg, _: module.on_message(msg),
+            }
+            with contextlib.redirect_stdout(io.StringIO()):
+                report = await replay(frames, handlers, speed)
+                await module.quake_windows.flush_all()
+                await asyncio.sleep(0.2)
+            worker.cancel()
+            await module.close_client()
+            return report, module.scheduler.stats(), len(mock.arrivals), module.quake_windows.stats()
+
+if __name__ == "__main__":
+    if sys.argv[1] == "--synthetic":
+        frames = synthetic_archive(int(sys.argv[2]))
+        args = sys.argv[3:]
+    else:
+        frames = load_frames(sys.argv[1])
+        args = sys.argv[2:]
+    speed = float(args[0]) if args else 1.0
+    report, stats, spoken, windows = asyncio.run(run(frames, speed))
+    print(report)
+    print(f"読み上げ {spoken}件 / キュー {stats}")
+    print(f"地震情報のまとめ: {windows}")
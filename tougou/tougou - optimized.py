@@ -1,214 +1,257 @@
-import json
-import aiohttp
-import asyncio
-from playsound import playsound
-from datetime import datetime
-from concurrent.futures import ThreadPoolExecutor
-from numba import jit
-
-SOUNDS_DIR = "./Sounds"
-SOUND_FILES = {
-    "EEWWarning": "Eewwarning.mp3",
-    "EEWForecast": "Eewforecast.mp3",
-    "Tsunami": "Tsunami.mp3",
-    "Tsunamicancel": "Tsunamicancel.mp3",
-    "ScalePrompt": "ScalePrompt.mp3",
-    "Destination": "Destination.mp3",
-    "ScaleAndDestination": "Earthquake.mp3",
-    "DetailScale": "Earthquake.mp3",
-    "Foreign": "Foreign.mp3",
-}
-
-executor = ThreadPoolExecutor(max_workers=10)
-
-async def play_sound(event_type):
-    sound_file = SOUND_FILES.get(event_type)
-    if sound_file:
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(executor, lambda: playsound(f"{SOUNDS_DIR}/{sound_file}"))
-
-async def speak_bouyomi(text, voice=0, volume=-1, speed=-1, tone=-1):
-    async with aiohttp.ClientSession() as session:
-        try:
-            async with session.get('http://localhost:50080/Talk', params={
-                'text': text, 'voice': voice, 'volume': volume, 'speed': speed, 'tone': tone
-            }, timeout=2) as res:
-                return res.status == 200
-        except aiohttp.ClientError as e:
-            print(f"棒読みちゃんエラー: {e}")
-            return False
-
-@jit(nopython=True)
-def process_eew_data(data, last_message):
-    if not data:
-        return None
-    if data.get('isCancel', False):
-        return "この緊急地震速報は取り消されました"
-    message = (
-        f"緊急地震速報（{'警報' if data.get('isWarn') else '予報'}）"
-        f"{'最終報' if data.get('isFinal') else f'第{data.get('Serial', '不明')}報'}。"
-        f"推定最大震度は{data.get('MaxIntensity', '不明')}です。"
-        f"震源地は{data.get('Hypocenter', '不明')}、震源の深さは{data.get('Depth', '不明')}キロメートル、"
-        f"地震の規模を示すマグニチュードは{data.get('Magunitude', '不明')}と推定されています。"
-    )
-    return message if message != last_message else None
-
-async def process_tsunami_data(data):
-    warning_levels = ["大津波警報", "津波警報", "津波注意報"]
-    grade_map = {"MajorWarning": "大津波警報", "Warning": "津波警報", "Watch": "津波注意報"}
-    condition_map = {
-        "ただちに津波来襲と予測": "ただちに津波来襲と予測されます",
-        "津波到達中と推測": "津波到達中と推測されます",
-        "第１波の到達を確認": "第１波の到達を確認しました"
-    }
-    combined_message = ""
-    first_alert = True
-    for item in sorted(data, key=lambda x: x.get('time', ''), reverse=True):
-        if item.get("cancelled", False):
-            combined_message += "津波情報。津波予報が解除されました。\n"
-            await play_sound("Tsunamicancel")
-            continue
-        warnings = {level: [] for level in warning_levels}
-        for area in item.get("areas", []):
-            grade = grade_map.get(area['grade'], '')
-            if not grade:
-                continue
-            arrival_raw = area['firstHeight'].get('arrivalTime', '不明')
-            arrival_time = "不明"
-            if arrival_raw != "不明":
-                try:
-                    date_part, time_part = arrival_raw.split(" ")
-                    day = int(date_part.split("/")[-1])
-                    hour, minute = map(int, time_part.split(":")[:2])
-                    arrival_time = f"{day}日{hour}時{minute}分"
-                except ValueError:
-                    pass
-            warnings[grade].append({
-                "地域": area['name'],
-                "予想の高さ": area.get('maxHeight',{}).get('description','不明'),
-                "到達予測": condition_map.get(
-                    area['firstHeight'].get('condition', ''),
-                    f"早いところで、{arrival_time}ごろ到達とみられます" if arrival_time != "不明" else ""
-                )
-            })
-        for grade_name in warning_levels:
-            if warnings[grade_name]:
-                if first_alert:
-                    combined_message += f"津波情報。{grade_name}が発表されました。\n"
-                    first_alert = False
-                combined_message += f"{grade_name}が発表されている地域をお伝えします。\n"
-                combined_message += "\n".join(
-                    [f"{info['地域']}、予想の高さ{info['予想の高さ']}、{info['到達予測']}" for info in warnings[grade_name]]
-                ) + "\n"
-    if combined_message:
-        print(combined_message)
-        await speak_bouyomi(combined_message)
-        await play_sound("Tsunami")
-
-def convert_scale_to_text(scale):
-    return {
-        10: "震度1", 20: "震度2", 30: "震度3", 40: "震度4",
-        45: "震度5弱", 46: "震度5弱以上と推定", 50: "震度5強",
-        55: "震度6弱", 60: "震度6強", 70: "震度7"
-    }.get(scale, "不明")
-
-def convert_tsunami(tsunami, foreign_tsunami=None, domestic=True):
-    if foreign_tsunami is None and not domestic:
-        return ""
-    texts = {
-        "None": "この地震による津波の心配はありません。",
-        "Checking": "津波の有無については現在調査中です。今後の情報に警戒してください。",
-        "NonEffective": "この地震により若干の海面変動が予想されますが、津波被害の心配はありません。",
-        "Watch": "この地震により、津波注意報が発表されました。",
-        "Warning": "この地震により、現在津波情報等を発表中です。",
-        "NonEffectiveNearby": "震源の近傍では小さな津波が発生するかもしれませんが、被害の心配はありません。",
-        "WarningNearby": "震源の近傍では津波発生の可能性があります。",
-        "WarningPacific": "太平洋では津波の発生の可能性があります。",
-        "WarningPacificWide": "太平洋の広域で津波の可能性があります。",
-        "WarningIndian": "インド洋では津波の可能性があります。",
-        "WarningIndianWide": "インド洋の広域で津波の可能性があります。",
-        "Potential": "一般にこの規模では津波の可能性があります。"
-    }
-    return texts.get(tsunami, "")
-
-def convert_type(type_str):
-    return {
-        "ScalePrompt": "震度速報",
-        "Destination": "震源に関する情報",
-        "ScaleAndDestination": "地震情報",
-        "DetailScale": "地震情報",
-        "Foreign": "遠地地震情報",
-        "Other": "地震情報"
-    }.get(type_str, "地震情報")
-
-async def display_earthquake_info(data):
-    type_info = convert_type(data.get('issue', {}).get('type', 'Other'))
-    text = f"{type_info}。"
-    earthquake = data.get('earthquake', {})
-    time = earthquake.get('time', '不明')
-    if time != '不明':
-        dt = datetime.strptime(time, '%Y/%m/%d %H:%M:%S')
-        text += f"{dt.hour}時{dt.minute}分ごろ地震がありました。"
-    hypocenter = earthquake.get('hypocenter', {})
-    if hypocenter.get('name'):
-        text += f"震源地は{hypocenter['name']}、"
-    if (depth := hypocenter.get('depth', -1)) >= 0:
-        text += f"震源の深さは{'ごく浅い' if depth == 0 else f'{depth}キロメートル'}。"
-    if (magnitude := hypocenter.get('magnitude', -1)) >= 0:
-        text += f"地震の規模を示すマグニチュードは{magnitude:.1f}と推定されています。"
-    text += convert_tsunami(earthquake.get('domesticTsunami', ''), domestic=True)
-    foreign_tsunami = earthquake.get('foreignTsunami', None)
-    if foreign_tsunami not in [None, "Unknown"]:
-        text += convert_tsunami(foreign_tsunami, domestic=False)
-    points = data.get('points', [])
-    if points:
-        max_scale_region = {}
-        for point in points:
-            if (scale := point.get('scale', -1)) > 0:
-                pref = point.get('pref', '不明')
-                max_scale_region[pref] = max(max_scale_region.get(pref, 0), scale)
-        max_scale = max(max_scale_region.values(), default=0)
-        if max_scale:
-            areas = [pref for pref, scale in max_scale_region.items() if scale == max_scale]
-            text += f"最大{convert_scale_to_text(max_scale)}を{'、'.join(areas)}で観測しました。"
-        other_scales = {s: [] for s in set(max_scale_region.values()) if s < max_scale}
-        for pref, scale in max_scale_region.items():
-            if scale < max_scale:
-                other_scales[scale].append(pref)
-        if other_scales:
-            text += "また、" + "、".join(
-                f"{convert_scale_to_text(scale)}を{'、'.join(prefs)}"
-                for scale, prefs in sorted(other_scales.items(), reverse=True)
-            ) + "で観測しました。"
-    print(text)
-    await speak_bouyomi(text)
-    await play_sound(data.get('issue', {}).get('type', 'Other'))
-
-async def handle_message(ws, message, handlers):
-    data = json.loads(message)
-    code = data.get('code')
-    if code in handlers:
-        await handlers[code](data)
-
-async def run_websocket(url, handlers):
-    async with aiohttp.ClientSession() as session:
-        async with session.ws_connect(url) as ws:
-            async for msg in ws:
-                if msg.type == aiohttp.WSMsgType.TEXT:
-                    await handle_message(ws, msg.data, handlers)
-
-async def main():
-    p2p_handlers = {
-        551: display_earthquake_info,
-        552: lambda data: process_tsunami_data([data])
-    }
-    wolfx_handlers = {
-        None: lambda data: process_eew_data(data, None)
-    }
-    await asyncio.gather(
-        run_websocket("wss://api.p2pquake.net/v2/ws", p2p_handlers),
-        run_websocket("wss://ws-api.wolfx.jp/jma_eew", wolfx_handlers)
-    )
-
-if __name__ == "__main__":
-    asyncio.run(main())
+import aiohttp
+import asyncio
+import itertools
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from yomiage.bouyomi import get_client, close_client
+from yomiage.announce import origin_clock
+from yomiage.audio import SoundPlayer
+from yomiage.eew import EEW_CANCEL_TEXT, EEW_HEADERS, EEW_FINAL_HEADERS
+from yomiage.feed import FeedQueue, drain, frame_code, is_droppable, is_heartbeat, receive_forever, close_session
+from yomiage.records import loads, tsunami_from_dict
+from yomiage.tsunami import TSUNAMI_LEVELS, TSUNAMI_GRADES, TsunamiBoard, area_text, change_chunks
+
+SOUNDS_DIR = "./Sounds"
+SOUND_FILES = {
+    "EEWWarning": "Eewwarning.mp3",
+    "EEWForecast": "Eewforecast.mp3",
+    "Tsunami": "Tsunami.mp3",
+    "Tsunamicancel": "Tsunamicancel.mp3",
+    "ScalePrompt": "ScalePrompt.mp3",
+    "Destination": "Destination.mp3",
+    "ScaleAndDestination": "Earthquake.mp3",
+    "DetailScale": "Earthquake.mp3",
+    "Foreign": "Foreign.mp3",
+}
+
+# 効果音は PCM に変換して持っておき、開いたままの出力デバイスに流す
+sound_player = SoundPlayer(SOUNDS_DIR, SOUND_FILES)
+
+SPEECH_LEAD = 0.3
+speech_tasks = set()
+
+# チャイムを鳴らし始め、鳴り終わる SPEECH_LEAD 秒前に完了する Future を返す
+# 文を作っている間もチャイムは鳴り続け、EEW警報のチャイムは鳴っている途中の音を打ち切る
+def start_chime(event_type):
+    return sound_player.start(event_type, urgent=event_type == "EEWWarning", lead=SPEECH_LEAD)
+
+# チャイムが聞こえてから chunks を1つずつ順に読み上げる（受信の処理はチャイムを待たずに次へ進む）
+# chunks が生成器なら、前の区切りを送り終えてから次の区切りを作る
+# チャイムは予約した順に鳴るので、読み上げも予約した順になる
+def speak_chunks(cue, chunks, echo=False):
+    async def run():
+        if cue is not None:
+            await cue
+        for chunk in chunks:
+            if echo:
+                print(chunk, end="")
+            await speak_bouyomi(chunk)
+    task = asyncio.create_task(run())
+    speech_tasks.add(task)
+    task.add_done_callback(speech_tasks.discard)
+
+def speak_after(cue, text):
+    speak_chunks(cue, (text,))
+
+async def speak_bouyomi(text, voice=0, volume=-1, speed=-1, tone=-1):
+    try:
+        return await get_client().talk(text, voice, volume, speed, tone, timeout=2) == 200
+    except aiohttp.ClientError as e:
+        print(f"棒読みちゃんエラー: {e}")
+        return False
+
+last_eew_message = None
+
+# 緊急地震速報の読み上げ文。前回と同じ文なら None
+# 電文は1回しか読まないので、レコードに詰め替えずに辞書から必要な項目だけを読む（見出しは yomiage.eew で作ってあるもの）
+def process_eew_data(data, last_message):
+    if data.get('isCancel', False):
+        message = EEW_CANCEL_TEXT
+    else:
+        warn = bool(data.get('isWarn'))
+        header = EEW_FINAL_HEADERS[warn] if data.get('isFinal') else f"{EEW_HEADERS[warn]}第{data.get('Serial', '不明')}報。"
+        message = (
+            f"{header}推定最大震度は{data.get('MaxIntensity', '不明')}です。"
+            f"震源地は{data.get('Hypocenter', '不明')}、震源の深さは{data.get('Depth', '不明')}キロメートル、"
+            f"地震の規模を示すマグニチュードは{data.get('Magunitude', '不明')}と推定されています。"
+        )
+    return message if message != last_message else None
+
+async def handle_eew(data):
+    global last_eew_message
+    if data.get('type') in ('heartbeat', 'pong'):
+        return
+    message = process_eew_data(data, last_eew_message)
+    if message:
+        last_eew_message = message
+        cue = None if data.get('isCancel', False) else start_chime("EEWWarning" if data.get('isWarn') else "EEWForecast")
+        print(message)
+        speak_after(cue, message)
+
+# 津波予報の読み上げ文を、見出しと地域ごとの1行に分けて順に返す（「津波情報。〜が発表されました。」は最初の1回だけ）
+def tsunami_texts(tsunamis):
+    first_alert = True
+    for tsunami in sorted(tsunamis, key=lambda t: t.time, reverse=True):
+        if tsunami.cancelled:
+            yield "津波情報。津波予報が解除されました。\n"
+            continue
+        by_level = {level: [] for level in TSUNAMI_LEVELS}
+        for area in tsunami.areas:
+            level = TSUNAMI_GRADES.get(area.grade)
+            if level is not None:
+                by_level[level].append(area)
+        for level in TSUNAMI_LEVELS:
+            if by_level[level]:
+                if first_alert:
+                    yield f"津波情報。{level}が発表されました。\n{level}が発表されている地域をお伝えします。\n"
+                    first_alert = False
+                else:
+                    yield f"{level}が発表されている地域をお伝えします。\n"
+                for area in by_level[level]:
+                    yield area_text(area)
+
+tsunami_board = TsunamiBoard()
+
+# 長い津波予報も1回の /Talk にまとめず、区切りを作りながら順に送る
+# 続報は、前の予報から変わった地域だけを読む（何も出ていなかったときの予報はすべての地域）
+async def process_tsunami_data(data):
+    texts = []
+    for tsunami in sorted(map(tsunami_from_dict, data), key=lambda t: t.time):
+        first = not tsunami_board.areas
+        changes = tsunami_board.apply(tsunami)
+        if changes is None:
+            continue
+        texts.append(tsunami_texts([tsunami]) if first or tsunami.cancelled else change_chunks(changes))
+    chunks = itertools.chain.from_iterable(texts)
+    first = next(chunks, None)
+    if first is None:
+        return
+    if any(tsunami.get("cancelled", False) for tsunami in data):
+        start_chime("Tsunamicancel")
+    cue = start_chime("Tsunami")
+    speak_chunks(cue, itertools.chain((first,), chunks), echo=True)
+
+def convert_scale_to_text(scale):
+    return {
+        10: "震度1", 20: "震度2", 30: "震度3", 40: "震度4",
+        45: "震度5弱", 46: "震度5弱以上と推定", 50: "震度5強",
+        55: "震度6弱", 60: "震度6強", 70: "震度7"
+    }.get(scale, "不明")
+
+def convert_tsunami(tsunami, foreign_tsunami=None, domestic=True):
+    if foreign_tsunami is None and not domestic:
+        return ""
+    texts = {
+        "None": "この地震による津波の心配はありません。",
+        "Checking": "津波の有無については現在調査中です。今後の情報に警戒してください。",
+        "NonEffective": "この地震により若干の海面変動が予想されますが、津波被害の心配はありません。",
+        "Watch": "この地震により、津波注意報が発表されました。",
+        "Warning": "この地震により、現在津波情報等を発表中です。",
+        "NonEffectiveNearby": "震源の近傍では小さな津波が発生するかもしれませんが、被害の心配はありません。",
+        "WarningNearby": "震源の近傍では津波発生の可能性があります。",
+        "WarningPacific": "太平洋では津波の発生の可能性があります。",
+        "WarningPacificWide": "太平洋の広域で津波の可能性があります。",
+        "WarningIndian": "インド洋では津波の可能性があります。",
+        "WarningIndianWide": "インド洋の広域で津波の可能性があります。",
+        "Potential": "一般にこの規模では津波の可能性があります。"
+    }
+    return texts.get(tsunami, "")
+
+def convert_type(type_str):
+    return {
+        "ScalePrompt": "震度速報",
+        "Destination": "震源に関する情報",
+        "ScaleAndDestination": "地震情報",
+        "DetailScale": "地震情報",
+        "Foreign": "遠地地震情報",
+        "Other": "地震情報"
+    }.get(type_str, "地震情報")
+
+async def display_earthquake_info(data):
+    cue = start_chime(data.get('issue', {}).get('type', 'Other'))
+    type_info = convert_type(data.get('issue', {}).get('type', 'Other'))
+    text = f"{type_info}。"
+    earthquake = data.get('earthquake', {})
+    time = earthquake.get('time', '不明')
+    if time != '不明':
+        text += f"{origin_clock(time)}ごろ地震がありました。"
+    hypocenter = earthquake.get('hypocenter', {})
+    if hypocenter.get('name'):
+        text += f"震源地は{hypocenter['name']}、"
+    if (depth := hypocenter.get('depth', -1)) >= 0:
+        text += f"震源の深さは{'ごく浅い' if depth == 0 else f'{depth}キロメートル'}。"
+    if (magnitude := hypocenter.get('magnitude', -1)) >= 0:
+        text += f"地震の規模を示すマグニチュードは{magnitude:.1f}と推定されています。"
+    text += convert_tsunami(earthquake.get('domesticTsunami', ''), domestic=True)
+    foreign_tsunami = earthquake.get('foreignTsunami', None)
+    if foreign_tsunami not in [None, "Unknown"]:
+        text += convert_tsunami(foreign_tsunami, domestic=False)
+    points = data.get('points', [])
+    if points:
+        max_scale_region = {}
+        for point in points:
+            if (scale := point.get('scale', -1)) > 0:
+                pref = point.get('pref', '不明')
+                max_scale_region[pref] = max(max_scale_region.get(pref, 0), scale)
+        max_scale = max(max_scale_region.values(), default=0)
+        if max_scale:
+            areas = [pref for pref, scale in max_scale_region.items() if scale == max_scale]
+            text += f"最大{convert_scale_to_text(max_scale)}を{'、'.join(areas)}で観測しました。"
+        other_scales = {s: [] for s in set(max_scale_region.values()) if s < max_scale}
+        for pref, scale in max_scale_region.items():
+            if scale < max_scale:
+                other_scales[scale].append(pref)
+        if other_scales:
+            text += "また、" + "、".join(
+                f"{convert_scale_to_text(scale)}を{'、'.join(prefs)}"
+                for scale, prefs in sorted(other_scales.items(), reverse=True)
+            ) + "で観測しました。"
+    print(text)
+    speak_after(cue, text)
+
+async def handle_message(ws, message, handlers, prefilter):
+    # 扱わない code の電文と生存確認の電文は解析せずに捨てる
+    if prefilter:
+        code = frame_code(message)
+        if code is not None and code not in handlers or is_heartbeat(message):
+            return
+    data = loads(message)
+    code = data.get('code')
+    if code in handlers:
+        await handlers[code](data)
+
+# prefilter が False の配信（EEW）は、解析する前の振り分けをしない
+# EEWの電文には code がなく、振り分けのための文字列の検索が毎回の電文に上乗せになるだけなので、解析してから heartbeat を捨てる
+async def run_websocket(url, handlers, prefilter=True):
+    queue = FeedQueue()
+    worker = asyncio.create_task(drain(queue, lambda message, _: handle_message(None, message, handlers, prefilter)))
+    droppable = is_droppable if prefilter else (lambda frame: False)
+    try:
+        await receive_forever(url, lambda frame: queue.put(frame, droppable(frame)))
+    finally:
+        worker.cancel()
+
+async def main():
+    p2p_handlers = {
+        551: display_earthquake_info,
+        552: lambda data: process_tsunami_data([data])
+    }
+    wolfx_handlers = {
+        None: handle_eew
+    }
+    try:
+        await asyncio.gather(
+            run_websocket("wss://api.p2pquake.net/v2/ws", p2p_handlers),
+            run_websocket("wss://ws-api.wolfx.jp/jma_eew", wolfx_handlers, prefilter=False),
+            asyncio.to_thread(sound_player.preload),
+        )
+    finally:
+        await close_session()
+        await close_client()
+        sound_player.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,154 @@
+import re
+import string
+import functools
+
+from yomiage.intensity import group_scales
+
+# 地震情報の読み上げ文のひな形（config.json の ANNOUNCEMENT で一部だけ上書きできる）
+DEFAULT_TEMPLATES = {
+    "header": "{type}。",
+    "time": "{time}ごろ地震がありました。",
+    "hypocenter": "震源地は{name}、",
+    "depth": "震源の深さは{depth}。",
+    "depth_shallow": "ごく浅い",
+    "depth_km": "{depth}キロメートル",
+    "magnitude": "地震の規模を示すマグニチュードは{magnitude:.1f}と推定されています。",
+    "max_scale": "最大{scale}を{prefs}で観測しました。",
+    "other_scales": "また、{scales}で観測しました。",
+    "scale_prefs": "{scale}を{prefs}",
+    "update_header": "{type}。{time}ごろの地震の続報です。",
+    "update_max_scale": "最大震度は{scale}に引き上げられ、{prefs}で観測しました。",
+    "update_new_scales": "新たに、{scales}で観測しました。",
+    "separator": "、",
+}
+
+SPEC_PATTERN = re.compile(r"[\w.<>^=+\- ,%#]*")
+
+# ひな形を、読み上げ文を作る関数にしておく（毎回ひな形を解析しない。eval は使わない）
+# 使えるのは {名前} と {名前:書式} だけで、属性・添字・!r などの変換・入れ子の書式は使えない
+# 書式のない項目を引数の順に1回ずつ使うひな形（既定のひな形のほとんど）は、固定の部分を埋め込んだ f文字列で作る
+# それ以外は、引数の位置で埋める書式文字列の format を使う
+def compile_template(template, fields):
+    body = []
+    literals = [""]
+    order = []
+    plain = True
+    for literal, field, spec, conversion in string.Formatter().parse(template):
+        body.append(literal.replace("{", "{{").replace("}", "}}"))
+        literals[-1] += literal
+        if field is None:
+            continue
+        if field not in fields or conversion or not SPEC_PATTERN.fullmatch(spec or ""):
+            raise ValueError(f"使えない項目です: {{{field}}}（{template}）")
+        index = fields.index(field)
+        body.append(f"{{{index}:{spec}}}" if spec else f"{{{index}}}")
+        literals.append("")
+        order.append(index)
+        plain = plain and not spec
+    if plain and order == list(range(len(fields))):
+        if len(order) == 1:
+            head, tail = literals
+            return lambda a: f"{head}{a}{tail}"
+        if len(order) == 2:
+            head, middle, tail = literals
+            return lambda a, b: f"{head}{a}{middle}{b}{tail}"
+    return "".join(body).format
+
+# "2024/01/01 16:12:00" → "16時12分"（同じ時刻の報が続くので結果を覚えておく）
+@functools.lru_cache(maxsize=256)
+def origin_clock(origin_time):
+    clock = origin_time.split(" ")[1]
+    hour, minute = clock.split(":")[:2]
+    return f"{int(hour)}時{int(minute)}分"
+
+# ひな形ごとに使える項目（この順で引数に渡す）
+TEMPLATE_FIELDS = {
+    "header": ("type",),
+    "time": ("time",),
+    "hypocenter": ("name",),
+    "depth": ("depth",),
+    "depth_km": ("depth",),
+    "magnitude": ("magnitude",),
+    "max_scale": ("scale", "prefs"),
+    "other_scales": ("scales",),
+    "scale_prefs": ("scale", "prefs"),
+    "update_header": ("type", "time"),
+    "update_max_scale": ("scale", "prefs"),
+    "update_new_scales": ("scales",),
+}
+
+# 地震情報（yomiage.records.Earthquake）から読み上げ文を作る
+# ひな形は起動時に一度だけ関数にし、読み上げ文は部品を並べて最後に1回だけ連結する
+class AnnouncementRenderer:
+    def __init__(self, type_text, scale_text, tsunami_text, templates=None):
+        templates = dict(DEFAULT_TEMPLATES, **(templates or {}))
+        t = {name: compile_template(templates[name], fields) for name, fields in TEMPLATE_FIELDS.items()}
+        self._type_text = type_text
+        self._headers = {key: t["header"](label) for key, label in type_text.items()}
+        self._default_header = t["header"]("地震情報")
+        self._scale_text = {int(key): value for key, value in scale_text.items()}
+        self._tsunami_text = tsunami_text
+        self._shallow = t["depth"](templates["depth_shallow"])
+        self._separator = templates["separator"]
+        self._time = t["time"]
+        self._hypocenter = t["hypocenter"]
+        self._depth = t["depth"]
+        self._depth_km = t["depth_km"]
+        self._magnitude = t["magnitude"]
+        self._max_scale = t["max_scale"]
+        self._other_scales = t["other_scales"]
+        self._scale_prefs = t["scale_prefs"]
+        self._update_header = t["update_header"]
+        self._update_max_scale = t["update_max_scale"]
+        self._update_new_scales = t["update_new_scales"]
+
+    def scale(self, scale):
+        return self._scale_text.get(scale, "不明")
+
+    def _scale_groups(self, groups):
+        join = self._separator.join
+        scale_prefs = self._scale_prefs
+        scale_text = self._scale_text
+        return join([scale_prefs(scale_text.get(s, "不明"), join(prefs)) for s, prefs in groups])
+
+    def _hypocenter_parts(self, hypocenter, parts):
+        if hypocenter.name:
+            parts.append(self._hypocenter(hypocenter.name))
+        depth = hypocenter.depth
+        if depth == 0:
+            parts.append(self._shallow)
+        elif depth > 0:
+            parts.append(self._depth(self._depth_km(depth)))
+        if hypocenter.magnitude >= 0:
+            parts.append(self._magnitude(hypocenter.magnitude))
+
+    # groups は震度の大きい順の [(震度, [都道府県, ...]), ...]（yomiage.intensity.group_scales の結果）
+    def render(self, quake, groups):
+        parts = [self._headers.get(quake.issue_type, self._default_header)]
+        if quake.time != "不明":
+            parts.append(self._time(origin_clock(quake.time)))
+        self._hypocenter_parts(quake.hypocenter, parts)
+        parts.append(self._tsunami_text.get(quake.domestic_tsunami, ""))
+        if groups:
+            max_scale, prefs = groups[0]
+            parts.append(self._max_scale(self.scale(max_scale), self._separator.join(prefs)))
+            if len(groups) > 1:
+                parts.append(self._other_scales(self._scale_groups(groups[1:])))
+        return "".join(parts)
+
+    # 続報（yomiage.quakes.QuakeDiff）で変わった点だけの読み上げ文
+    def render_update(self, quake, diff):
+        parts = [self._update_header(self._type_text.get(quake.issue_type, "地震情報"), origin_clock(quake.time))]
+        if diff.hypocenter_changed:
+            self._hypocenter_parts(quake.hypocenter, parts)
+        if diff.tsunami_changed:
+            parts.append(self._tsunami_text.get(quake.domestic_tsunami, ""))
+        updated = diff.updated_scales
+        if diff.max_raised:
+            max_scale = diff.event.max_scale
+            prefs = [pref for pref, s in updated.items() if s == max_scale]
+            parts.append(self._update_max_scale(self.scale(max_scale), self._separator.join(prefs)))
+            updated = {pref: s for pref, s in updated.items() if s != max_scale}
+        if groups := group_scales(updated):
+            parts.append(self._update_new_scales(self._scale_groups(groups)))
+        return "".join(parts)
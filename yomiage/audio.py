@@ -0,0 +1,347 @@
+import os
+import time
+import wave
+import asyncio
+import threading
+import collections
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+SAMPLE_WIDTH = 2
+FRAME_BYTES = CHANNELS * SAMPLE_WIDTH
+
+_miniaudio = None
+
+# miniaudio（任意）は読み込みに時間がかかるので、最初に使うときに読み込む。入っていなければ None
+def get_miniaudio():
+    global _miniaudio
+    if _miniaudio is None:
+        try:
+            import miniaudio
+        except ImportError:
+            miniaudio = False
+        _miniaudio = miniaudio
+    return _miniaudio or None
+
+# 音声ファイルを PCM（16bit・ステレオ・44.1kHz のバイト列）に変換する。変換できなければ None
+# mp3 などは miniaudio があるときだけ変換でき、同じ形式の wav は標準ライブラリだけで読める
+def decode_file(path):
+    miniaudio = get_miniaudio()
+    if miniaudio is not None:
+        sound = miniaudio.decode_file(
+            path, output_format=miniaudio.SampleFormat.SIGNED16, nchannels=CHANNELS, sample_rate=SAMPLE_RATE,
+        )
+        return sound.samples.tobytes()
+    if path.lower().endswith(".wav"):
+        with wave.open(path, "rb") as f:
+            if (f.getnchannels(), f.getsampwidth(), f.getframerate()) == (CHANNELS, SAMPLE_WIDTH, SAMPLE_RATE):
+                return f.readframes(f.getnframes())
+    return None
+
+# 従来の鳴らし方（呼ぶたびにファイルを開いて変換し、プレーヤーを作る）
+def play_file(path):
+    from playsound import playsound
+    playsound(path)
+
+# 流す予約をした1つの音
+# cue は、残りが cue_bytes 以下になったとき（打ち切られたときも）に1回だけ呼ぶ
+class Sound:
+    __slots__ = ("pcm", "offset", "submitted", "done", "cue", "cue_bytes")
+
+    def __init__(self, pcm, done, cue=None, lead=0.0):
+        self.pcm = memoryview(pcm)
+        self.offset = 0
+        self.submitted = time.perf_counter()
+        self.done = done
+        self.cue = cue
+        self.cue_bytes = min(len(self.pcm), int(lead * SAMPLE_RATE) * FRAME_BYTES)
+
+# 出力先が少しずつ読み出す、ひとつながりの PCM の流れ
+# 予約した音を届いた順に流し、何も予約されていなければ無音を返す
+# 予約から最初のサンプルが読み出されるまでの時間を記録する
+class PCMStream:
+    def __init__(self, history=256):
+        self._lock = threading.Lock()
+        self._queue = collections.deque()
+        self._current = None
+        self.latencies = collections.deque(maxlen=history)
+        self.played = 0
+        self.interrupted = 0
+
+    # pcm を流す予約をする。流し終えたとき（打ち切られたときも）出力先のスレッドから done() を呼ぶ
+    # cue を渡すと、残りが lead 秒以下になったときに cue() を呼ぶ（lead が音の長さ以上なら鳴り始めたとき）
+    # urgent なら、流している音と予約済みの音を打ち切ってすぐに流す
+    # 打ち切った音の cue はこの音の cue と一緒に呼ぶ（打ち切られた音の後の読み上げも、この音の後になる）
+    def submit(self, pcm, done=None, urgent=False, cue=None, lead=0.0):
+        cut = []
+        cues = [cue] if cue is not None else []
+        with self._lock:
+            if urgent:
+                if self._current is not None:
+                    cut.append(self._current)
+                    self._current = None
+                cut.extend(self._queue)
+                self._queue.clear()
+                for previous in cut:
+                    if previous.cue is not None:
+                        cues.append(previous.cue)
+                        previous.cue = None
+            sound = Sound(pcm, done, self._chain(cues), lead)
+            self._queue.append(sound)
+        self.interrupted += len(cut)
+        for previous in cut:
+            self._finish(previous)
+        return sound
+
+    def _chain(self, cues):
+        if len(cues) <= 1:
+            return cues[0] if cues else None
+        def cue():
+            for callback in cues:
+                callback()
+        return cue
+
+    # frames フレーム分の PCM を返す。(データ, 音を流しているか)
+    def read(self, frames):
+        size = frames * FRAME_BYTES
+        out = bytearray()
+        finished = []
+        cued = []
+        with self._lock:
+            while len(out) < size:
+                if self._current is None:
+                    if not self._queue:
+                        break
+                    self._current = self._queue.popleft()
+                    self.latencies.append(time.perf_counter() - self._current.submitted)
+                    self.played += 1
+                sound = self._current
+                chunk = sound.pcm[sound.offset:sound.offset + size - len(out)]
+                out += chunk
+                sound.offset += len(chunk)
+                if sound.cue is not None and len(sound.pcm) - sound.offset <= sound.cue_bytes:
+                    cued.append(sound)
+                if sound.offset >= len(sound.pcm):
+                    finished.append(sound)
+                    self._current = None
+        for sound in cued:
+            self._cue(sound)
+        for sound in finished:
+            self._finish(sound)
+        active = bool(out)
+        if len(out) < size:
+            out += bytes(size - len(out))
+        return bytes(out), active
+
+    def _cue(self, sound):
+        cue, sound.cue = sound.cue, None
+        if cue is not None:
+            try:
+                cue()
+            except RuntimeError:
+                pass
+
+    def _finish(self, sound):
+        self._cue(sound)
+        if sound.done is not None:
+            try:
+                sound.done()
+            except RuntimeError:
+                # 待っていたイベントループが既に閉じている
+                pass
+
+# miniaudio の出力デバイスを1つだけ開き、PCMStream を流し続ける
+class DeviceSink:
+    def __init__(self, stream, buffer_ms=50):
+        miniaudio = get_miniaudio()
+        self.stream = stream
+        self.device = miniaudio.PlaybackDevice(
+            output_format=miniaudio.SampleFormat.SIGNED16, nchannels=CHANNELS, sample_rate=SAMPLE_RATE,
+            buffersize_msec=buffer_ms,
+        )
+        generator = self._generate()
+        next(generator)
+        self.device.start(generator)
+
+    def _generate(self):
+        frames = yield b""
+        while True:
+            frames = yield self.stream.read(frames)[0]
+
+    def close(self):
+        self.device.close()
+
+# 音を出さない出力先（音を出せない環境での確認・計測用）
+# 実際のデバイスと同じく、period 秒ごとにその分の PCM を読み出す
+class NullSink:
+    def __init__(self, stream, period=0.01):
+        self.stream = stream
+        self.period = period
+        self.frames = int(SAMPLE_RATE * period)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        next_read = time.perf_counter()
+        while not self._stop.is_set():
+            data, active = self.stream.read(self.frames)
+            if active:
+                self.write(data)
+            next_read += self.period
+            self._stop.wait(max(0.0, next_read - time.perf_counter()))
+
+    def write(self, data):
+        pass
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+# 流した音を wav ファイルに書き出す出力先
+class FileSink(NullSink):
+    def __init__(self, stream, path, period=0.01):
+        self._file = wave.open(path, "wb")
+        self._file.setnchannels(CHANNELS)
+        self._file.setsampwidth(SAMPLE_WIDTH)
+        self._file.setframerate(SAMPLE_RATE)
+        super().__init__(stream, period)
+
+    def write(self, data):
+        self._file.writeframes(data)
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+# 効果音をあらかじめ PCM に変換して持っておき、開いたままの1つの出力先に流す
+# sink は "device"（miniaudio の出力デバイス）、"null"（音を出さない）、"file"（path の wav に書き出す）
+# 変換できない音（miniaudio がない環境の mp3 など）や、出力先を開けないときは、従来どおり playsound で鳴らす
+class SoundPlayer:
+    def __init__(self, sounds_dir, sound_files, sink="device", path=None, buffer_ms=50):
+        self.sounds_dir = sounds_dir
+        self.sound_files = sound_files
+        self.sink_type = sink
+        self.path = path
+        self.buffer_ms = buffer_ms
+        self.stream = PCMStream()
+        self.sink = None
+        self._sink_failed = False
+        self._sink_lock = threading.Lock()
+        self._pcm = {}
+        self._tasks = set()
+        self._turn = None
+        self.fallbacks = 0
+
+    # 同じファイルは1回だけ変換する
+    def _load(self, sound_file):
+        if sound_file not in self._pcm:
+            try:
+                pcm = decode_file(os.path.join(self.sounds_dir, sound_file))
+            except Exception as e:
+                print(f"音声を読み込めませんでした（{sound_file}）: {e}")
+                pcm = None
+            self._pcm[sound_file] = pcm
+        return self._pcm[sound_file]
+
+    def _open(self):
+        with self._sink_lock:
+            if self.sink is not None or self._sink_failed:
+                return self.sink
+            try:
+                if self.sink_type == "null":
+                    self.sink = NullSink(self.stream)
+                elif self.sink_type == "file":
+                    self.sink = FileSink(self.stream, self.path or "sounds.wav")
+                elif get_miniaudio() is not None:
+                    self.sink = DeviceSink(self.stream, self.buffer_ms)
+                else:
+                    self._sink_failed = True
+            except Exception as e:
+                print(f"音声の出力先を開けませんでした: {e}")
+                self._sink_failed = True
+            return self.sink
+
+    # すべての効果音を変換し、出力先を開いておく。変換できた音の数を返す
+    def preload(self):
+        for sound_file in set(self.sound_files.values()):
+            self._load(sound_file)
+        self._open()
+        return sum(1 for pcm in self._pcm.values() if pcm is not None)
+
+    # 鳴らし終えるまで待つ
+    # cue（asyncio.Future）を渡すと、残りが lead 秒以下になったときに完了させる（鳴らせなかったときも）
+    # playsound で鳴らす音は重ならないよう、呼ばれた順に1つずつ鳴らす
+    # （呼ばれるたびに turn を作り、前に呼ばれた play が終わったら次の turn を完了させる）
+    # urgent の音は前の音を待たずに鳴らす（playsound は鳴っている音を打ち切れないので、重なって鳴る）
+    # playsound では音の長さがわからないので、鳴り始めに cue を完了させるのは lead が無限大のときだけ
+    async def play(self, event_type, urgent=False, cue=None, lead=0.0):
+        previous = self._turn
+        self._turn = turn = asyncio.get_running_loop().create_future()
+        streamed = False
+        try:
+            sound_file = self.sound_files.get(event_type)
+            if not sound_file:
+                return
+            if sound_file in self._pcm and self.sink is not None:
+                pcm = self._pcm[sound_file]
+                sink = self.sink
+            else:
+                pcm = await asyncio.to_thread(self._load, sound_file)
+                sink = await asyncio.to_thread(self._open)
+            if pcm is None or sink is None:
+                self.fallbacks += 1
+                if previous is not None and not urgent:
+                    await asyncio.shield(previous)
+                if cue is not None and lead == float("inf"):
+                    _resolve(cue)
+                await asyncio.to_thread(play_file, os.path.join(self.sounds_dir, sound_file))
+                return
+            loop = asyncio.get_running_loop()
+            done = loop.create_future()
+            on_cue = None if cue is None else lambda: loop.call_soon_threadsafe(_resolve, cue)
+            self.stream.submit(pcm, lambda: loop.call_soon_threadsafe(_resolve, done), urgent, on_cue, lead)
+            streamed = True
+            await done
+        finally:
+            # 流した音の cue は PCMStream が呼ぶ（打ち切られたときは、打ち切った音の cue と一緒に）
+            if cue is not None and not streamed:
+                _resolve(cue)
+            if previous is None or previous.done():
+                _resolve(turn)
+            else:
+                previous.add_done_callback(lambda _: _resolve(turn))
+
+    # 鳴り終わるのを待たずに鳴らし始める。読み上げを送ってよくなったとき
+    # （残りが lead 秒以下になったとき。lead が音の長さ以上なら鳴り始めたとき）に完了する Future を返す
+    def start(self, event_type, urgent=False, lead=0.0):
+        loop = asyncio.get_running_loop()
+        cue = loop.create_future()
+        task = loop.create_task(self.play(event_type, urgent, cue, lead))
+        self._tasks.add(task)
+        task.add_done_callback(self._played)
+        return cue
+
+    def _played(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"効果音を鳴らせませんでした: {task.exception()}")
+
+    def stats(self):
+        latencies = list(self.stream.latencies)
+        return {
+            "sink": type(self.sink).__name__ if self.sink else "playsound",
+            "cached": sum(1 for pcm in self._pcm.values() if pcm is not None),
+            "played": self.stream.played, "interrupted": self.stream.interrupted, "fallbacks": self.fallbacks,
+            "avg_first_sample_ms": sum(latencies) / len(latencies) * 1000 if latencies else 0.0,
+            "max_first_sample_ms": max(latencies) * 1000 if latencies else 0.0,
+        }
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+            self.sink = None
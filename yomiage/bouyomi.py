@@ -0,0 +1,232 @@
+import json
+import time
+import struct
+import asyncio
+import collections
+
+from yomiage.breaker import CircuitBreaker
+
+BOUYOMI_HOST = "localhost"
+BOUYOMI_HTTP_PORT = 50080
+BOUYOMI_TCP_PORT = 50001
+BOUYOMI_URL = f"http://{BOUYOMI_HOST}:{BOUYOMI_HTTP_PORT}"
+
+# ソケット連携のコマンド番号
+TCP_TALK = 0x0001
+TCP_SKIP = 0x0030
+TCP_CLEAR = 0x0040
+TCP_GET_NOW_PLAYING = 0x0120
+TCP_GET_TASK_COUNT = 0x0130
+TCP_COMMAND = struct.Struct("<h")
+TCP_TASK_COUNT = struct.Struct("<i")
+# ソケット連携のヘッダ（コマンド、速度、音程、音量、声質、文字コード、本文の長さ）
+TCP_TALK_HEADER = struct.Struct("<hhhhhbi")
+TCP_ENCODING_UTF8 = 0
+
+# 1回の読み上げ要求にかかった時間
+class TalkTiming:
+    __slots__ = ("started", "elapsed", "connect", "reused", "status")
+
+    def __init__(self):
+        self.started = time.time()
+        self.elapsed = None
+        self.connect = 0.0
+        self.reused = False
+        self.status = None
+
+    def __repr__(self):
+        return (f"TalkTiming(elapsed={self.elapsed}, connect={self.connect}, "
+                f"reused={self.reused}, status={self.status})")
+
+def summarize_timings(timings):
+    timings = [t for t in timings if t.elapsed is not None]
+    reused = [t.elapsed for t in timings if t.reused]
+    fresh = [t.elapsed for t in timings if not t.reused]
+    return {
+        "count": len(timings),
+        "reused": len(reused),
+        "avg_ms": sum(t.elapsed for t in timings) / len(timings) * 1000 if timings else 0.0,
+        "avg_reused_ms": sum(reused) / len(reused) * 1000 if reused else 0.0,
+        "avg_new_ms": sum(fresh) / len(fresh) * 1000 if fresh else 0.0,
+    }
+
+# 棒読みちゃんへの接続を使い回すクライアント
+class BouyomiClient:
+    def __init__(self, base_url=BOUYOMI_URL, timeout=None, limit=4, keepalive=60, history=256):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.limit = limit
+        self.keepalive = keepalive
+        self.timings = collections.deque(maxlen=history)
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_start.append(self._on_connect_start)
+            trace.on_connection_create_end.append(self._on_connect_end)
+            trace.on_connection_reuseconn.append(self._on_reuse)
+            connector = aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=self.keepalive)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                trace_configs=[trace],
+            )
+        return self._session
+
+    async def _on_connect_start(self, session, ctx, params):
+        ctx.connect_started = time.perf_counter()
+
+    async def _on_connect_end(self, session, ctx, params):
+        if ctx.trace_request_ctx is not None:
+            ctx.trace_request_ctx.connect = time.perf_counter() - ctx.connect_started
+
+    async def _on_reuse(self, session, ctx, params):
+        if ctx.trace_request_ctx is not None:
+            ctx.trace_request_ctx.reused = True
+
+    async def request(self, command, params=None, timeout=None):
+        import aiohttp
+        timing = TalkTiming()
+        start = time.perf_counter()
+        session = self._get_session()
+        kwargs = {"params": params, "trace_request_ctx": timing}
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+        try:
+            async with session.get(f"{self.base_url}/{command}", **kwargs) as res:
+                body = await res.read()
+                timing.status = res.status
+        finally:
+            timing.elapsed = time.perf_counter() - start
+            self.timings.append(timing)
+        return timing.status, body
+
+    async def talk(self, text, voice=0, volume=-1, speed=-1, tone=-1, timeout=None):
+        params = {'text': text, 'voice': voice, 'volume': volume, 'speed': speed, 'tone': tone}
+        status, _ = await self.request("Talk", params, timeout)
+        return status
+
+    # 棒読みちゃん内部の読み上げ待ち件数（再生中の1件は含まない）
+    async def get_task_count(self, timeout=None):
+        _, body = await self.request("GetTalkTaskCount", timeout=timeout)
+        return int(json.loads(body).get("talkTaskCount", 0))
+
+    async def get_now_playing(self, timeout=None):
+        _, body = await self.request("GetNowPlaying", timeout=timeout)
+        return bool(json.loads(body).get("nowPlaying", False))
+
+    async def clear(self, timeout=None):
+        status, _ = await self.request("Clear", timeout=timeout)
+        return status
+
+    async def skip(self, timeout=None):
+        status, _ = await self.request("Skip", timeout=timeout)
+        return status
+
+    def stats(self):
+        return summarize_timings(self.timings)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+# 棒読みちゃんのソケット連携（既定ポート50001）で送信するクライアント
+# 棒読みちゃんは1コマンドごとに接続を閉じるため、送信ごとに接続する
+class BouyomiSocketClient:
+    def __init__(self, host=BOUYOMI_HOST, port=BOUYOMI_TCP_PORT, timeout=None, history=256):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.timings = collections.deque(maxlen=history)
+
+    async def _send(self, packet, timing, response_size=0):
+        start = time.perf_counter()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        timing.connect = time.perf_counter() - start
+        try:
+            writer.write(packet)
+            await writer.drain()
+            return await reader.readexactly(response_size) if response_size else b""
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def command(self, command, response_size=0, timeout=None):
+        timing = TalkTiming()
+        start = time.perf_counter()
+        try:
+            body = await asyncio.wait_for(
+                self._send(TCP_COMMAND.pack(command), timing, response_size), timeout or self.timeout)
+            timing.status = 200
+        finally:
+            timing.elapsed = time.perf_counter() - start
+            self.timings.append(timing)
+        return body
+
+    async def talk(self, text, voice=0, volume=-1, speed=-1, tone=-1, timeout=None):
+        body = text.encode("utf-8")
+        packet = TCP_TALK_HEADER.pack(TCP_TALK, speed, tone, volume, voice, TCP_ENCODING_UTF8, len(body)) + body
+        timing = TalkTiming()
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._send(packet, timing), timeout or self.timeout)
+            timing.status = 200
+        finally:
+            timing.elapsed = time.perf_counter() - start
+            self.timings.append(timing)
+        return timing.status
+
+    async def get_task_count(self, timeout=None):
+        body = await self.command(TCP_GET_TASK_COUNT, TCP_TASK_COUNT.size, timeout)
+        return TCP_TASK_COUNT.unpack(body)[0]
+
+    async def get_now_playing(self, timeout=None):
+        body = await self.command(TCP_GET_NOW_PLAYING, 1, timeout)
+        return body != b"\x00"
+
+    async def clear(self, timeout=None):
+        await self.command(TCP_CLEAR, timeout=timeout)
+        return 200
+
+    async def skip(self, timeout=None):
+        await self.command(TCP_SKIP, timeout=timeout)
+        return 200
+
+    def stats(self):
+        return summarize_timings(self.timings)
+
+    async def close(self):
+        pass
+
+# config.json の "BOUYOMI" 設定からクライアントを作る
+def create_client(config=None):
+    config = config or {}
+    host = config.get("HOST", BOUYOMI_HOST)
+    timeout = config.get("TIMEOUT")
+    if config.get("TRANSPORT", "http") == "tcp":
+        return BouyomiSocketClient(host, config.get("TCP_PORT", BOUYOMI_TCP_PORT), timeout=timeout)
+    return BouyomiClient(f"http://{host}:{config.get('HTTP_PORT', BOUYOMI_HTTP_PORT)}", timeout=timeout)
+
+_client = None
+
+# プロセス内で共有するクライアントを返す
+# 棒読みちゃんが落ちていても呼び出し側が止まらないよう、ブレーカーを挟む
+def get_client():
+    global _client
+    if _client is None:
+        _client = CircuitBreaker(BouyomiClient())
+    return _client
+
+def configure_client(config):
+    global _client
+    _client = CircuitBreaker(create_client(config), timeout=config.get("TIMEOUT") or 2.0)
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,59 @@
+import time
+import collections
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from yomiage.bouyomi import BOUYOMI_URL, TalkTiming, summarize_timings
+from yomiage.breaker import SyncCircuitBreaker
+
+# requests用の接続を使い回すクライアント（p2p.py / tsunami.py など同期版で使用）
+class SyncBouyomiClient:
+    def __init__(self, base_url=BOUYOMI_URL, timeout=None, pool_size=4, history=256):
+        self.base_url = base_url
+        self.timeout = timeout
+        self.timings = collections.deque(maxlen=history)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self._adapter = adapter
+
+    # これまでに張った接続の総数（増えていなければ既存の接続を再利用している）
+    def _num_connections(self):
+        pools = self._adapter.poolmanager.pools
+        return sum(pools[key].num_connections for key in pools.keys())
+
+    def request(self, command, params=None, timeout=None):
+        url = f"{self.base_url}/{command}"
+        timing = TalkTiming()
+        before = self._num_connections()
+        start = time.perf_counter()
+        try:
+            res = self.session.get(url, params=params, timeout=timeout or self.timeout)
+            timing.status = res.status_code
+        finally:
+            timing.elapsed = time.perf_counter() - start
+            timing.reused = self._num_connections() == before
+            self.timings.append(timing)
+        return res
+
+    def talk(self, text, voice=0, volume=-1, speed=-1, tone=-1, timeout=None):
+        params = {'text': text, 'voice': voice, 'volume': volume, 'speed': speed, 'tone': tone}
+        return self.request("Talk", params, timeout).status_code
+
+    def get_task_count(self, timeout=None):
+        return int(self.request("GetTalkTaskCount", timeout=timeout).json().get("talkTaskCount", 0))
+
+    def stats(self):
+        return summarize_timings(self.timings)
+
+    def close(self):
+        self.session.close()
+
+_client = None
+
+def get_client():
+    global _client
+    if _client is None:
+        _client = SyncCircuitBreaker(SyncBouyomiClient())
+    return _client
@@ -0,0 +1,285 @@
+import time
+import asyncio
+import threading
+
+from yomiage.scheduler import EEW_FORECAST, EARTHQUAKE
+
+# ブレーカーの状態
+CLOSED = "closed"
+OPEN = "open"
+
+# ブレーカーが開いている間に棒読みちゃんへの問い合わせをすると発生する
+class BouyomiUnavailable(Exception):
+    pass
+
+# 送れなかった読み上げの1件
+class BufferedTalk:
+    __slots__ = ("text", "priority", "args", "buffered")
+
+    def __init__(self, text, priority, args):
+        self.text = text
+        self.priority = priority
+        self.args = args
+        self.buffered = time.time()
+
+    @property
+    def is_eew(self):
+        return self.priority <= EEW_FORECAST
+
+# 状態の管理と退避バッファ（同期版・非同期版で共通）
+# バッファがいっぱいのときは、EEW以外で優先度が最も低いもの（同じなら古いもの）から捨てる
+# EEWは eew_max_age 秒より古ければ読み直さない（古い緊急地震速報は読まない方がよい）
+# 閉じたまま（失敗が failure_threshold 回に届かずに）退避したものは、次に送るときに先に送り直す
+class _BreakerState:
+    def __init__(self, client, failure_threshold=2, timeout=2.0, probe_interval=3.0,
+                 buffer_size=3, buffer_priority=EARTHQUAKE, max_age=300.0, eew_max_age=10.0):
+        self.client = client
+        self.failure_threshold = failure_threshold
+        self.timeout = timeout
+        self.probe_interval = probe_interval
+        self.buffer_size = buffer_size
+        self.buffer_priority = buffer_priority
+        self.max_age = max_age
+        self.eew_max_age = eew_max_age
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.buffer = []
+        self.fast_failed = 0
+        self.dropped = 0
+        self.replayed = 0
+
+    @property
+    def is_open(self):
+        return self.state == OPEN
+
+    def _record_success(self):
+        self.failures = 0
+
+    # 失敗が続いたらブレーカーを開く。開いた直後なら True を返す
+    def _record_failure(self, error):
+        self.failures += 1
+        if self.state == CLOSED and self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = time.time()
+            print(f"棒読みちゃんに接続できないため、復旧するまで送信を止めます: {error}")
+            return True
+        return False
+
+    # 送れなかった読み上げを退避する。優先度の低いものは捨てる
+    def _buffer(self, text, priority, args):
+        if priority is not None and priority <= self.buffer_priority:
+            self.buffer.append(BufferedTalk(text, priority, args))
+            self._evict()
+        else:
+            self.dropped += 1
+
+    # バッファに入りきらない分を捨てる
+    def _evict(self):
+        while len(self.buffer) > self.buffer_size:
+            others = [item for item in self.buffer if not item.is_eew]
+            if others:
+                lowest = max(item.priority for item in others)
+                victim = next(item for item in others if item.priority == lowest)
+            else:
+                victim = self.buffer[0]
+            self.buffer.remove(victim)
+            self.dropped += 1
+
+    def _expired(self, item, now):
+        return now - item.buffered > (self.eew_max_age if item.is_eew else self.max_age)
+
+    # 復旧時に読み直す分を、優先度順（同じなら古い順）・古すぎないものだけ取り出す
+    def _drain(self):
+        now = time.time()
+        items = [item for item in self.buffer if not self._expired(item, now)]
+        self.dropped += len(self.buffer) - len(items)
+        self.buffer.clear()
+        return sorted(items, key=lambda item: (item.priority, item.buffered))
+
+    # 送り直しの途中で送れなくなったら、残りをバッファに戻して失敗を数える。開いた直後なら True を返す
+    def _retry_failed(self, items, error):
+        self.buffer[:0] = items
+        self._evict()
+        return self._record_failure(error)
+
+    # 読み直しの途中で送れなくなったら、残りをバッファに戻してブレーカーを開き直す
+    # 読み直しの間に別の送信の失敗で開いていたら（復旧の確認は既に始まっている）False を返す
+    def _reopen(self, items, error):
+        self.buffer[:0] = items
+        self._evict()
+        if self.is_open:
+            return False
+        print(f"退避していた読み上げを送れませんでした。復旧するまで送信を止めます: {error}")
+        self.state = OPEN
+        self.failures = self.failure_threshold
+        self.opened_at = time.time()
+        return True
+
+    def _closed(self):
+        print(f"棒読みちゃんが復旧しました（停止 {time.time() - self.opened_at:.1f}秒）")
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def stats(self):
+        return {
+            "state": self.state, "buffered": len(self.buffer), "fast_failed": self.fast_failed,
+            "dropped": self.dropped, "replayed": self.replayed,
+        }
+
+# 棒読みちゃんが落ちているときはすぐに諦め、裏で復旧を確認するクライアント
+# BouyomiClient / BouyomiSocketClient と同じように使える
+class CircuitBreaker(_BreakerState):
+    def __init__(self, client, **kwargs):
+        super().__init__(client, **kwargs)
+        self._probe_task = None
+
+    async def talk(self, text, voice=0, volume=-1, speed=-1, tone=-1, timeout=None, priority=None):
+        args = (voice, volume, speed, tone)
+        if self.buffer and not self.is_open:
+            await self._retry()
+        if self.is_open:
+            self.fast_failed += 1
+            self._buffer(text, priority, args)
+            return None
+        try:
+            status = await self.client.talk(text, *args, timeout=timeout or self.timeout)
+        except Exception as e:
+            self._buffer(text, priority, args)
+            if self._record_failure(e):
+                self._probe_task = asyncio.create_task(self._probe())
+            return None
+        self._record_success()
+        return status
+
+    # 閉じている間に退避したものを、優先度順に送り直す
+    async def _retry(self):
+        items = self._drain()
+        for i, item in enumerate(items):
+            try:
+                await self.client.talk(item.text, *item.args, timeout=self.timeout)
+            except Exception as e:
+                if self._retry_failed(items[i:], e):
+                    self._probe_task = asyncio.create_task(self._probe())
+                return
+            self._record_success()
+            self.replayed += 1
+
+    async def _call(self, method, timeout):
+        if self.is_open:
+            self.fast_failed += 1
+            raise BouyomiUnavailable()
+        try:
+            result = await getattr(self.client, method)(timeout=timeout or self.timeout)
+        except Exception as e:
+            if self._record_failure(e):
+                self._probe_task = asyncio.create_task(self._probe())
+            raise
+        self._record_success()
+        return result
+
+    async def get_task_count(self, timeout=None):
+        return await self._call("get_task_count", timeout)
+
+    async def get_now_playing(self, timeout=None):
+        return await self._call("get_now_playing", timeout)
+
+    async def clear(self, timeout=None):
+        return await self._call("clear", timeout)
+
+    async def skip(self, timeout=None):
+        return await self._call("skip", timeout)
+
+    async def _probe(self):
+        while self.is_open:
+            await asyncio.sleep(self.probe_interval)
+            try:
+                await self.client.get_task_count(timeout=self.timeout)
+            except Exception:
+                continue
+            self._closed()
+            items = self._drain()
+            for i, item in enumerate(items):
+                try:
+                    await self.client.talk(item.text, *item.args, timeout=self.timeout)
+                except Exception as e:
+                    if not self._reopen(items[i:], e):
+                        return
+                    break
+                self.replayed += 1
+
+    @property
+    def timings(self):
+        return self.client.timings
+
+    async def close(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+        await self.client.close()
+
+# 同期版（p2p.py / tsunami.py など）。復旧の確認は別スレッドで行う
+class SyncCircuitBreaker(_BreakerState):
+    def __init__(self, client, **kwargs):
+        super().__init__(client, **kwargs)
+        self._lock = threading.Lock()
+        self._probe_thread = None
+
+    def talk(self, text, voice=0, volume=-1, speed=-1, tone=-1, timeout=None, priority=None):
+        args = (voice, volume, speed, tone)
+        with self._lock:
+            if self.buffer and not self.is_open:
+                self._retry()
+            if self.is_open:
+                self.fast_failed += 1
+                self._buffer(text, priority, args)
+                return None
+            try:
+                status = self.client.talk(text, *args, timeout=timeout or self.timeout)
+            except Exception as e:
+                self._buffer(text, priority, args)
+                if self._record_failure(e):
+                    self._probe_thread = threading.Thread(target=self._probe, daemon=True)
+                    self._probe_thread.start()
+                return None
+            self._record_success()
+            return status
+
+    # 閉じている間に退避したものを、優先度順に送り直す（ロックを持って呼ぶ）
+    def _retry(self):
+        items = self._drain()
+        for i, item in enumerate(items):
+            try:
+                self.client.talk(item.text, *item.args, timeout=self.timeout)
+            except Exception as e:
+                if self._retry_failed(items[i:], e):
+                    self._probe_thread = threading.Thread(target=self._probe, daemon=True)
+                    self._probe_thread.start()
+                return
+            self._record_success()
+            self.replayed += 1
+
+    def _probe(self):
+        while self.is_open:
+            time.sleep(self.probe_interval)
+            try:
+                self.client.get_task_count(timeout=self.timeout)
+            except Exception:
+                continue
+            with self._lock:
+                self._closed()
+                items = self._drain()
+                for i, item in enumerate(items):
+                    try:
+                        self.client.talk(item.text, *item.args, timeout=self.timeout)
+                    except Exception as e:
+                        self._reopen(items[i:], e)
+                        break
+                    self.replayed += 1
+
+    @property
+    def timings(self):
+        return self.client.timings
+
+    def close(self):
+        self.client.close()
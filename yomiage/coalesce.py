@@ -0,0 +1,55 @@
+import asyncio
+
+# 短い時間内に届いた同じキーの報をまとめ、1回の flush(key, items) にする
+# 窓は最初の報が届いたときに始まり、window 秒後（または flush を呼んだとき）に閉じる
+# window が 0 以下なら、まとめずにすぐ flush する
+class Coalescer:
+    def __init__(self, flush, window=1.0):
+        self.flush_callback = flush
+        self.window = window
+        self._windows = {}
+        self._tasks = set()
+        self.received = 0
+        self.flushed = 0
+
+    async def add(self, key, item, immediate=False):
+        self.received += 1
+        entry = self._windows.get(key)
+        if entry is None:
+            entry = self._windows[key] = [[], None]
+        entry[0].append(item)
+        if immediate or self.window <= 0:
+            await self.flush(key)
+        elif entry[1] is None:
+            entry[1] = asyncio.get_running_loop().call_later(self.window, self._expire, key)
+
+    def _expire(self, key):
+        task = asyncio.create_task(self.flush(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self, key):
+        entry = self._windows.pop(key, None)
+        if entry is None:
+            return
+        items, handle = entry
+        if handle is not None:
+            handle.cancel()
+        self.flushed += 1
+        try:
+            await self.flush_callback(key, items)
+        except Exception as e:
+            print(f"まとめた報の処理中にエラーが発生しました: {e}")
+
+    async def flush_all(self):
+        for key in list(self._windows):
+            await self.flush(key)
+
+    def pending(self):
+        return sum(len(items) for items, _ in self._windows.values())
+
+    def stats(self):
+        return {
+            "received": self.received, "flushed": self.flushed, "pending": self.pending(),
+            "saved": self.received - self.flushed - len(self._windows),
+        }
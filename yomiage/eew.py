@@ -0,0 +1,135 @@
+import time
+import collections
+
+# 続報を読み上げ直すほどの変化とみなすマグニチュードの差
+MAGNITUDE_THRESHOLD = 0.5
+
+def serial_number(serial):
+    try:
+        return int(serial)
+    except (TypeError, ValueError):
+        return None
+
+def _magnitude(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+EEW_CANCEL_TEXT = "この緊急地震速報は取り消されました"
+EEW_HEADERS = {True: "緊急地震速報（警報）", False: "緊急地震速報（予報）"}
+EEW_FINAL_HEADERS = {warn: f"{header}最終報。" for warn, header in EEW_HEADERS.items()}
+
+# 緊急地震速報（yomiage.records.EEW）の読み上げ文
+# 報ごとに変わらない見出しは先に作っておき、変わる項目だけを埋める
+def format_eew(eew):
+    if eew.is_cancel:
+        return EEW_CANCEL_TEXT
+    warn = bool(eew.is_warn)
+    header = EEW_FINAL_HEADERS[warn] if eew.is_final else f"{EEW_HEADERS[warn]}第{eew.serial}報。"
+    return (
+        f"{header}推定最大震度は{eew.max_intensity}です。"
+        f"震源地は{eew.hypocenter}、震源の深さは{eew.depth}キロメートル、"
+        f"地震の規模を示すマグニチュードは{eew.magnitude}と推定されています。"
+    )
+
+# 前に読み上げた報と比べて、読み上げ直すべき変化があるか
+# （取消・警報かどうか・最大震度が変わった、またはマグニチュードが threshold 以上変わった）
+def is_material(previous, eew, threshold=MAGNITUDE_THRESHOLD):
+    if previous is None:
+        return True
+    if eew.is_cancel != previous.is_cancel or eew.is_warn != previous.is_warn:
+        return True
+    if eew.max_intensity != previous.max_intensity:
+        return True
+    before, after = _magnitude(previous.magnitude), _magnitude(eew.magnitude)
+    if before is None or after is None:
+        return before is not after
+    return abs(after - before) >= threshold
+
+# 1つの地震（EventID）の緊急地震速報について、最新の報と最後に読み上げた報を持つ
+class EEWSlot:
+    __slots__ = ("event_id", "latest_serial", "received", "spoken", "item", "alerted")
+
+    def __init__(self, event_id):
+        self.event_id = event_id
+        self.latest_serial = None
+        self.received = {}
+        self.spoken = None
+        self.item = None
+        self.alerted = False
+
+# EventID ごとに最新の報だけを残し、読み上げ直すべきかを判定する
+# 読み上げ待ちの古い報は、同じ EventID をキーにして新しい報で置き換える（SpeechScheduler の置き換え）
+class EEWTracker:
+    def __init__(self, magnitude_threshold=MAGNITUDE_THRESHOLD, max_events=16, history=256):
+        self.magnitude_threshold = magnitude_threshold
+        self.max_events = max_events
+        self._slots = collections.OrderedDict()
+        self.staleness = collections.deque(maxlen=history)
+        self.received = 0
+        self.out_of_order = 0
+        self.suppressed = 0
+
+    def _slot(self, event_id):
+        slot = self._slots.get(event_id)
+        if slot is None:
+            slot = self._slots[event_id] = EEWSlot(event_id)
+            while len(self._slots) > self.max_events:
+                self._slots.popitem(last=False)
+        else:
+            self._slots.move_to_end(event_id)
+        return slot
+
+    # その地震で警報を初めて受け取ったときだけ True を返す（第1段の短い呼びかけとチャイム用）
+    def first_warning(self, eew):
+        if not eew.is_warn or eew.is_cancel:
+            return False
+        slot = self._slot(eew.event_id)
+        if slot.alerted:
+            return False
+        slot.alerted = True
+        return True
+
+    # 受信した報を記録し、(slot, 読み上げるべきか) を返す
+    # 既に受け取った報より古い報（届く順が入れ替わったもの）は読み上げない
+    def update(self, eew):
+        self.received += 1
+        slot = self._slot(eew.event_id)
+        serial = serial_number(eew.serial)
+        if serial is not None and slot.latest_serial is not None and serial <= slot.latest_serial:
+            self.out_of_order += 1
+            return slot, False
+        if serial is not None:
+            slot.latest_serial = serial
+            slot.received[serial] = time.perf_counter()
+        if not is_material(slot.spoken, eew, self.magnitude_threshold):
+            self.suppressed += 1
+            return slot, False
+        return slot, True
+
+    # 読み上げを予約した報を記録する。前に予約した報の SpeechItem を返す（途中で打ち切るかの判断用）
+    def submitted(self, slot, eew, item):
+        previous = slot.item
+        slot.spoken = eew
+        slot.item = item
+        serial = serial_number(eew.serial)
+        item.done.add_done_callback(lambda _: self._spoken(slot, serial, item))
+        return previous
+
+    # 読み上げた時点で、その報を受信してから何秒たっていたか・何報遅れていたかを記録する
+    def _spoken(self, slot, serial, item):
+        if item.started is None or serial not in slot.received:
+            return
+        behind = slot.latest_serial - serial if slot.latest_serial is not None else 0
+        self.staleness.append((item.started - slot.received[serial], behind))
+
+    def stats(self):
+        ages = [age for age, _ in self.staleness]
+        return {
+            "received": self.received, "spoken": len(ages), "suppressed": self.suppressed,
+            "out_of_order": self.out_of_order,
+            "avg_stale_ms": sum(ages) / len(ages) * 1000 if ages else 0.0,
+            "max_stale_ms": max(ages) * 1000 if ages else 0.0,
+            "spoken_behind": sum(1 for _, behind in self.staleness if behind),
+        }
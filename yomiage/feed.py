@@ -0,0 +1,264 @@
+import re
+import json
+import time
+import random
+import asyncio
+import collections
+
+import aiohttp
+
+# 溢れたときに捨ててよい電文（ピア分布・地震感知情報・ハートビート）
+DROPPABLE_CODES = {555, 561, 9611}
+CODE_PATTERN = re.compile(r'"code"\s*:\s*(\d+)')
+# 最上位の code。前に並ぶ値が文字列・数値などだけのときに限る（P2P地震情報の電文は _id, code の順に並ぶ）
+TOP_CODE_PATTERN = re.compile(
+    r'\s*\{(?:\s*"(?:[^"\\]|\\.)*"\s*:\s*(?:"(?:[^"\\]|\\.)*"|[-+.\w]+)\s*,)*\s*"code"\s*:\s*(\d+)'
+)
+HEARTBEAT_PATTERN = re.compile(r'"type"\s*:\s*"(?:heartbeat|pong)"')
+
+# 重複判定に使う電文のID（P2Pは _id / id、Wolfx EEWは EventID と Serial の組）
+ID_PATTERN = re.compile(r'"_?id"\s*:\s*"([^"]+)"')
+EVENT_ID_PATTERN = re.compile(r'"EventID"\s*:\s*"([^"]+)"')
+SERIAL_PATTERN = re.compile(r'"Serial"\s*:\s*"?(\d+)')
+
+# JSONを解析せずに電文の最上位の code を取り出す（見つからなければ None）
+# 入れ子の中にしか "code" が見つからないとき、入れ子の値の後ろにあるときは、解析して最上位の code を見る
+def frame_code(frame):
+    match = TOP_CODE_PATTERN.match(frame)
+    if match:
+        return int(match.group(1))
+    if CODE_PATTERN.search(frame) is None:
+        return None
+    try:
+        data = json.loads(frame)
+    except ValueError:
+        return None
+    code = data.get("code") if isinstance(data, dict) else None
+    return code if type(code) is int else None
+
+# JSONを解析せずに、溢れたとき捨ててよい電文かを判定する
+def is_droppable(frame):
+    code = frame_code(frame)
+    if code is not None:
+        return code in DROPPABLE_CODES
+    return is_heartbeat(frame)
+
+# JSONを解析せずに、生存確認（heartbeat / pong）の電文かを判定する
+def is_heartbeat(frame):
+    return HEARTBEAT_PATTERN.search(frame) is not None
+
+# 扱わない code の電文を、json.loads する前に捨てる
+# code が見つからない電文は念のため通す
+class CodeFilter:
+    def __init__(self, codes):
+        self.codes = set(codes)
+        self.skipped = 0
+        self.decoded = 0
+
+    def accept(self, frame):
+        code = frame_code(frame)
+        if code is not None and code not in self.codes:
+            self.skipped += 1
+            return False
+        self.decoded += 1
+        return True
+
+    def stats(self):
+        return {"skipped": self.skipped, "decoded": self.decoded}
+
+# JSONを解析せずに電文のIDを取り出す。IDがなければ電文そのものを使う
+def frame_id(frame):
+    match = EVENT_ID_PATTERN.search(frame)
+    if match:
+        serial = SERIAL_PATTERN.search(frame)
+        return f"{match.group(1)}-{serial.group(1) if serial else ''}"
+    match = ID_PATTERN.search(frame)
+    if match:
+        return match.group(1)
+    return frame
+
+# 受信ループと処理を切り離すための、上限つきの受信キュー
+# 満杯のときは捨ててよい電文のうち最も古いものを捨てる。EEWや地震・津波情報は捨てない
+class FeedQueue:
+    def __init__(self, maxsize=256, history=256):
+        self.maxsize = maxsize
+        self._items = collections.deque()
+        self._ready = asyncio.Event()
+        self.lags = collections.deque(maxlen=history)
+        self.received = 0
+        self.dropped = 0
+        self.overflow = 0
+        self.max_depth = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def put(self, frame, droppable=False):
+        self.received += 1
+        if len(self._items) >= self.maxsize:
+            if not self._drop_oldest():
+                if droppable:
+                    self.dropped += 1
+                    return False
+                # 捨てられない電文だけで満杯なら、上限を超えても受け入れる
+                self.overflow += 1
+        self._items.append((time.perf_counter(), frame, droppable))
+        self.max_depth = max(self.max_depth, len(self._items))
+        self._ready.set()
+        return True
+
+    def _drop_oldest(self):
+        for index, (_, _, droppable) in enumerate(self._items):
+            if droppable:
+                del self._items[index]
+                self.dropped += 1
+                return True
+        return False
+
+    async def get(self):
+        while not self._items:
+            self._ready.clear()
+            await self._ready.wait()
+        enqueued, frame, _ = self._items.popleft()
+        self.lags.append(time.perf_counter() - enqueued)
+        return frame
+
+    def stats(self):
+        lags = list(self.lags)
+        return {
+            "depth": len(self._items), "max_depth": self.max_depth, "received": self.received,
+            "dropped": self.dropped, "overflow": self.overflow,
+            "avg_lag_ms": sum(lags) / len(lags) * 1000 if lags else 0.0,
+            "max_lag_ms": max(lags) * 1000 if lags else 0.0,
+        }
+
+# 受信キューから取り出して handler(frame, last) で処理し続ける
+async def drain(queue, handler, last=None):
+    while True:
+        frame = await queue.get()
+        try:
+            last = await handler(frame, last)
+        except Exception as e:
+            print(f"電文の処理中にエラーが発生しました: {e}")
+
+# 再接続までの待ち時間。1回目はすぐに、2回目以降は上限つきの指数バックオフにジッターをかける
+class Backoff:
+    def __init__(self, first=0.05, base=0.5, cap=10.0, factor=2.0):
+        self.first = first
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.attempts = 0
+
+    def next(self):
+        self.attempts += 1
+        if self.attempts == 1:
+            return random.uniform(0, self.first)
+        return random.uniform(0, min(self.cap, self.base * self.factor ** (self.attempts - 2)))
+
+    def reset(self):
+        self.attempts = 0
+
+_session = None
+
+# 再接続のたびに作り直さず使い回すセッション（DNSキャッシュ・TLS設定を保持する）
+def get_session():
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(ttl_dns_cache=600))
+    return _session
+
+async def close_session():
+    global _session
+    if _session is not None:
+        await _session.close()
+        _session = None
+
+# 切断されても再接続し続けながら、受信した文字列を on_frame(frame) に渡す
+# heartbeat 秒ごとに ping を送り、その半分の時間 pong が返らなければ切断とみなす
+# connected（asyncio.Event）を渡すと、接続できたときにセットする
+# バックオフを戻すのは、接続が stable_after 秒以上続いてから切れたときだけ
+# （接続を受け付けてすぐ切る相手に、すぐの再接続を繰り返さない）
+async def receive_forever(url, on_frame, name=None, heartbeat=5.0, backoff=None, gaps=None, connected=None,
+                          stable_after=10.0):
+    backoff = backoff or Backoff()
+    disconnected = None
+    while True:
+        opened = None
+        try:
+            async with get_session().ws_connect(url, heartbeat=heartbeat) as ws:
+                opened = time.perf_counter()
+                if disconnected is not None:
+                    gap = time.perf_counter() - disconnected
+                    print(f"WebSocket再接続（{name or url}）: {gap:.2f}秒間切断されていました")
+                    if gaps is not None:
+                        gaps.append(gap)
+                    disconnected = None
+                if connected is not None:
+                    connected.set()
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        on_frame(msg.data)
+                    elif msg.type == aiohttp.WSMsgType.ERROR:
+                        break
+                error = ws.exception() or "接続が閉じられました"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = e
+        if opened is not None and time.perf_counter() - opened >= stable_after:
+            backoff.reset()
+        if disconnected is None:
+            disconnected = time.perf_counter()
+        delay = backoff.next()
+        print(f"WebSocket error（{name or url}）: {error} / {delay:.2f}秒後に再接続します")
+        await asyncio.sleep(delay)
+
+# 同じ配信に複数の接続を張り、最初に届いた電文だけを on_frame(frame) に渡す
+# 接続ごとに、先着した回数と、先着した接続から何秒遅れて届いたかを記録する
+class FirstArrival:
+    def __init__(self, on_frame, history=1024):
+        self.on_frame = on_frame
+        self.history = history
+        self._seen = collections.OrderedDict()
+        self.wins = collections.Counter()
+        self.deltas = collections.defaultdict(lambda: collections.deque(maxlen=history))
+        self.duplicates = 0
+
+    # 接続 name から届いた電文を受け取る関数を返す
+    def link(self, name):
+        self.wins.setdefault(name, 0)
+        return lambda frame: self.receive(name, frame)
+
+    def receive(self, name, frame):
+        now = time.perf_counter()
+        key = frame_id(frame)
+        first = self._seen.get(key)
+        if first is not None:
+            self.duplicates += 1
+            self.deltas[name].append(now - first)
+            return False
+        self._seen[key] = now
+        if len(self._seen) > self.history:
+            self._seen.popitem(last=False)
+        self.wins[name] += 1
+        self.on_frame(frame)
+        return True
+
+    def stats(self):
+        total = sum(self.wins.values())
+        links = {}
+        for name, wins in self.wins.items():
+            deltas = list(self.deltas[name])
+            links[name] = {
+                "wins": wins, "win_rate": wins / total if total else 0.0,
+                "avg_delta_ms": sum(deltas) / len(deltas) * 1000 if deltas else 0.0,
+                "max_delta_ms": max(deltas) * 1000 if deltas else 0.0,
+            }
+        return {"unique": total, "duplicates": self.duplicates, "links": links}
+
+# 設定のURL（文字列またはリスト）を、接続先ごとに links 本ずつの接続に展開する
+def expand_links(urls, links=1):
+    if isinstance(urls, str):
+        urls = [urls]
+    return [url for url in urls for _ in range(max(1, links))]
@@ -0,0 +1,112 @@
+import time
+
+from yomiage.scheduler import EEW_WARNING, TSUNAMI, HOLD
+from yomiage.breaker import BouyomiUnavailable
+
+# 読み上げ前の判定結果（HOLD はスケジューラ側で定義）
+SEND = "send"
+CLEAR = "clear"
+
+# 棒読みちゃんの待ち件数から、送る・待たせる・消してから送るを決める
+# EEW予報と津波は待たせない。待たせるのは地震情報と観測情報だけ
+def decide(priority, task_count, now_playing, max_tasks, clear_on_warning):
+    if priority == EEW_WARNING:
+        if clear_on_warning and (task_count > 0 or now_playing):
+            return CLEAR
+        return SEND
+    if priority <= TSUNAMI:
+        return SEND
+    return HOLD if task_count >= max_tasks else SEND
+
+# 棒読みちゃん内部の読み上げ待ちを見ながら送信を調整する
+class BouyomiFlowControl:
+    def __init__(self, client, max_tasks=3, clear_on_warning=False, poll_interval=0.5, timeout=1.0):
+        self.client = client
+        self.max_tasks = max_tasks
+        self.clear_on_warning = clear_on_warning
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self.held = 0
+        self.clears = 0
+        self._task_count = 0
+        self._checked = 0.0
+        # 棒読みちゃんに残っているのが、こちらが送ったEEW警報だけか（続けて送った警報どうしは消し合わない）
+        self._warnings_only = False
+        # 最後に送った項目（withdraw で、棒読みちゃんに残っているのがその項目かを確かめる）
+        self._last_sent = None
+        self.withdrawn = 0
+
+    async def _remote_task_count(self, force=False):
+        if force or time.perf_counter() - self._checked >= self.poll_interval:
+            try:
+                self._task_count = await self.client.get_task_count(timeout=self.timeout)
+            except BouyomiUnavailable:
+                self._task_count = 0
+            except Exception as e:
+                # 件数が取れないときは送信を止めない
+                print(f"棒読みちゃんの待ち件数を取得できませんでした: {e}")
+                self._task_count = 0
+            self._checked = time.perf_counter()
+        return self._task_count
+
+    async def check(self, item):
+        polled = self._checked
+        task_count = await self._remote_task_count(force=item.priority == EEW_WARNING)
+        if task_count >= self.max_tasks and item.priority > TSUNAMI and polled == self._checked:
+            # 見積もりの件数で待たせる前に、実際の件数を確かめる
+            task_count = await self._remote_task_count(force=True)
+        now_playing = False
+        if item.priority == EEW_WARNING and self.clear_on_warning and not task_count:
+            try:
+                now_playing = await self.client.get_now_playing(timeout=self.timeout)
+            except Exception:
+                now_playing = False
+        action = decide(item.priority, task_count, now_playing, self.max_tasks, self.clear_on_warning)
+        if action == CLEAR and self._warnings_only:
+            action = SEND
+        if action != HOLD:
+            self._warnings_only = item.priority == EEW_WARNING and (
+                action == CLEAR or self._warnings_only or (not task_count and not now_playing)
+            )
+        if action == CLEAR:
+            try:
+                await self.client.clear(timeout=self.timeout)
+                await self.client.skip(timeout=self.timeout)
+            except Exception as e:
+                print(f"棒読みちゃんの読み上げを中断できませんでした: {e}")
+            self.clears += 1
+            self._task_count = 0
+        elif action == HOLD:
+            self.held += 1
+        if action != HOLD:
+            # 次の確認までは送った分だけ待ち件数が増えたとみなす
+            self._task_count += 1
+            self._last_sent = item
+        return action
+
+    # 送った item を取り下げる（棒読みちゃんで待っていれば消し、読んでいる途中なら打ち切る）
+    # 棒読みちゃんには項目を指定して消す方法がなく、Clear は待っているものすべてを、Skip は今読んでいるものを消す
+    # そのため item が最後に送った項目で、棒読みちゃんに残っているのが item だけだと確かめられたときだけ消す
+    # （待ち1件なら待っているのが item、待ち0件で再生中なら読んでいるのが item）
+    # 確かめられなければ何もしない（ほかの読み上げや、先に出したEEWの呼びかけを消さない）
+    async def withdraw(self, item):
+        if item is not self._last_sent:
+            return False
+        try:
+            task_count = await self.client.get_task_count(timeout=self.timeout)
+            if task_count == 1 and item is self._last_sent:
+                await self.client.clear(timeout=self.timeout)
+            elif (task_count == 0 and await self.client.get_now_playing(timeout=self.timeout)
+                    and item is self._last_sent):
+                await self.client.skip(timeout=self.timeout)
+            else:
+                return False
+        except Exception as e:
+            print(f"前の読み上げを取り下げられませんでした: {e}")
+            return False
+        self._task_count = 0
+        self.withdrawn += 1
+        return True
+
+    def stats(self):
+        return {"remote_tasks": self._task_count, "held": self.held, "clears": self.clears, "withdrawn": self.withdrawn}
@@ -0,0 +1,21 @@
+# 都道府県ごとの最大震度を {都道府県: 震度} で返す
+# prefs と scales は観測点ごとの都道府県名と震度を同じ順に並べたもの（震度1以上の観測点だけを集計する）
+# 都道府県の並びは、震度1以上で最初に現れた順
+def max_by_pref(prefs, scales):
+    best = {}
+    for pref, scale in zip(prefs, scales):
+        # best の値は常に1以上なので、震度0以下はここで除かれる
+        if scale > best.get(pref, 0):
+            best[pref] = scale
+    return best
+
+# {都道府県: 震度} を、震度の大きい順に [(震度, [都道府県, ...]), ...] にまとめる
+def group_scales(best):
+    groups = {}
+    for pref, scale in best.items():
+        groups.setdefault(scale, []).append(pref)
+    return sorted(groups.items(), reverse=True)
+
+# 観測点から、震度の大きい順に [(震度, [都道府県, ...]), ...] を求める（従来の集計と同じ順）
+def group_by_scale(prefs, scales):
+    return group_scales(max_by_pref(prefs, scales))
@@ -0,0 +1,186 @@
+import sys
+import time
+import struct
+import asyncio
+
+from aiohttp import web
+
+from yomiage.bouyomi import (
+    TCP_TALK, TCP_SKIP, TCP_CLEAR, TCP_GET_NOW_PLAYING, TCP_GET_TASK_COUNT,
+    TCP_COMMAND, TCP_TASK_COUNT,
+)
+
+# コマンド番号より後ろのヘッダ部分
+TCP_TALK_REST = struct.Struct("<hhhhbi")
+
+# 棒読みちゃんに届いた読み上げ要求
+class Arrival:
+    __slots__ = ("transport", "text", "voice", "volume", "speed", "tone", "received", "started")
+
+    def __init__(self, transport, text, voice=0, volume=-1, speed=-1, tone=-1):
+        self.transport = transport
+        self.text = text
+        self.voice = voice
+        self.volume = volume
+        self.speed = speed
+        self.tone = tone
+        self.received = time.perf_counter()
+        # 模擬的な再生開始時刻（前の読み上げが終わるまで待たされる）
+        self.started = None
+
+# 棒読みちゃんの代わりにHTTP連携とソケット連携を受け付けるローカルサーバー
+# 文字数に比例した時間だけ「読み上げ中」として、内部の待ち行列を再現する
+# 届いた要求は到着時刻（time.perf_counter）と内容を arrivals に記録する
+class MockBouyomi:
+    def __init__(self, host="127.0.0.1", http_port=0, tcp_port=0, chars_per_second=10.0, verbose=False):
+        self.host = host
+        self.http_port = http_port
+        self.tcp_port = tcp_port
+        self.chars_per_second = chars_per_second
+        self.verbose = verbose
+        self.arrivals = []
+        self.cleared = 0
+        self.skipped = 0
+        self._tasks = []
+        self._runner = None
+        self._tcp_server = None
+        self._tcp_tasks = set()
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/Talk", self._http_talk)
+        app.router.add_get("/GetTalkTaskCount", self._http_task_count)
+        app.router.add_get("/GetNowPlaying", self._http_now_playing)
+        app.router.add_get("/Clear", self._http_clear)
+        app.router.add_get("/Skip", self._http_skip)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.http_port)
+        await site.start()
+        self.http_port = self._runner.addresses[0][1]
+        self._tcp_server = await asyncio.start_server(self._tcp_client, self.host, self.tcp_port)
+        self.tcp_port = self._tcp_server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._tcp_tasks:
+            await asyncio.gather(*self._tcp_tasks, return_exceptions=True)
+        if self._tcp_server is not None:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    # 指定した件数が届くまで待つ（ソケット連携は送信側が先に終わるため）
+    async def wait_for_arrivals(self, count, timeout=1.0):
+        deadline = time.perf_counter() + timeout
+        while len(self.arrivals) < count and time.perf_counter() < deadline:
+            await asyncio.sleep(0.001)
+        return len(self.arrivals) >= count
+
+    @property
+    def config(self):
+        return {"HOST": self.host, "HTTP_PORT": self.http_port, "TCP_PORT": self.tcp_port}
+
+    # 再生が終わった項目を取り除き、[開始時刻, 終了時刻, 本文] の一覧を返す
+    def _advance(self):
+        now = time.perf_counter()
+        self._tasks = [task for task in self._tasks if task[1] > now]
+        return now
+
+    def _talk(self, arrival):
+        now = self._advance()
+        start = max(now, self._tasks[-1][1]) if self._tasks else now
+        self._tasks.append([start, start + len(arrival.text) / self.chars_per_second, arrival.text])
+        arrival.started = start
+        if self.verbose:
+            print(f"[{time.strftime('%H:%M:%S')} {arrival.transport}] {arrival.text}")
+        self.arrivals.append(arrival)
+
+    def task_count(self):
+        now = self._advance()
+        return sum(1 for start, _, _ in self._tasks if start > now)
+
+    def now_playing(self):
+        now = self._advance()
+        return any(start <= now for start, _, _ in self._tasks)
+
+    def clear(self):
+        now = self._advance()
+        self._tasks = [task for task in self._tasks if task[0] <= now]
+        self.cleared += 1
+
+    def skip(self):
+        now = self._advance()
+        if self._tasks and self._tasks[0][0] <= now:
+            shift = self._tasks.pop(0)[1] - now
+            for task in self._tasks:
+                task[0] -= shift
+                task[1] -= shift
+        self.skipped += 1
+
+    async def _http_talk(self, request):
+        query = request.query
+        self._talk(Arrival(
+            "http", query.get("text", ""),
+            int(query.get("voice", 0)), int(query.get("volume", -1)),
+            int(query.get("speed", -1)), int(query.get("tone", -1)),
+        ))
+        return web.json_response({"taskId": len(self.arrivals)})
+
+    async def _http_task_count(self, request):
+        return web.json_response({"talkTaskCount": self.task_count()})
+
+    async def _http_now_playing(self, request):
+        return web.json_response({"nowPlaying": self.now_playing()})
+
+    async def _http_clear(self, request):
+        self.clear()
+        return web.json_response({})
+
+    async def _http_skip(self, request):
+        self.skip()
+        return web.json_response({})
+
+    async def _tcp_client(self, reader, writer):
+        task = asyncio.current_task()
+        self._tcp_tasks.add(task)
+        try:
+            command, = TCP_COMMAND.unpack(await reader.readexactly(TCP_COMMAND.size))
+            if command == TCP_TALK:
+                header = await reader.readexactly(TCP_TALK_REST.size)
+                speed, tone, volume, voice, _, length = TCP_TALK_REST.unpack(header)
+                body = await reader.readexactly(length)
+                self._talk(Arrival("tcp", body.decode("utf-8"), voice, volume, speed, tone))
+            elif command == TCP_GET_TASK_COUNT:
+                writer.write(TCP_TASK_COUNT.pack(self.task_count()))
+            elif command == TCP_GET_NOW_PLAYING:
+                writer.write(b"\x01" if self.now_playing() else b"\x00")
+            elif command == TCP_CLEAR:
+                self.clear()
+            elif command == TCP_SKIP:
+                self.skip()
+            await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        finally:
+            writer.close()
+            self._tcp_tasks.discard(task)
+
+async def serve(http_port=50080, tcp_port=50001):
+    async with MockBouyomi(http_port=http_port, tcp_port=tcp_port, verbose=True) as mock:
+        print(f"棒読みちゃんの代役を起動しました（HTTP {mock.http_port} / ソケット {mock.tcp_port}）")
+        await asyncio.Event().wait()
+
+# 使い方: python -m yomiage.mock_bouyomi [HTTPポート] [ソケットポート]
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(*[int(port) for port in sys.argv[1:3]]))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,116 @@
+import time
+import collections
+
+from yomiage.records import Earthquake
+
+# 同じ地震について、これまでの報で分かっていること
+class QuakeEvent:
+    __slots__ = ("time", "hypocenter", "tsunami", "scales", "reports", "updated")
+
+    def __init__(self, time):
+        self.time = time
+        self.hypocenter = None
+        self.tsunami = None
+        self.scales = {}
+        self.reports = 0
+        self.updated = None
+
+    @property
+    def max_scale(self):
+        return max(self.scales.values(), default=0)
+
+# 続報で変わった点
+# new: 新たに震度を観測した都道府県、raised: 震度が引き上げられた都道府県（どちらも {都道府県: 震度}）
+class QuakeDiff:
+    __slots__ = ("first", "event", "new", "raised", "previous_max", "hypocenter_changed", "tsunami_changed")
+
+    def __init__(self, first, event, new, raised, previous_max, hypocenter_changed, tsunami_changed):
+        self.first = first
+        self.event = event
+        self.new = new
+        self.raised = raised
+        self.previous_max = previous_max
+        self.hypocenter_changed = hypocenter_changed
+        self.tsunami_changed = tsunami_changed
+
+    @property
+    def max_raised(self):
+        return self.event.max_scale > self.previous_max
+
+    @property
+    def changed(self):
+        return bool(self.new or self.raised or self.hypocenter_changed or self.tsunami_changed)
+
+    # 後から届いた報の差分を合わせる（まとめて読み上げるとき）
+    def merge(self, later):
+        return QuakeDiff(
+            self.first, later.event, {**self.new, **later.new}, {**self.raised, **later.raised}, self.previous_max,
+            self.hypocenter_changed or later.hypocenter_changed, self.tsunami_changed or later.tsunami_changed,
+        )
+
+    # 変わった都道府県の {都道府県: 震度}（新規・引き上げを合わせて、現れた順）
+    @property
+    def updated_scales(self):
+        return {pref: scale for pref, scale in self.event.scales.items() if pref in self.new or pref in self.raised}
+
+# 地震の発生時刻と震源で同じ地震の報をまとめ、前の報から何が変わったかを求める
+# 震度速報には震源がないので、震源が分かっていない報は同じ発生時刻の地震とみなす
+class QuakeTracker:
+    def __init__(self, max_events=32):
+        self.max_events = max_events
+        self._events = collections.OrderedDict()
+
+    def _find(self, origin_time, name):
+        event = self._events.get(origin_time)
+        if event is not None and name and event.hypocenter and event.hypocenter[0] and event.hypocenter[0] != name:
+            event = None
+        if event is None:
+            event = self._events[origin_time] = QuakeEvent(origin_time)
+            while len(self._events) > self.max_events:
+                self._events.popitem(last=False)
+        else:
+            self._events.move_to_end(origin_time)
+        return event
+
+    # hypocenter は (震源名, 深さ, マグニチュード)、scales は yomiage.intensity.max_by_pref の結果
+    # 震度は引き上げのみ反映する（続報で観測点が減っても、伝えた震度は取り消さない）
+    def update(self, origin_time, hypocenter, tsunami, scales):
+        event = self._find(origin_time, hypocenter[0])
+        first = event.reports == 0
+        previous_max = event.max_scale
+        new = {}
+        raised = {}
+        for pref, scale in scales.items():
+            known = event.scales.get(pref)
+            if known is None:
+                new[pref] = scale
+            elif scale > known:
+                raised[pref] = scale
+            else:
+                continue
+            event.scales[pref] = scale
+        hypocenter_changed = bool(hypocenter[0]) and hypocenter != event.hypocenter
+        if hypocenter[0]:
+            event.hypocenter = hypocenter
+        tsunami_changed = bool(tsunami) and tsunami != event.tsunami
+        if tsunami:
+            event.tsunami = tsunami
+        event.reports += 1
+        event.updated = time.time()
+        return QuakeDiff(first, event, new, raised, previous_max, hypocenter_changed, tsunami_changed)
+
+# まとめて読み上げる複数の報（届いた順）を1件の地震情報にする
+# 震源・津波・観測点は、それを含む最新の報のものを使う
+def merge_reports(quakes):
+    latest = quakes[-1]
+    if len(quakes) == 1:
+        return latest
+    types = {quake.issue_type for quake in quakes}
+    issue_type = "ScaleAndDestination" if {"ScalePrompt", "Destination"} <= types else latest.issue_type
+    hypocenter = next((quake.hypocenter for quake in reversed(quakes) if quake.hypocenter.name), latest.hypocenter)
+    tsunami = next((quake.domestic_tsunami for quake in reversed(quakes) if quake.domestic_tsunami), "")
+    points = next((quake.points for quake in reversed(quakes) if quake.points), latest.points)
+    return Earthquake(
+        latest.id, issue_type, latest.issue_time, latest.time, hypocenter, latest.max_scale,
+        tsunami, latest.foreign_tsunami, points,
+    )
@@ -0,0 +1,79 @@
+import os
+import json
+import time
+import asyncio
+
+# 受信した電文をそのまま1行ずつ JSONL に書き出す
+# 1行の形式: {"t": 受信時刻(UNIX秒), "feed": "p2p" または "eew", "frame": 受信した文字列}
+class FrameRecorder:
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def record(self, feed, frame):
+        line = json.dumps({"t": time.time(), "feed": feed, "frame": frame}, ensure_ascii=False)
+        self._file.write(line + "\n")
+        self.count += 1
+
+    def close(self):
+        self._file.close()
+
+# 設定したフォルダに、起動時刻つきのファイル名で記録を始める（未設定なら記録しない）
+def open_recorder(directory):
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, time.strftime("frames-%Y%m%d-%H%M%S.jsonl"))
+    print(f"受信した電文を {path} に記録します")
+    return FrameRecorder(path)
+
+def load_frames(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+# 記録した電文を、受信時の間隔を speed 倍に縮めて handlers[feed](frame, last) に流す
+# speed が 0 のときは待たずに流す
+async def replay(frames, handlers, speed=1.0):
+    last = {feed: None for feed in handlers}
+    timings = {feed: [] for feed in handlers}
+    skipped = 0
+    started = time.perf_counter()
+    first = frames[0]["t"] if frames else 0.0
+    for entry in frames:
+        handler = handlers.get(entry["feed"])
+        if handler is None:
+            skipped += 1
+            continue
+        if speed:
+            delay = (entry["t"] - first) / speed - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+        begin = time.perf_counter()
+        last[entry["feed"]] = await handler(entry["frame"], last[entry["feed"]])
+        timings[entry["feed"]].append(time.perf_counter() - begin)
+    elapsed = time.perf_counter() - started
+    return ReplayReport(elapsed, timings, skipped)
+
+class ReplayReport:
+    def __init__(self, elapsed, timings, skipped):
+        self.elapsed = elapsed
+        self.timings = timings
+        self.skipped = skipped
+
+    @property
+    def frames(self):
+        return sum(len(values) for values in self.timings.values())
+
+    def __str__(self):
+        lines = [f"{self.frames}件を{self.elapsed:.3f}秒で再生（{self.frames / self.elapsed if self.elapsed else 0:.1f}件/秒、対象外 {self.skipped}件）"]
+        for feed, values in self.timings.items():
+            if not values:
+                continue
+            ordered = sorted(values)
+            p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+            lines.append(
+                f"  {feed}: {len(values)}件 平均 {sum(values) / len(values) * 1000:.3f}ms "
+                f"p99 {p99 * 1000:.3f}ms 最大 {ordered[-1] * 1000:.3f}ms"
+            )
+        return "\n".join(lines)
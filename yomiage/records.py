@@ -0,0 +1,184 @@
+import json
+import collections.abc
+
+# orjson があれば使う（なければ標準の json）
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+# 震源要素
+class Hypocenter:
+    __slots__ = ("name", "latitude", "longitude", "depth", "magnitude")
+
+    def __init__(self, name=None, latitude=None, longitude=None, depth=-1, magnitude=-1):
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.depth = depth
+        self.magnitude = magnitude
+
+# 震度観測点（551 の points の1件）
+class Point:
+    __slots__ = ("pref", "addr", "is_area", "scale")
+
+    def __init__(self, pref="不明", addr="", is_area=False, scale=-1):
+        self.pref = pref
+        self.addr = addr
+        self.is_area = is_area
+        self.scale = scale
+
+def _point(point):
+    return Point(point.get("pref", "不明"), point.get("addr", ""), point.get("isArea", False), point.get("scale", -1))
+
+# 551 の points。電文の辞書のまま持ち、Point は1件ずつ読まれたときに作る
+# 都道府県と震度だけが要るとき（読み上げ文の集計）は prefs() / scales() で Point を作らずに読む
+class Points(collections.abc.Sequence):
+    __slots__ = ("_raw",)
+
+    def __init__(self, raw=()):
+        self._raw = raw
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [_point(point) for point in self._raw[index]]
+        return _point(self._raw[index])
+
+    def __iter__(self):
+        return map(_point, self._raw)
+
+    def prefs(self):
+        return [point.get("pref", "不明") for point in self._raw]
+
+    def scales(self):
+        return [point.get("scale", -1) for point in self._raw]
+
+# P2P地震情報 551（地震情報）
+class Earthquake:
+    __slots__ = ("id", "issue_type", "issue_time", "time", "hypocenter", "max_scale",
+                 "domestic_tsunami", "foreign_tsunami", "points")
+
+    def __init__(self, id=None, issue_type="Other", issue_time=None, time="不明", hypocenter=None,
+                 max_scale=-1, domestic_tsunami="", foreign_tsunami=None, points=Points()):
+        self.id = id
+        self.issue_type = issue_type
+        self.issue_time = issue_time
+        self.time = time
+        self.hypocenter = hypocenter or Hypocenter()
+        self.max_scale = max_scale
+        self.domestic_tsunami = domestic_tsunami
+        self.foreign_tsunami = foreign_tsunami
+        self.points = points
+
+# 津波予報区（552 の areas の1件）
+class TsunamiArea:
+    __slots__ = ("name", "grade", "immediate", "arrival_time", "condition", "max_height")
+
+    def __init__(self, name="不明", grade="", immediate=False, arrival_time="不明", condition="", max_height="不明"):
+        self.name = name
+        self.grade = grade
+        self.immediate = immediate
+        self.arrival_time = arrival_time
+        self.condition = condition
+        self.max_height = max_height
+
+# P2P地震情報 552（津波予報）
+class Tsunami:
+    __slots__ = ("id", "time", "cancelled", "issue_type", "areas")
+
+    def __init__(self, id=None, time="", cancelled=False, issue_type=None, areas=()):
+        self.id = id
+        self.time = time
+        self.cancelled = cancelled
+        self.issue_type = issue_type
+        self.areas = areas
+
+# Wolfx 緊急地震速報（heartbeat などは type だけが入る）
+class EEW:
+    __slots__ = ("type", "event_id", "serial", "is_warn", "is_final", "is_cancel", "is_training",
+                 "max_intensity", "hypocenter", "depth", "magnitude", "origin_time", "announced_time")
+
+    def __init__(self, type=None, event_id=None, serial="不明", is_warn=False, is_final=False, is_cancel=False,
+                 is_training=False, max_intensity="不明", hypocenter="不明", depth="不明", magnitude="不明",
+                 origin_time=None, announced_time=None):
+        self.type = type
+        self.event_id = event_id
+        self.serial = serial
+        self.is_warn = is_warn
+        self.is_final = is_final
+        self.is_cancel = is_cancel
+        self.is_training = is_training
+        self.max_intensity = max_intensity
+        self.hypocenter = hypocenter
+        self.depth = depth
+        self.magnitude = magnitude
+        self.origin_time = origin_time
+        self.announced_time = announced_time
+
+# 以下、辞書を1回だけ走査してレコードに詰め替える（欠けている項目は各クラスの既定値になる）
+# 観測点は数千件になることがあるので詰め替えず、Points で包むだけにする
+def quake_from_dict(data):
+    issue = data.get("issue") or {}
+    eq = data.get("earthquake") or {}
+    hypo = eq.get("hypocenter") or {}
+    return Earthquake(
+        data.get("id"),
+        issue.get("type", "Other"),
+        issue.get("time"),
+        eq.get("time", "不明"),
+        Hypocenter(
+            hypo.get("name"), hypo.get("latitude"), hypo.get("longitude"),
+            hypo.get("depth", -1), hypo.get("magnitude", -1),
+        ),
+        eq.get("maxScale", -1),
+        eq.get("domesticTsunami", ""),
+        eq.get("foreignTsunami"),
+        Points(data.get("points") or ()),
+    )
+
+def tsunami_from_dict(data):
+    areas = []
+    for area in data.get("areas") or ():
+        first = area.get("firstHeight") or {}
+        areas.append(TsunamiArea(
+            area.get("name", "不明"), area.get("grade", ""), area.get("immediate", False),
+            first.get("arrivalTime", "不明"), first.get("condition", ""),
+            (area.get("maxHeight") or {}).get("description", "不明"),
+        ))
+    return Tsunami(
+        data.get("id"), data.get("time", ""), data.get("cancelled", False),
+        (data.get("issue") or {}).get("type"), areas,
+    )
+
+def eew_from_dict(data):
+    return EEW(
+        data.get("type"), data.get("EventID"), data.get("Serial", "不明"),
+        data.get("isWarn", False), data.get("isFinal", False), data.get("isCancel", False),
+        data.get("isTraining", False), data.get("MaxIntensity", "不明"), data.get("Hypocenter", "不明"),
+        data.get("Depth", "不明"), data.get("Magunitude", "不明"),
+        data.get("OriginTime"), data.get("AnnouncedTime"),
+    )
+
+# 受信した文字列（またはバイト列）から直接レコードを作る
+def decode_quake(raw):
+    return quake_from_dict(loads(raw))
+
+def decode_tsunami(raw):
+    return tsunami_from_dict(loads(raw))
+
+def decode_eew(raw):
+    return eew_from_dict(loads(raw))
+
+# P2Pの電文を code に応じて変換する。扱わない code なら None
+def decode_p2p(raw):
+    data = loads(raw)
+    code = data.get("code")
+    if code == 551:
+        return quake_from_dict(data)
+    if code == 552:
+        return tsunami_from_dict(data)
+    return None
@@ -0,0 +1,194 @@
+import time
+import heapq
+import asyncio
+import itertools
+import collections
+
+# 読み上げの優先度（数字が小さいほど先に読む）
+EEW_WARNING = 0
+EEW_FORECAST = 1
+TSUNAMI = 2
+EARTHQUAKE = 3
+OBSERVATION = 4
+
+# 流量制御（gate）が返す「今は送らない」の判定
+HOLD = "hold"
+
+PRIORITY_NAMES = {
+    EEW_WARNING: "EEW警報",
+    EEW_FORECAST: "EEW予報",
+    TSUNAMI: "津波",
+    EARTHQUAKE: "地震情報",
+    OBSERVATION: "観測情報",
+}
+
+# 読み上げ待ちの1件
+# after（asyncio.Future）があれば、それが完了するまで送らない（チャイムを先に聞かせるため）
+class SpeechItem:
+    __slots__ = ("text", "priority", "key", "seq", "enqueued", "started", "cancelled", "done", "after")
+
+    def __init__(self, text, priority, key, seq, after=None):
+        self.text = text
+        self.priority = priority
+        self.key = key
+        self.seq = seq
+        self.after = after
+        self.enqueued = time.perf_counter()
+        self.started = None
+        self.cancelled = False
+        self.done = asyncio.get_running_loop().create_future()
+
+    @property
+    def wait(self):
+        return None if self.started is None else self.started - self.enqueued
+
+# まとめた項目（merged）の結果を、まとめられた項目（other）の done にも伝える
+# まとめられた本文は merged の中で読まれるので、取り消しにはしない
+def _follow(merged, other):
+    if other.done.done():
+        return
+    if merged.done.cancelled():
+        other.done.cancel()
+    elif merged.done.exception() is not None:
+        other.done.set_exception(merged.done.exception())
+        other.done.exception()
+    else:
+        other.started = merged.started
+        other.done.set_result(merged.done.result())
+
+# 優先度つきの読み上げキュー
+# 上位の優先度は待ち行列を追い越し、同じ優先度・同じキーの古い項目は新しい項目で置き換える
+# speak は speak(text, priority=...) の形で呼ばれる
+# gate を渡すと、送信前に gate.check(item) で棒読みちゃん側の混み具合を確認する
+# after を待つのは予約から max_after 秒まで（チャイムが鳴り終わらなくても、読み上げは止めない）
+class SpeechScheduler:
+    def __init__(self, speak, gate=None, hold_interval=0.5, max_merge_chars=500, history=256, max_after=5.0):
+        self.speak = speak
+        self.gate = gate
+        self.hold_interval = hold_interval
+        self.max_after = max_after
+        self.max_merge_chars = max_merge_chars
+        self._heap = []
+        self._pending = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self.waits = {p: collections.deque(maxlen=history) for p in PRIORITY_NAMES}
+        self.replaced = 0
+        self.merged = 0
+        self.spoken = 0
+
+    def submit(self, text, priority, key=None, replace=True, after=None):
+        item = SpeechItem(text, priority, key, next(self._seq), after)
+        slot = (priority, key)
+        if replace:
+            stale = self._pending.get(slot)
+            if stale is not None and not stale.cancelled:
+                stale.cancelled = True
+                stale.done.cancel()
+                self.replaced += 1
+            self._pending[slot] = item
+        heapq.heappush(self._heap, (priority, item.seq, item))
+        self._wakeup.set()
+        return item
+
+    # まだ読まれていない項目を取り消す
+    def cancel(self, item):
+        if item.started is None and not item.cancelled:
+            item.cancelled = True
+            item.done.cancel()
+            self.replaced += 1
+
+    # 同じ優先度・同じキーの項目が、置き換えられる状態でまだ待っているか
+    def is_pending(self, priority, key=None):
+        item = self._pending.get((priority, key))
+        return item is not None and not item.cancelled
+
+    # 待たせる項目に、同じ優先度で待っている項目の本文をまとめて1件にする
+    def _hold(self, item):
+        for _, _, other in sorted(self._heap):
+            if other.priority != item.priority or other.cancelled:
+                continue
+            if len(item.text) + len(other.text) >= self.max_merge_chars:
+                break
+            item.text += "\n" + other.text
+            # 単独では送らないが、done は item が読まれたときに完了させる
+            other.cancelled = True
+            item.done.add_done_callback(lambda _, other=other: _follow(item, other))
+            self.merged += 1
+        # まとめた項目は別のキーの本文も含むので、置き換えの対象にはしない
+        heapq.heappush(self._heap, (item.priority, item.seq, item))
+
+    # after の完了（または新しい項目の予約）を待ってから、もう一度キューを見る
+    async def _wait_after(self, item, timeout):
+        slot = (item.priority, item.key)
+        self._pending.setdefault(slot, item)
+        heapq.heappush(self._heap, (item.priority, item.seq, item))
+        self._wakeup.clear()
+        wakeup = asyncio.ensure_future(self._wakeup.wait())
+        try:
+            await asyncio.wait({item.after, wakeup}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            wakeup.cancel()
+        if not item.after.done() and time.perf_counter() - item.enqueued >= self.max_after:
+            item.after = None
+
+    async def _sleep(self, timeout):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def _pop(self):
+        while self._heap:
+            _, _, item = heapq.heappop(self._heap)
+            if self._pending.get((item.priority, item.key)) is item:
+                del self._pending[(item.priority, item.key)]
+            if not item.cancelled:
+                return item
+        return None
+
+    def depth(self):
+        return sum(1 for _, _, item in self._heap if not item.cancelled)
+
+    async def run(self):
+        while True:
+            item = self._pop()
+            if item is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            if item.after is not None and not item.after.done():
+                await self._wait_after(item, max(0.0, item.enqueued + self.max_after - time.perf_counter()))
+                continue
+            if self.gate is not None and await self.gate.check(item) == HOLD:
+                self._hold(item)
+                await self._sleep(self.hold_interval)
+                continue
+            item.started = time.perf_counter()
+            self.waits[item.priority].append(item.wait)
+            try:
+                result = await self.speak(item.text, priority=item.priority)
+            except Exception as e:
+                print(f"読み上げエラー: {e}")
+                if not item.done.done():
+                    item.done.set_exception(e)
+                    item.done.exception()
+            else:
+                self.spoken += 1
+                if not item.done.done():
+                    item.done.set_result(result)
+
+    def stats(self):
+        waits = {}
+        for priority, values in self.waits.items():
+            if values:
+                waits[PRIORITY_NAMES[priority]] = {
+                    "count": len(values),
+                    "avg_wait_ms": sum(values) / len(values) * 1000,
+                    "max_wait_ms": max(values) * 1000,
+                }
+        return {
+            "depth": self.depth(), "spoken": self.spoken,
+            "replaced": self.replaced, "merged": self.merged, "waits": waits,
+        }
@@ -0,0 +1,239 @@
+import hmac
+import json
+import time
+import ipaddress
+import collections
+
+from yomiage.eew import serial_number
+from yomiage.tsunami import TSUNAMI_GRADES, GRADE_RANK, LIFTED
+
+SECTIONS = ("tsunami", "quakes", "eew")
+
+def _tsunami_row(area):
+    return {
+        "name": area.name, "grade": area.grade, "level": TSUNAMI_GRADES[area.grade], "max_height": area.max_height,
+        "arrival_time": area.arrival_time, "condition": area.condition, "immediate": area.immediate,
+    }
+
+def _hypocenter(hypocenter):
+    return {
+        "name": hypocenter.name, "latitude": hypocenter.latitude, "longitude": hypocenter.longitude,
+        "depth": hypocenter.depth, "magnitude": hypocenter.magnitude,
+    }
+
+def _eew_row(eew):
+    return {
+        "event_id": eew.event_id, "serial": eew.serial, "is_warn": eew.is_warn, "is_final": eew.is_final,
+        "is_training": eew.is_training, "max_intensity": eew.max_intensity, "hypocenter": eew.hypocenter,
+        "depth": eew.depth, "magnitude": eew.magnitude, "origin_time": eew.origin_time,
+        "announced_time": eew.announced_time, "received": time.time(),
+    }
+
+# 今発表中の情報（地域ごとの津波警報・注意報、最近の地震ごとの最新の地震情報、地震ごとの最新の緊急地震速報）
+# 受信の処理から、変わった項目だけを反映する（届くたびに全体を作り直さない）
+# 問い合わせに返す JSON はセクションごとに作っておき、そのセクションが変わるまで使い回す
+# 緊急地震速報は取消で消し、最後の報から eew_ttl 秒たったものも消す（最終報は eew_ttl 秒のあいだ残る）
+class ActiveState:
+    def __init__(self, max_quakes=16, eew_ttl=300.0):
+        self.max_quakes = max_quakes
+        self.eew_ttl = eew_ttl
+        self.tsunami = {}
+        self.tsunami_bulletin = {"id": None, "time": None}
+        self.quakes = collections.OrderedDict()
+        self.eew = collections.OrderedDict()
+        self.versions = dict.fromkeys(SECTIONS, 0)
+        self.updated = dict.fromkeys(SECTIONS)
+        self._bodies = {}
+
+    def _touch(self, section):
+        self.versions[section] += 1
+        self.updated[section] = time.time()
+        self._bodies.pop(section, None)
+        self._bodies.pop(None, None)
+
+    # yomiage.tsunami.TsunamiBoard の on_change から、変わった地域だけを受け取る
+    def update_tsunami(self, changes, tsunami):
+        for change in changes:
+            if change.kind == LIFTED:
+                self.tsunami.pop(change.name, None)
+            else:
+                self.tsunami[change.name] = _tsunami_row(change.area)
+        self.tsunami_bulletin = {"id": tsunami.id, "time": tsunami.time}
+        self._touch("tsunami")
+
+    # 地震情報（yomiage.records.Earthquake）を反映する
+    # diff（yomiage.quakes.QuakeDiff）があれば同じ地震の行を更新し、震度は変わった都道府県だけを書き換える
+    def update_quake(self, quake, scales, diff=None):
+        key = quake.id if diff is None else diff.event
+        row = self.quakes.get(key)
+        if row is None:
+            row = self.quakes[key] = {"time": quake.time, "scales": {}, "reports": 0}
+            while len(self.quakes) > self.max_quakes:
+                self.quakes.popitem(last=False)
+        else:
+            self.quakes.move_to_end(key)
+        row["id"] = quake.id
+        row["issue_type"] = quake.issue_type
+        row["issue_time"] = quake.issue_time
+        if quake.hypocenter.name or "hypocenter" not in row:
+            row["hypocenter"] = _hypocenter(quake.hypocenter)
+        if quake.domestic_tsunami or "domestic_tsunami" not in row:
+            row["domestic_tsunami"] = quake.domestic_tsunami
+        row["foreign_tsunami"] = quake.foreign_tsunami
+        if diff is None:
+            row["scales"] = dict(scales)
+            row["reports"] += 1
+        else:
+            row["scales"].update(diff.updated_scales)
+            row["reports"] = diff.event.reports
+        row["max_scale"] = max(row["scales"].values(), default=quake.max_scale)
+        self._touch("quakes")
+
+    # 緊急地震速報（yomiage.records.EEW）を反映する。既に反映した報より古い報は無視する
+    def update_eew(self, eew):
+        self._expire()
+        if eew.is_cancel:
+            if self.eew.pop(eew.event_id, None) is not None:
+                self._touch("eew")
+            return
+        row = self.eew.get(eew.event_id)
+        if row is not None:
+            serial, known = serial_number(eew.serial), serial_number(row["serial"])
+            if serial is not None and known is not None and serial <= known:
+                return
+            self.eew.move_to_end(eew.event_id)
+        self.eew[eew.event_id] = _eew_row(eew)
+        self._touch("eew")
+
+    # 最後の報が古い順に並んでいるので、先頭から期限切れのものだけを消す
+    def _expire(self):
+        expired = False
+        deadline = time.time() - self.eew_ttl
+        while self.eew and next(iter(self.eew.values()))["received"] < deadline:
+            self.eew.popitem(last=False)
+            expired = True
+        if expired:
+            self._touch("eew")
+
+    def section(self, name):
+        if name == "tsunami":
+            areas = sorted(self.tsunami.values(), key=lambda row: -GRADE_RANK[row["grade"]])
+            return dict(self.tsunami_bulletin, areas=areas)
+        if name == "quakes":
+            return list(reversed(self.quakes.values()))
+        if name == "eew":
+            self._expire()
+            return list(reversed(self.eew.values()))
+        raise KeyError(name)
+
+    # name のセクション（None ならすべて）の版。変わるたびに増える
+    def version(self, name=None):
+        self._expire()
+        return self.versions[name] if name else sum(self.versions.values())
+
+    # name のセクション（None ならすべて）の JSON（UTF-8 のバイト列）
+    def body(self, name=None):
+        self._expire()
+        body = self._bodies.get(name)
+        if body is None:
+            if name is None:
+                data = {section: self.section(section) for section in SECTIONS}
+                data["versions"] = dict(self.versions)
+            else:
+                data = {name: self.section(name), "version": self.versions[name], "updated": self.updated[name]}
+            body = self._bodies[name] = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        return body
+
+    def stats(self):
+        return {
+            "tsunami_areas": len(self.tsunami), "quakes": len(self.quakes), "eew": len(self.eew),
+            "versions": dict(self.versions),
+        }
+
+# ActiveState をローカルの HTTP/JSON で読めるようにする（オーバーレイなどが P2P・Wolfx に直接つながなくてよい）
+# GET /state（すべて）・/state/tsunami・/state/quakes・/state/eew
+# ETag を返すので、If-None-Match を付けて問い合わせれば、変わっていないときは 304 だけが返る
+# ブラウザからほかのオリジンで読めるのは allow_origin に渡したオリジンだけ（None なら同じオリジンだけ）
+# reread（コルーチン関数）と token を渡したときだけ、POST /tsunami/reread で今出ている津波予報をすべて読み直す
+# 受け付けるのは、同じPCから X-Reread-Token ヘッダーに token を付けて送られた要求だけ
+# （ほかのオリジンのページから送られた要求は、Origin ヘッダーで断る）
+class StateServer:
+    def __init__(self, state, host="127.0.0.1", port=50090, allow_origin=None, reread=None, token=None):
+        self.state = state
+        self.host = host
+        self.port = port
+        self.allow_origin = allow_origin
+        self.reread = reread
+        self.token = token
+        self.rejected = 0
+        self.requests = 0
+        self.not_modified = 0
+        self._runner = None
+
+    async def start(self):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get("/state", self._all)
+        app.router.add_get("/state/{section}", self._section)
+        if self.reread is not None and self.token:
+            app.router.add_post("/tsunami/reread", self._reread)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        try:
+            await site.start()
+        except OSError:
+            await self._runner.cleanup()
+            self._runner = None
+            raise
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _respond(self, request, name):
+        from aiohttp import web
+        self.requests += 1
+        etag = f'"{name or "all"}-{self.state.version(name)}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if self.allow_origin:
+            headers["Access-Control-Allow-Origin"] = self.allow_origin
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=self.state.body(name), content_type="application/json", charset="utf-8", headers=headers)
+
+    async def _all(self, request):
+        return self._respond(request, None)
+
+    async def _section(self, request):
+        from aiohttp import web
+        name = request.match_info["section"]
+        if name not in SECTIONS:
+            raise web.HTTPNotFound()
+        return self._respond(request, name)
+
+    def _allowed(self, request):
+        try:
+            if not ipaddress.ip_address(request.remote).is_loopback:
+                return False
+        except ValueError:
+            return False
+        origin = request.headers.get("Origin")
+        if origin is not None and origin != self.allow_origin:
+            return False
+        return hmac.compare_digest(request.headers.get("X-Reread-Token", "").encode(), self.token.encode())
+
+    async def _reread(self, request):
+        from aiohttp import web
+        if not self._allowed(request):
+            self.rejected += 1
+            raise web.HTTPForbidden()
+        await self.reread()
+        return web.json_response({"areas": len(self.state.tsunami)})
+
+    def stats(self):
+        return {"requests": self.requests, "not_modified": self.not_modified, "rejected": self.rejected}
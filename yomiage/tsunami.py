@@ -0,0 +1,182 @@
+# 津波予報（P2P地震情報 552）の読み上げ文
+TSUNAMI_LEVELS = ("大津波警報", "津波警報", "津波注意報")
+TSUNAMI_GRADES = {"MajorWarning": "大津波警報", "Warning": "津波警報", "Watch": "津波注意報"}
+TSUNAMI_CONDITIONS = {
+    "ただちに津波来襲と予測": "ただちに津波来襲と予測されます",
+    "津波到達中と推測": "津波到達中と推測されます",
+    "第１波の到達を確認": "第１波の到達を確認しました",
+}
+TSUNAMI_CANCEL_TEXT = "津波情報。津波予報が解除されました。\n"
+
+def arrival_text(arrival_raw):
+    if arrival_raw == "不明":
+        return ""
+    try:
+        date_part, time_part = arrival_raw.split(" ")
+        day = int(date_part.split("/")[-1])
+        hour, minute = map(int, time_part.split(":")[:2])
+        return f"早いところで、{day}日{hour}時{minute}分ごろ到達とみられます"
+    except ValueError:
+        return ""
+
+# 1つの地域（yomiage.records.TsunamiArea）の読み上げ文
+def area_text(area):
+    condition = TSUNAMI_CONDITIONS.get(area.condition) or arrival_text(area.arrival_time)
+    return f"{area.name}、予想の高さ{area.max_height}、{condition}\n"
+
+def level_header(level):
+    return f"津波情報。{level}が発表されました。\n{level}が発表されている地域をお伝えします。\n"
+
+# 津波予報（yomiage.records.Tsunami）の読み上げ文を、警報の種類ごとの見出しと地域ごとの1行に分けて順に返す
+# 区切りは呼ばれるたびに作るので、最初の区切りを送っている間に残りを作れる
+# すべての区切りをつなげると、1つの文にまとめて読んでいたときと同じ文になる
+def tsunami_chunks(tsunamis):
+    for tsunami in sorted(tsunamis, key=lambda t: t.time, reverse=True):
+        if tsunami.cancelled:
+            yield TSUNAMI_CANCEL_TEXT
+            continue
+        by_level = {level: [] for level in TSUNAMI_LEVELS}
+        for area in tsunami.areas:
+            level = TSUNAMI_GRADES.get(area.grade)
+            if level is not None:
+                by_level[level].append(area)
+        for level in TSUNAMI_LEVELS:
+            if by_level[level]:
+                yield level_header(level)
+                for area in by_level[level]:
+                    yield area_text(area)
+
+# 等級の重さ（大きいほど重い）
+GRADE_RANK = {"Watch": 1, "Warning": 2, "MajorWarning": 3}
+
+# 前の予報からの変化の種類
+ISSUED = "issued"
+RAISED = "raised"
+LOWERED = "lowered"
+HEIGHT = "height"
+LIFTED = "lifted"
+# 到達予測・状況（第１波の到達など）だけの変化。一覧には反映するが、読み上げない
+DETAIL = "detail"
+
+# 1つの地域の変化（LIFTED なら area は None、ISSUED なら previous は None）
+class TsunamiChange:
+    __slots__ = ("kind", "area", "previous")
+
+    def __init__(self, kind, area, previous=None):
+        self.kind = kind
+        self.area = area
+        self.previous = previous
+
+    @property
+    def name(self):
+        return (self.area or self.previous).name
+
+def _change(previous, area):
+    if previous is None:
+        return ISSUED
+    rank, before = GRADE_RANK[area.grade], GRADE_RANK[previous.grade]
+    if rank > before:
+        return RAISED
+    if rank < before:
+        return LOWERED
+    if area.max_height != previous.max_height:
+        return HEIGHT
+    if area.arrival_time != previous.arrival_time or area.condition != previous.condition:
+        return DETAIL
+    return None
+
+# 今出ている津波警報・注意報の一覧（地域名 → yomiage.records.TsunamiArea）
+# 552 は出ている地域をすべて載せて届くので、新しい予報と比べれば、載らなくなった地域は解除とわかる
+# on_change を渡すと、変化があるたびに on_change(変化の一覧, 予報) を呼ぶ
+class TsunamiBoard:
+    def __init__(self, on_change=None):
+        self.areas = {}
+        self.time = ""
+        self.on_change = on_change
+
+    # 予報を反映し、前の予報からの変化の一覧を返す。前に反映した予報より古ければ何もせず None
+    def apply(self, tsunami):
+        if tsunami.time < self.time:
+            return None
+        self.time = tsunami.time
+        current = {}
+        if not tsunami.cancelled:
+            for area in tsunami.areas:
+                if area.grade in GRADE_RANK:
+                    current[area.name] = area
+        changes = []
+        for name, area in current.items():
+            kind = _change(self.areas.get(name), area)
+            if kind is not None:
+                changes.append(TsunamiChange(kind, area, self.areas.get(name)))
+        for name, previous in self.areas.items():
+            if name not in current:
+                changes.append(TsunamiChange(LIFTED, None, previous))
+        self.areas = current
+        if changes and self.on_change is not None:
+            self.on_change(changes, tsunami)
+        return changes
+
+    # 今出ているすべての地域の読み上げ文（tsunami_chunks と同じ形）
+    def chunks(self):
+        by_level = {level: [] for level in TSUNAMI_LEVELS}
+        for area in self.areas.values():
+            by_level[TSUNAMI_GRADES[area.grade]].append(area)
+        for level in TSUNAMI_LEVELS:
+            if by_level[level]:
+                yield level_header(level)
+                for area in by_level[level]:
+                    yield area_text(area)
+
+CHANGE_HEADERS = {
+    ISSUED: "{level}が新たに発表された地域をお伝えします。\n",
+    HEIGHT: "{level}の予想の高さが変わった地域をお伝えします。\n",
+    LOWERED: "{level}に引き下げられた地域をお伝えします。\n",
+}
+TSUNAMI_CHANGED_TEXT = "津波情報。津波予報の内容が変わりました。\n"
+TSUNAMI_LIFTED_TEXT = "津波予報が解除された地域をお伝えします。\n"
+
+# 変わった地域だけの読み上げ文を区切りごとに返す
+# 重くなった地域（新たな発表・引き上げ）を重い等級から先に、次に予想の高さの変化、引き下げ、解除の順
+def change_chunks(changes):
+    groups = {}
+    for change in changes:
+        if change.kind == DETAIL:
+            continue
+        kind = ISSUED if change.kind == RAISED else change.kind
+        level = None if kind == LIFTED else TSUNAMI_GRADES[change.area.grade]
+        groups.setdefault((kind, level), []).append(change)
+    if not groups:
+        return
+    yield TSUNAMI_CHANGED_TEXT
+    for kind in (ISSUED, HEIGHT, LOWERED):
+        for level in TSUNAMI_LEVELS:
+            group = groups.get((kind, level))
+            if group:
+                yield CHANGE_HEADERS[kind].format(level=level)
+                for change in group:
+                    yield area_text(change.area)
+    lifted = groups.get((LIFTED, None))
+    if lifted:
+        yield TSUNAMI_LIFTED_TEXT
+        for change in lifted:
+            yield f"{change.name}\n"
+
+# 今出ているすべての地域の読み上げ文。すべて解除されて何も出ていなければ、解除の1文
+def board_chunks(board):
+    if not board.areas:
+        return iter((TSUNAMI_CANCEL_TEXT,))
+    return board.chunks()
+
+# 予報を board に反映し、読み上げる区切りを返す
+# 何も出ていなかったときの予報はすべての地域を、解除は解除の1文を、それ以外は変わった地域だけを読む
+def update_chunks(board, tsunami):
+    first = not board.areas
+    changes = board.apply(tsunami)
+    if changes is None:
+        return iter(())
+    if tsunami.cancelled:
+        return iter((TSUNAMI_CANCEL_TEXT,))
+    if first:
+        return board.chunks()
+    return change_chunks(changes)